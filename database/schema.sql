@@ -5,6 +5,7 @@
 
 -- Enable extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- ============================================
 -- LEADS TABLE
@@ -13,8 +14,14 @@ CREATE TABLE IF NOT EXISTS leads (
     id SERIAL PRIMARY KEY,
     full_name VARCHAR(255),
     phone VARCHAR(20),
+    -- Last 10 digits of phone, so '+12395551234' and '(239) 555-1234' collide
+    phone_key VARCHAR(10) GENERATED ALWAYS AS (
+        NULLIF(RIGHT(regexp_replace(phone, '\D', '', 'g'), 10), '')
+    ) STORED,
     email VARCHAR(255),
     address TEXT,
+    -- Canonical street address from address.normalize_address() (set by every ingest path)
+    address_key TEXT,
     city VARCHAR(100),
     county VARCHAR(50),
     zip_code VARCHAR(10),
@@ -53,6 +60,18 @@ CREATE TABLE IF NOT EXISTS leads (
 );
 
 CREATE INDEX idx_leads_phone ON leads(phone);
+-- Dedupe keys for bulk upserts: one lead per phone, and one lead per parcel
+-- that is phoneless or from the NAL roll. NAL leads stay in the parcel index
+-- after a phone is added, so re-importing the roll refreshes them in place.
+CREATE UNIQUE INDEX idx_leads_phone_key ON leads(phone_key) WHERE phone_key IS NOT NULL;
+CREATE UNIQUE INDEX idx_leads_parcel ON leads(parcel_id)
+    WHERE parcel_id IS NOT NULL AND (phone_key IS NULL OR source = 'scraper_nal');
+-- Leads with neither phone nor parcel dedupe on their normalized address
+CREATE UNIQUE INDEX idx_leads_address_no_keys ON leads(county, address_key) NULLS NOT DISTINCT
+    WHERE phone_key IS NULL AND parcel_id IS NULL AND address_key IS NOT NULL;
+CREATE INDEX idx_leads_address_key ON leads(county, address_key);
+CREATE INDEX idx_leads_address_key_trgm ON leads USING gin (address_key gin_trgm_ops);
+CREATE INDEX idx_leads_address_key_missing ON leads(id) WHERE address_key IS NULL AND address IS NOT NULL;
 CREATE INDEX idx_leads_status ON leads(status);
 CREATE INDEX idx_leads_score ON leads(renovation_score DESC);
 CREATE INDEX idx_leads_county ON leads(county);
@@ -60,31 +79,147 @@ CREATE INDEX idx_leads_source ON leads(source);
 CREATE INDEX idx_leads_do_not_call ON leads(do_not_call) WHERE do_not_call = true;
 
 -- ============================================
--- INTERACTIONS TABLE
+-- INTERACTIONS TABLE (range-partitioned by month on created_at)
 -- ============================================
+-- Monthly partitions are created ahead by ensure_interaction_partitions();
+-- months past the retention horizon are detached, exported to Parquet and
+-- dropped by scripts/scraper/interaction_archive.py. Queries bounded on created_at
+-- (e.g. the 24h contact checks) only touch the partitions they need.
+-- Databases created before partitioning: database/upgrade_partitioned_interactions.sql
 CREATE TABLE IF NOT EXISTS interactions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     lead_id INTEGER NOT NULL REFERENCES leads(id) ON DELETE CASCADE,
     type VARCHAR(20) NOT NULL,
     direction VARCHAR(10) NOT NULL DEFAULT 'outbound',
     status VARCHAR(20) NOT NULL,
     duration_seconds INTEGER,
+    -- Write-only: interaction_transcript_store moves it to interaction_transcripts
+    -- and leaves it NULL; read it back with db.get_transcript(transcript_hash)
     transcript TEXT,
+    transcript_hash CHAR(64),
+    transcript_chars INTEGER,
     sms_content TEXT,
     notes TEXT,
     twilio_sid VARCHAR(50),
-    created_at TIMESTAMP DEFAULT NOW(),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at),
     CONSTRAINT valid_type CHECK (type IN ('call', 'sms', 'voicemail', 'email')),
     CONSTRAINT valid_direction CHECK (direction IN ('outbound', 'inbound')),
     CONSTRAINT valid_interaction_status CHECK (status IN (
         'completed', 'no_answer', 'busy', 'failed',
         'voicemail', 'opted_out', 'delivered', 'undelivered'
     ))
-);
+) PARTITION BY RANGE (created_at);
+
+-- Rows outside every monthly partition (backdated, or for a month not yet
+-- created) land here instead of failing; ensure_interaction_partitions()
+-- moves them into their month once it exists.
+CREATE TABLE IF NOT EXISTS interactions_default PARTITION OF interactions DEFAULT;
+
+-- Create monthly partitions (interactions_yYYYYmMM) from the month of the
+-- earliest interaction (or `since`, if earlier) through months_ahead past the
+-- current month; returns how many were created. Run daily by the scraper
+-- daemon so inserts never find their month missing. A month whose rows sit
+-- in interactions_default is built from them: the default partition is
+-- detached while they move, so no triggers fire and no row is seen twice.
+CREATE OR REPLACE FUNCTION ensure_interaction_partitions(
+    months_ahead INTEGER DEFAULT 2,
+    since TIMESTAMP DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    last_month DATE := (date_trunc('month', NOW()) + make_interval(months => months_ahead))::DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    SELECT date_trunc('month', LEAST(NOW()::TIMESTAMP, since, MIN(created_at)))::DATE
+    INTO month_start FROM interactions;
+
+    WHILE month_start <= last_month LOOP
+        partition_name := format('interactions_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            IF EXISTS (
+                SELECT 1 FROM interactions_default
+                WHERE created_at >= month_start AND created_at < month_start + INTERVAL '1 month'
+            ) THEN
+                ALTER TABLE interactions DETACH PARTITION interactions_default;
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE interactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM interactions_default WHERE created_at >= %L AND created_at < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month_start, (month_start + INTERVAL '1 month')::DATE, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE interactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+                );
+                ALTER TABLE interactions ATTACH PARTITION interactions_default DEFAULT;
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF interactions FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, (month_start + INTERVAL '1 month')::DATE
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_interaction_partitions();
 
 CREATE INDEX idx_interactions_lead ON interactions(lead_id);
 CREATE INDEX idx_interactions_created ON interactions(created_at);
 CREATE INDEX idx_interactions_type ON interactions(type);
+CREATE INDEX idx_interactions_lead_outbound ON interactions(lead_id, created_at DESC)
+    WHERE direction = 'outbound';
+CREATE INDEX idx_interactions_transcript ON interactions(transcript_hash) WHERE transcript_hash IS NOT NULL;
+
+-- ============================================
+-- INTERACTION TRANSCRIPTS (content-addressed side store)
+-- ============================================
+-- Full call transcripts live here, keyed by SHA-256 of the text and
+-- lz4-compressed by TOAST, so interaction listings stay small.
+CREATE TABLE IF NOT EXISTS interaction_transcripts (
+    hash CHAR(64) PRIMARY KEY,
+    body TEXT COMPRESSION lz4 NOT NULL,
+    chars INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- ============================================
+-- CONTACT BUDGET (FTSA: max 3 outbound contacts per rolling 24h)
+-- ============================================
+-- Maintained by trigger on interactions. A lead is blocked until its 3rd most
+-- recent outbound contact is 24h old, which is exactly count_daily_contacts() >= 3.
+-- Leads with fewer than 3 outbound contacts have no row.
+CREATE TABLE IF NOT EXISTS contact_budget (
+    lead_id INTEGER PRIMARY KEY REFERENCES leads(id) ON DELETE CASCADE,
+    blocked_until TIMESTAMP NOT NULL
+);
+
+CREATE INDEX idx_contact_budget_blocked ON contact_budget(blocked_until);
+
+-- ============================================
+-- LEAD LEASES (dialer work queue)
+-- ============================================
+-- A call worker claims leads with claim_leads() (FOR NO KEY UPDATE SKIP LOCKED)
+-- and holds them until it completes/releases them or the lease expires, so
+-- concurrent workers never dial the same lead.
+CREATE TABLE IF NOT EXISTS lead_leases (
+    lead_id INTEGER PRIMARY KEY REFERENCES leads(id) ON DELETE CASCADE,
+    worker VARCHAR(100) NOT NULL,
+    leased_at TIMESTAMP DEFAULT NOW(),
+    leased_until TIMESTAMP NOT NULL
+);
+
+CREATE INDEX idx_lead_leases_worker ON lead_leases(worker);
 
 -- ============================================
 -- FOLLOW-UPS TABLE
@@ -99,6 +234,12 @@ CREATE TABLE IF NOT EXISTS follow_ups (
     completed BOOLEAN DEFAULT false,
     completed_at TIMESTAMP,
     result VARCHAR(30),
+    -- Handed to the agent by followup_dispatcher; cleared if the hand-off fails
+    dispatched_at TIMESTAMP,
+    -- Hand-offs so far; the dispatcher gives up at FOLLOWUP_MAX_DISPATCHES
+    dispatch_count INTEGER NOT NULL DEFAULT 0,
+    -- cadence_steps.cadence this row was enrolled from (NULL for one-off follow-ups)
+    cadence VARCHAR(30),
     created_at TIMESTAMP DEFAULT NOW(),
     CONSTRAINT valid_followup_type CHECK (type IN ('call', 'sms')),
     CONSTRAINT max_attempts CHECK (attempt_number <= 5)
@@ -106,6 +247,31 @@ CREATE TABLE IF NOT EXISTS follow_ups (
 
 CREATE INDEX idx_followups_scheduled ON follow_ups(scheduled_at) WHERE completed = false;
 CREATE INDEX idx_followups_lead ON follow_ups(lead_id);
+CREATE INDEX idx_followups_open_cadence ON follow_ups(lead_id, cadence) WHERE completed = false;
+
+-- ============================================
+-- CADENCES (follow-up sequences as data; see enroll_cadence() in db.py)
+-- ============================================
+CREATE TABLE IF NOT EXISTS cadence_steps (
+    cadence VARCHAR(30) NOT NULL,
+    step INTEGER NOT NULL,
+    day_offset INTEGER NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    attempt_number INTEGER NOT NULL,
+    message_template VARCHAR(50),
+    PRIMARY KEY (cadence, step),
+    CONSTRAINT valid_cadence_type CHECK (type IN ('call', 'sms'))
+);
+
+-- Standard cadence after the Day 0 initial call (follow-up-scheduler skill)
+INSERT INTO cadence_steps (cadence, step, day_offset, type, attempt_number, message_template) VALUES
+    ('standard', 1, 1, 'sms', 1, 'missed_call'),
+    ('standard', 2, 3, 'call', 2, 'follow_up'),
+    ('standard', 3, 5, 'sms', 2, 'value_add'),
+    ('standard', 4, 7, 'call', 3, 'final_call'),
+    ('standard', 5, 10, 'sms', 3, 'offer'),
+    ('standard', 6, 14, 'sms', 4, 'final_touch')
+ON CONFLICT (cadence, step) DO NOTHING;
 
 -- ============================================
 -- SOCIAL POSTS TABLE
@@ -140,6 +306,10 @@ CREATE INDEX idx_posts_platform ON social_posts(platform);
 CREATE TABLE IF NOT EXISTS opt_outs (
     id SERIAL PRIMARY KEY,
     phone VARCHAR(20) UNIQUE NOT NULL,
+    -- Same key as leads.phone_key; every opt-out check compares on it
+    phone_key VARCHAR(10) GENERATED ALWAYS AS (
+        NULLIF(RIGHT(regexp_replace(phone, '\D', '', 'g'), 10), '')
+    ) STORED,
     opted_out_at TIMESTAMP DEFAULT NOW(),
     source VARCHAR(50) NOT NULL,
     CONSTRAINT valid_optout_source CHECK (source IN (
@@ -148,6 +318,7 @@ CREATE TABLE IF NOT EXISTS opt_outs (
 );
 
 CREATE INDEX idx_optouts_phone ON opt_outs(phone);
+CREATE INDEX idx_optouts_phone_key ON opt_outs(phone_key);
 
 -- ============================================
 -- PERMITS TABLE (from web scraping)
@@ -159,6 +330,7 @@ CREATE TABLE IF NOT EXISTS permits (
     permit_type VARCHAR(100),
     description TEXT,
     site_address TEXT,
+    address_key TEXT,
     parcel_id VARCHAR(30),
     applicant_name VARCHAR(255),
     contractor_name VARCHAR(255),
@@ -169,12 +341,19 @@ CREATE TABLE IF NOT EXISTS permits (
     finaled_date DATE,
     scraped_at TIMESTAMP DEFAULT NOW(),
     linked_lead_id INTEGER REFERENCES leads(id),
+    -- First linking pass that tried this permit; fuzzy matching only runs once per permit
+    link_attempted_at TIMESTAMP,
     CONSTRAINT valid_permit_county CHECK (county IN ('Lee', 'Collier'))
 );
 
 CREATE INDEX idx_permits_parcel ON permits(parcel_id);
-CREATE INDEX idx_permits_address ON permits(site_address);
+CREATE INDEX idx_permits_address_key ON permits(county, address_key);
+CREATE INDEX idx_permits_address_key_trgm ON permits USING gin (address_key gin_trgm_ops);
+CREATE INDEX idx_permits_address_key_missing ON permits(id) WHERE address_key IS NULL AND site_address IS NOT NULL;
 CREATE INDEX idx_permits_date ON permits(applied_date DESC);
+CREATE INDEX idx_permits_unlinked ON permits(id) WHERE linked_lead_id IS NULL;
+CREATE INDEX idx_permits_unattempted ON permits(id) WHERE linked_lead_id IS NULL AND link_attempted_at IS NULL;
+CREATE INDEX idx_permits_linked_lead ON permits(linked_lead_id);
 
 -- ============================================
 -- SCRAPING RUNS TABLE (audit trail)
@@ -190,9 +369,61 @@ CREATE TABLE IF NOT EXISTS scraping_runs (
     errors INTEGER DEFAULT 0,
     error_details TEXT,
     status VARCHAR(20) DEFAULT 'running',
+    -- Checkpoint for main_scraper.py --resume: the searched date window and the
+    -- last results page whose permits are stored
+    search_start DATE,
+    search_end DATE,
+    last_page INTEGER NOT NULL DEFAULT 0,
+    last_permit_number VARCHAR(50),
+    checkpointed_at TIMESTAMP,
     CONSTRAINT valid_run_status CHECK (status IN ('running', 'completed', 'failed'))
 );
 
+-- ============================================
+-- NAL FINGERPRINTS (delta imports between DOR releases)
+-- ============================================
+CREATE TABLE IF NOT EXISTS nal_fingerprints (
+    county VARCHAR(50) NOT NULL,
+    parcel_id VARCHAR(30) NOT NULL,
+    fingerprint BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (county, parcel_id)
+);
+
+-- ============================================
+-- REPORTING ROLLUPS (maintained by statement triggers on leads/interactions)
+-- ============================================
+-- Reports read these instead of scanning leads and interactions, so their
+-- cost doesn't grow with history. Days are Eastern calendar days.
+-- county is '' for leads without one.
+CREATE TABLE IF NOT EXISTS pipeline_rollup (
+    status VARCHAR(30) NOT NULL,
+    county VARCHAR(50) NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    do_not_call BOOLEAN NOT NULL,
+    lead_count BIGINT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (status, county, source, do_not_call)
+);
+
+CREATE TABLE IF NOT EXISTS lead_daily_rollup (
+    day DATE NOT NULL,
+    source VARCHAR(50) NOT NULL,
+    county VARCHAR(50) NOT NULL,
+    leads_created BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, source, county)
+);
+
+CREATE TABLE IF NOT EXISTS interaction_daily_rollup (
+    day DATE NOT NULL,
+    type VARCHAR(20) NOT NULL,
+    direction VARCHAR(10) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    interaction_count BIGINT NOT NULL DEFAULT 0,
+    duration_seconds_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, type, direction, status)
+);
+
 -- ============================================
 -- HELPER FUNCTIONS
 -- ============================================
@@ -215,9 +446,10 @@ CREATE OR REPLACE FUNCTION check_opt_out()
 RETURNS TRIGGER AS $$
 DECLARE
     lead_phone VARCHAR(20);
+    lead_phone_key VARCHAR(10);
 BEGIN
-    SELECT phone INTO lead_phone FROM leads WHERE id = NEW.lead_id;
-    IF EXISTS (SELECT 1 FROM opt_outs WHERE phone = lead_phone) THEN
+    SELECT phone, phone_key INTO lead_phone, lead_phone_key FROM leads WHERE id = NEW.lead_id;
+    IF EXISTS (SELECT 1 FROM opt_outs WHERE phone_key = lead_phone_key) THEN
         RAISE EXCEPTION 'Cannot contact opted-out number: %', lead_phone;
     END IF;
     RETURN NEW;
@@ -230,6 +462,29 @@ CREATE TRIGGER check_opt_out_before_interaction
     WHEN (NEW.direction = 'outbound')
     EXECUTE FUNCTION check_opt_out();
 
+-- Move transcripts written to interactions.transcript into the side store
+CREATE OR REPLACE FUNCTION store_interaction_transcript()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.transcript IS NOT NULL THEN
+        NEW.transcript_hash := encode(sha256(convert_to(NEW.transcript, 'UTF8')), 'hex');
+        NEW.transcript_chars := length(NEW.transcript);
+        -- Touch created_at on reuse: prune_transcripts skips bodies younger than a
+        -- day, and its DELETE waits on this row lock and rechecks the new value
+        INSERT INTO interaction_transcripts (hash, body, chars)
+        VALUES (NEW.transcript_hash, NEW.transcript, NEW.transcript_chars)
+        ON CONFLICT (hash) DO UPDATE SET created_at = NOW();
+        NEW.transcript := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fires after check_opt_out_before_interaction (triggers run in name order)
+CREATE TRIGGER interaction_transcript_store
+    BEFORE INSERT OR UPDATE OF transcript ON interactions
+    FOR EACH ROW EXECUTE FUNCTION store_interaction_transcript();
+
 -- Auto-add to opt_outs when lead status is do_not_call
 CREATE OR REPLACE FUNCTION sync_dnc_to_optouts()
 RETURNS TRIGGER AS $$
@@ -249,6 +504,65 @@ CREATE TRIGGER sync_dnc_trigger
     WHEN (NEW.do_not_call = true)
     EXECUTE FUNCTION sync_dnc_to_optouts();
 
+-- Publish every opt-out change so in-process caches stay exact (LISTEN opt_out_changes)
+CREATE OR REPLACE FUNCTION notify_opt_out_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('opt_out_changes', json_build_object('op', 'reload')::text);
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('opt_out_changes', json_build_object('op', 'delete', 'phone', OLD.phone)::text);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('opt_out_changes', json_build_object('op', 'add', 'phone', NEW.phone)::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER opt_out_notify
+    AFTER INSERT OR UPDATE OR DELETE ON opt_outs
+    FOR EACH ROW EXECUTE FUNCTION notify_opt_out_change();
+
+CREATE TRIGGER opt_out_notify_truncate
+    AFTER TRUNCATE ON opt_outs
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_opt_out_change();
+
+-- Publish follow-up schedule changes so the dispatcher's timer heap stays current
+-- (LISTEN follow_up_changes). "due" is epoch seconds; null means drop the entry.
+CREATE OR REPLACE FUNCTION notify_follow_up_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('follow_up_changes', json_build_object('id', OLD.id, 'due', NULL)::text);
+    ELSE
+        PERFORM pg_notify('follow_up_changes', json_build_object(
+            'id', NEW.id,
+            'due', CASE WHEN NEW.completed THEN NULL
+                        ELSE EXTRACT(EPOCH FROM NEW.scheduled_at::TIMESTAMPTZ) END
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER follow_up_notify
+    AFTER INSERT OR UPDATE OF scheduled_at, completed OR DELETE ON follow_ups
+    FOR EACH ROW EXECUTE FUNCTION notify_follow_up_change();
+
+-- Move a time that falls outside 8AM-8PM Eastern to the next 8AM Eastern
+CREATE OR REPLACE FUNCTION shift_into_calling_hours(ts TIMESTAMP)
+RETURNS TIMESTAMP AS $$
+    SELECT (CASE
+        WHEN local_ts::TIME < '08:00' THEN date_trunc('day', local_ts) + INTERVAL '8 hours'
+        WHEN local_ts::TIME >= '20:00' THEN date_trunc('day', local_ts) + INTERVAL '1 day 8 hours'
+        ELSE local_ts
+    END AT TIME ZONE 'America/New_York')::TIMESTAMP
+    FROM (SELECT ts::TIMESTAMPTZ AT TIME ZONE 'America/New_York' AS local_ts) t;
+$$ LANGUAGE sql STABLE;
+
 -- Count daily contact attempts (FTSA compliance: max 3 per 24h)
 CREATE OR REPLACE FUNCTION count_daily_contacts(p_lead_id INTEGER)
 RETURNS INTEGER AS $$
@@ -259,6 +573,205 @@ RETURNS INTEGER AS $$
       AND created_at > NOW() - INTERVAL '24 hours';
 $$ LANGUAGE sql STABLE;
 
+-- Recompute one lead's contact budget from its 3 most recent outbound contacts
+CREATE OR REPLACE FUNCTION refresh_contact_budget(p_lead_id INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    third_contact TIMESTAMP;
+BEGIN
+    -- Serialize per lead so concurrent inserts can't both miss each other's row
+    PERFORM pg_advisory_xact_lock(hashtext('contact_budget'), p_lead_id);
+
+    -- Only the last 24h can block, which also keeps this to the current partition(s)
+    SELECT created_at INTO third_contact
+    FROM interactions
+    WHERE lead_id = p_lead_id
+      AND direction = 'outbound'
+      AND created_at > NOW() - INTERVAL '24 hours'
+    ORDER BY created_at DESC
+    OFFSET 2 LIMIT 1;
+
+    IF third_contact IS NULL THEN
+        DELETE FROM contact_budget WHERE lead_id = p_lead_id;
+    ELSE
+        INSERT INTO contact_budget (lead_id, blocked_until)
+        VALUES (p_lead_id, third_contact + INTERVAL '24 hours')
+        ON CONFLICT (lead_id) DO UPDATE SET blocked_until = EXCLUDED.blocked_until;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_contact_budget()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF OLD.direction = 'outbound' THEN
+            PERFORM refresh_contact_budget(OLD.lead_id);
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    IF NEW.direction = 'outbound' THEN
+        PERFORM refresh_contact_budget(NEW.lead_id);
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF OLD.direction = 'outbound'
+           AND (OLD.lead_id <> NEW.lead_id OR NEW.direction <> 'outbound') THEN
+            PERFORM refresh_contact_budget(OLD.lead_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER contact_budget_trigger
+    AFTER INSERT OR UPDATE OF lead_id, direction, created_at OR DELETE ON interactions
+    FOR EACH ROW EXECUTE FUNCTION maintain_contact_budget();
+
+-- Seed budgets for any outbound history that predates the trigger
+INSERT INTO contact_budget (lead_id, blocked_until)
+SELECT lead_id, created_at + INTERVAL '24 hours'
+FROM (
+    SELECT lead_id, created_at,
+           ROW_NUMBER() OVER (PARTITION BY lead_id ORDER BY created_at DESC) AS rn
+    FROM interactions
+    WHERE direction = 'outbound' AND created_at IS NOT NULL
+) recent
+WHERE rn = 3
+ON CONFLICT (lead_id) DO NOTHING;
+
+-- Eastern calendar day of a (server-local) timestamp, for the reporting rollups
+CREATE OR REPLACE FUNCTION report_day(ts TIMESTAMP)
+RETURNS DATE AS $$
+    SELECT (ts::TIMESTAMPTZ AT TIME ZONE 'America/New_York')::DATE;
+$$ LANGUAGE sql STABLE;
+
+-- Apply a statement's changed rows to the rollups as +1/-1 deltas. The
+-- transition tables present depend on the event, so the delta source is
+-- chosen per TG_OP and the rollup upserts are shared.
+CREATE OR REPLACE FUNCTION maintain_lead_rollups()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta TEXT := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT n.*, 1 AS sign FROM new_rows n'
+        WHEN 'DELETE' THEN 'SELECT o.*, -1 AS sign FROM old_rows o'
+        ELSE 'SELECT n.*, 1 AS sign FROM new_rows n UNION ALL SELECT o.*, -1 FROM old_rows o'
+    END;
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO pipeline_rollup AS r (status, county, source, do_not_call, lead_count, score_sum)
+        SELECT status, COALESCE(county, ''), source, COALESCE(do_not_call, false),
+               SUM(sign), SUM(sign * COALESCE(renovation_score, 0))
+        FROM (%s) d
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(sign) <> 0 OR SUM(sign * COALESCE(renovation_score, 0)) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (status, county, source, do_not_call) DO UPDATE
+            SET lead_count = r.lead_count + EXCLUDED.lead_count,
+                score_sum = r.score_sum + EXCLUDED.score_sum
+    $q$, delta);
+
+    EXECUTE format($q$
+        INSERT INTO lead_daily_rollup AS r (day, source, county, leads_created)
+        SELECT report_day(created_at), source, COALESCE(county, ''), SUM(sign)
+        FROM (%s) d
+        WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3
+        HAVING SUM(sign) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (day, source, county) DO UPDATE
+            SET leads_created = r.leads_created + EXCLUDED.leads_created
+    $q$, delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_interaction_rollup()
+RETURNS TRIGGER AS $$
+DECLARE
+    delta TEXT := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT n.*, 1 AS sign FROM new_rows n'
+        WHEN 'DELETE' THEN 'SELECT o.*, -1 AS sign FROM old_rows o'
+        ELSE 'SELECT n.*, 1 AS sign FROM new_rows n UNION ALL SELECT o.*, -1 FROM old_rows o'
+    END;
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO interaction_daily_rollup AS r
+            (day, type, direction, status, interaction_count, duration_seconds_sum)
+        SELECT report_day(created_at), type, direction, status,
+               SUM(sign), SUM(sign * COALESCE(duration_seconds, 0))
+        FROM (%s) d
+        WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        HAVING SUM(sign) <> 0 OR SUM(sign * COALESCE(duration_seconds, 0)) <> 0
+        ORDER BY 1, 2, 3, 4
+        ON CONFLICT (day, type, direction, status) DO UPDATE
+            SET interaction_count = r.interaction_count + EXCLUDED.interaction_count,
+                duration_seconds_sum = r.duration_seconds_sum + EXCLUDED.duration_seconds_sum
+    $q$, delta);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One trigger per event, each declaring the transition tables that event provides
+CREATE TRIGGER lead_rollups_insert AFTER INSERT ON leads
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_lead_rollups();
+CREATE TRIGGER lead_rollups_update AFTER UPDATE ON leads
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_lead_rollups();
+CREATE TRIGGER lead_rollups_delete AFTER DELETE ON leads
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_lead_rollups();
+
+CREATE TRIGGER interaction_rollup_insert AFTER INSERT ON interactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+CREATE TRIGGER interaction_rollup_update AFTER UPDATE ON interactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+CREATE TRIGGER interaction_rollup_delete AFTER DELETE ON interactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+
+-- Recompute all rollups from the base tables (after TRUNCATE, or to verify drift).
+-- Interaction days up to the oldest attached row may include archived
+-- partitions and are kept as they are.
+CREATE OR REPLACE FUNCTION rebuild_rollups()
+RETURNS VOID AS $$
+DECLARE
+    oldest TIMESTAMP;
+BEGIN
+    LOCK TABLE leads, interactions IN SHARE MODE;
+    TRUNCATE pipeline_rollup, lead_daily_rollup;
+
+    -- The oldest attached day may be split with an archived partition; keep it too
+    SELECT MIN(created_at) INTO oldest FROM interactions;
+    DELETE FROM interaction_daily_rollup WHERE day > report_day(oldest);
+
+    INSERT INTO pipeline_rollup (status, county, source, do_not_call, lead_count, score_sum)
+    SELECT status, COALESCE(county, ''), source, COALESCE(do_not_call, false),
+           COUNT(*), SUM(COALESCE(renovation_score, 0))
+    FROM leads GROUP BY 1, 2, 3, 4;
+
+    INSERT INTO lead_daily_rollup (day, source, county, leads_created)
+    SELECT report_day(created_at), source, COALESCE(county, ''), COUNT(*)
+    FROM leads WHERE created_at IS NOT NULL GROUP BY 1, 2, 3;
+
+    INSERT INTO interaction_daily_rollup (day, type, direction, status, interaction_count, duration_seconds_sum)
+    SELECT report_day(created_at), type, direction, status, COUNT(*), SUM(COALESCE(duration_seconds, 0))
+    FROM interactions WHERE report_day(created_at) > report_day(oldest) GROUP BY 1, 2, 3, 4;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_rollups();
+
+-- Top-N candidates in score order; the view below walks this index and stops at LIMIT
+CREATE INDEX idx_leads_contactable ON leads(renovation_score DESC, created_at ASC)
+    WHERE do_not_call = false
+      AND phone IS NOT NULL
+      AND status NOT IN ('do_not_call', 'closed_won', 'closed_lost');
+
 -- View: leads ready to contact
 CREATE OR REPLACE VIEW contactable_leads AS
 SELECT l.*
@@ -266,6 +779,13 @@ FROM leads l
 WHERE l.status NOT IN ('do_not_call', 'closed_won', 'closed_lost')
   AND l.do_not_call = false
   AND l.phone IS NOT NULL
-  AND NOT EXISTS (SELECT 1 FROM opt_outs o WHERE o.phone = l.phone)
-  AND count_daily_contacts(l.id) < 3
+  AND NOT EXISTS (SELECT 1 FROM opt_outs o WHERE o.phone_key = l.phone_key)
+  AND NOT EXISTS (
+      SELECT 1 FROM contact_budget b
+      WHERE b.lead_id = l.id AND b.blocked_until > NOW()
+  )
+  AND NOT EXISTS (
+      SELECT 1 FROM lead_leases ll
+      WHERE ll.lead_id = l.id AND ll.leased_until > NOW()
+  )
 ORDER BY l.renovation_score DESC, l.created_at ASC;
@@ -23,7 +23,7 @@ import pdfplumber
 
 # Add scraper directory to path for shared modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "scraper"))
-from db import insert_lead
+from db import insert_leads_batch
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -251,12 +251,9 @@ def process_path(path: str) -> dict:
         leads = extract_leads_from_pdf(str(pdf_file))
         stats["leads_found"] += len(leads)
 
-        for lead in leads:
-            result = insert_lead(lead)
-            if result:
-                stats["leads_inserted"] += 1
-            else:
-                stats["leads_skipped"] += 1
+        inserted, skipped, _ = insert_leads_batch(leads)
+        stats["leads_inserted"] += inserted
+        stats["leads_skipped"] += skipped
 
     return stats
 
@@ -0,0 +1,124 @@
+-- ============================================
+-- Upgrade: move an existing interactions table to monthly partitions
+-- ============================================
+-- For databases created before interactions was range-partitioned on
+-- created_at (id alone was the primary key and created_at was nullable).
+-- schema.sql only runs against a fresh database, so apply this once:
+--
+--   psql -U empire -d empire_leads -v ON_ERROR_STOP=1 -f database/upgrade_partitioned_interactions.sql
+--
+-- First create whatever the database is missing from schema.sql: the
+-- interaction_transcripts table and the ensure_interaction_partitions(),
+-- store_interaction_transcript(), maintain_contact_budget() and
+-- maintain_interaction_rollup() functions. The script checks for them.
+--
+-- It runs in one transaction holding an ACCESS EXCLUSIVE lock on
+-- interactions, so writers wait until it commits. Rows are copied before the
+-- new table has triggers: the contact budgets and reporting rollups already
+-- count them, and old outbound rows to numbers opted out since must not be
+-- rejected. Inline transcripts move to interaction_transcripts on the way.
+-- Rows with a NULL created_at get the upgrade time (created_at is NOT NULL now).
+
+BEGIN;
+
+LOCK TABLE interactions IN ACCESS EXCLUSIVE MODE;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'interactions'::regclass) = 'p' THEN
+        RAISE EXCEPTION 'interactions is already partitioned';
+    END IF;
+    IF to_regclass('interaction_transcripts') IS NULL
+       OR to_regproc('ensure_interaction_partitions') IS NULL
+       OR to_regproc('store_interaction_transcript') IS NULL
+       OR to_regproc('maintain_contact_budget') IS NULL
+       OR to_regproc('maintain_interaction_rollup') IS NULL THEN
+        RAISE EXCEPTION 'Create interaction_transcripts and the interactions functions from schema.sql first';
+    END IF;
+END $$;
+
+-- Free the names the partitioned table and its indexes take over
+ALTER TABLE interactions RENAME TO interactions_unpartitioned;
+ALTER TABLE interactions_unpartitioned RENAME CONSTRAINT interactions_pkey TO interactions_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_interactions_lead, idx_interactions_created, idx_interactions_type,
+    idx_interactions_lead_outbound, idx_interactions_transcript;
+-- Keep the id sequence so new ids continue after the copied ones
+ALTER SEQUENCE interactions_id_seq OWNED BY NONE;
+
+CREATE TABLE interactions (
+    id INTEGER NOT NULL DEFAULT nextval('interactions_id_seq'),
+    lead_id INTEGER NOT NULL REFERENCES leads(id) ON DELETE CASCADE,
+    type VARCHAR(20) NOT NULL,
+    direction VARCHAR(10) NOT NULL DEFAULT 'outbound',
+    status VARCHAR(20) NOT NULL,
+    duration_seconds INTEGER,
+    transcript TEXT,
+    transcript_hash CHAR(64),
+    transcript_chars INTEGER,
+    sms_content TEXT,
+    notes TEXT,
+    twilio_sid VARCHAR(50),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at),
+    CONSTRAINT valid_type CHECK (type IN ('call', 'sms', 'voicemail', 'email')),
+    CONSTRAINT valid_direction CHECK (direction IN ('outbound', 'inbound')),
+    CONSTRAINT valid_interaction_status CHECK (status IN (
+        'completed', 'no_answer', 'busy', 'failed',
+        'voicemail', 'opted_out', 'delivered', 'undelivered'
+    ))
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE interactions_id_seq OWNED BY interactions.id;
+
+CREATE TABLE interactions_default PARTITION OF interactions DEFAULT;
+SELECT ensure_interaction_partitions(2, (SELECT MIN(created_at) FROM interactions_unpartitioned));
+
+INSERT INTO interaction_transcripts (hash, body, chars)
+SELECT DISTINCT ON (hash) hash, transcript, length(transcript)
+FROM (
+    SELECT encode(sha256(convert_to(transcript, 'UTF8')), 'hex') AS hash, transcript
+    FROM interactions_unpartitioned
+    WHERE transcript IS NOT NULL
+) t
+ON CONFLICT (hash) DO NOTHING;
+
+INSERT INTO interactions (
+    id, lead_id, type, direction, status, duration_seconds,
+    transcript_hash, transcript_chars, sms_content, notes, twilio_sid, created_at
+)
+SELECT id, lead_id, type, direction, status, duration_seconds,
+       encode(sha256(convert_to(transcript, 'UTF8')), 'hex'), length(transcript),
+       sms_content, notes, twilio_sid, COALESCE(created_at, NOW())
+FROM interactions_unpartitioned;
+
+DROP TABLE interactions_unpartitioned;
+
+CREATE INDEX idx_interactions_lead ON interactions(lead_id);
+CREATE INDEX idx_interactions_created ON interactions(created_at);
+CREATE INDEX idx_interactions_type ON interactions(type);
+CREATE INDEX idx_interactions_lead_outbound ON interactions(lead_id, created_at DESC)
+    WHERE direction = 'outbound';
+CREATE INDEX idx_interactions_transcript ON interactions(transcript_hash) WHERE transcript_hash IS NOT NULL;
+
+CREATE TRIGGER check_opt_out_before_interaction
+    BEFORE INSERT ON interactions
+    FOR EACH ROW
+    WHEN (NEW.direction = 'outbound')
+    EXECUTE FUNCTION check_opt_out();
+CREATE TRIGGER interaction_transcript_store
+    BEFORE INSERT OR UPDATE OF transcript ON interactions
+    FOR EACH ROW EXECUTE FUNCTION store_interaction_transcript();
+CREATE TRIGGER contact_budget_trigger
+    AFTER INSERT OR UPDATE OF lead_id, direction, created_at OR DELETE ON interactions
+    FOR EACH ROW EXECUTE FUNCTION maintain_contact_budget();
+CREATE TRIGGER interaction_rollup_insert AFTER INSERT ON interactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+CREATE TRIGGER interaction_rollup_update AFTER UPDATE ON interactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+CREATE TRIGGER interaction_rollup_delete AFTER DELETE ON interactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION maintain_interaction_rollup();
+
+COMMIT;
@@ -0,0 +1,329 @@
+"""HTTP-only client for Accela Citizen Access permit searches.
+
+Accela pages are ASP.NET WebForms: every search and every results page is a
+form POST that echoes the hidden __VIEWSTATE/__EVENTVALIDATION fields of the
+previous response, with __EVENTTARGET naming the control that was "clicked"
+(the javascript:__doPostBack(...) target of the button or pager link). The
+client replays those postbacks over one keep-alive requests.Session, so a
+search costs a few small HTTP round trips instead of a Chrome start plus page
+rendering. It returns raw results-page HTML; parsing stays with the county
+scraper.
+
+AccelaError means the portal answered with something the client can't drive
+(layout change, error page); callers fall back to Selenium.
+
+    python accela_client.py bench [--pages N] [--selenium]
+
+runs the client (and optionally the Selenium scraper) against a local
+stand-in portal and checks the permits it returns against the fixture.
+"""
+
+import re
+import time
+import logging
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+
+from politeness import HostThrottle, host_throttle
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+# General search form (Cap/CapHome.aspx); the same on every Accela agency
+START_DATE_FIELD = "ctl00$PlaceHolderMain$generalSearchForm$txtGSStartDate"
+END_DATE_FIELD = "ctl00$PlaceHolderMain$generalSearchForm$txtGSEndDate"
+SEARCH_BUTTON_ID = "ctl00_PlaceHolderMain_btnNewSearch"
+RESULTS_GRID = "table.ACA_Grid_OverFlow"
+NO_RESULTS_TEXT = "returned no results"
+
+_POSTBACK = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
+
+
+class AccelaError(Exception):
+    """The portal returned a page the HTTP client doesn't understand."""
+
+
+class AccelaClient:
+    """One search session against an Accela portal (not thread-safe)."""
+
+    def __init__(self, url: str, throttle: HostThrottle = None, timeout: float = 30):
+        self.url = url
+        self.throttle = throttle or host_throttle(url)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        # Retries cover connection drops and 5xx on the initial GET; postbacks are
+        # not retried because a replayed ViewState may no longer be valid
+        retry = Retry(total=3, backoff_factor=1, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._soup = None
+        self._page_url = None
+        # Set when the last iter_result_pages stopped at max_pages with pages left
+        self.truncated = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def iter_result_pages(self, start_date: str, end_date: str, max_pages: int = 20):
+        """Yield the HTML of each results page for a MM/DD/YYYY date range."""
+        self.truncated = False
+        html = self.search(start_date, end_date)
+        page = 1
+        while html is not None:
+            yield html
+            if page >= max_pages:
+                if self._next_link() is not None:
+                    self.truncated = True
+                    logger.warning(f"Accela search {start_date}-{end_date} truncated at max_pages={max_pages}")
+                return
+            html = self.next_page()
+            page += 1
+
+    def search(self, start_date: str, end_date: str) -> str | None:
+        """Run the general search; returns the first results page (None if no results)."""
+        self.throttle.wait()
+        self._load(self.session.get(self.url, timeout=self.timeout))
+        button = self._soup.find(id=SEARCH_BUTTON_ID)
+        if button is None:
+            raise AccelaError(f"Search button {SEARCH_BUTTON_ID} not found")
+        self._postback(button, {START_DATE_FIELD: start_date, END_DATE_FIELD: end_date})
+        return self._results_html()
+
+    def next_page(self) -> str | None:
+        """Follow the pager's Next link; None on the last page."""
+        link = self._next_link()
+        if link is None:
+            return None
+        self._postback(link)
+        return self._results_html()
+
+    def _next_link(self):
+        return self._soup.find("a", class_="aca_pagination_PrevNext", string=lambda text: text and "Next" in text)
+
+    def _postback(self, control, overrides: dict = None):
+        """Submit the current page's form as if `control` had been clicked."""
+        form = self._soup.find("form")
+        if form is None:
+            raise AccelaError("No form on page")
+        fields = _form_fields(form)
+        fields.update(overrides or {})
+
+        if control.name == "input":
+            fields[control["name"]] = control.get("value", "")
+            fields.setdefault("__EVENTTARGET", "")
+        else:
+            match = _POSTBACK.search(control.get("href", "") + control.get("onclick", ""))
+            if match is None:
+                raise AccelaError(f"Control {control.get('id')} is not a postback")
+            fields["__EVENTTARGET"], fields["__EVENTARGUMENT"] = match.groups()
+
+        action = urljoin(self._page_url, form.get("action") or self._page_url)
+        self.throttle.wait()
+        self._load(self.session.post(action, data=fields, headers={"Referer": self._page_url}, timeout=self.timeout))
+
+    def _load(self, response: requests.Response):
+        response.raise_for_status()
+        soup = BeautifulSoup(response.text, "lxml")
+        if soup.find("input", attrs={"name": "__VIEWSTATE"}) is None:
+            raise AccelaError(f"No __VIEWSTATE in response from {response.url}")
+        self._soup = soup
+        self._page_url = response.url
+
+    def _results_html(self) -> str | None:
+        if self._soup.select_one(RESULTS_GRID) is not None:
+            return str(self._soup)
+        if NO_RESULTS_TEXT in self._soup.get_text(" ").lower():
+            return None
+        raise AccelaError("Neither a results grid nor a no-results message on the page")
+
+
+def _form_fields(form) -> dict:
+    """Successful controls of a form the way a browser submits them (minus buttons)."""
+    fields = {}
+    for element in form.find_all(["input", "select", "textarea"]):
+        name = element.get("name")
+        if not name or element.has_attr("disabled"):
+            continue
+        if element.name == "select":
+            option = element.find("option", selected=True) or element.find("option")
+            fields[name] = option.get("value", option.get_text()) if option else ""
+        elif element.name == "textarea":
+            fields[name] = element.get_text()
+        else:
+            kind = element.get("type", "text").lower()
+            if kind in ("submit", "button", "image", "reset", "file"):
+                continue
+            if kind in ("checkbox", "radio") and not element.has_attr("checked"):
+                continue
+            fields[name] = element.get("value", "on" if kind in ("checkbox", "radio") else "")
+    return fields
+
+
+# --- Local stand-in portal (bench) ---
+
+_STANDIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Accela Citizen Access</title>
+<script>function __doPostBack(t, a) {{ var f = document.forms[0];
+f.__EVENTTARGET.value = t; f.__EVENTARGUMENT.value = a; f.submit(); }}</script></head>
+<body><form method="post" action="CapHome.aspx?module=Permitting&amp;TabName=Home" id="aspnetForm">
+<input type="hidden" name="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" value="A1B2C3D4" />
+<input type="hidden" name="__EVENTVALIDATION" value="{validation}" />
+<input type="text" id="ctl00_PlaceHolderMain_generalSearchForm_txtGSStartDate" name="{start_field}" value="{start}" />
+<input type="text" id="ctl00_PlaceHolderMain_generalSearchForm_txtGSEndDate" name="{end_field}" value="{end}" />
+<a id="{button_id}" href="javascript:__doPostBack('ctl00$PlaceHolderMain$btnNewSearch','')">Search</a>
+{results}
+</form></body></html>"""
+
+# All renovation types, so every fixture permit survives the scraper's filter
+_STANDIN_TYPES = ["Residential Alteration", "Re-Roof", "Residential Addition", "Interior Remodel"]
+
+
+def _standin_permits(pages: int, per_page: int = 10) -> list[dict]:
+    return [
+        {
+            "permit_number": f"RES2025-{n:05d}",
+            "permit_type": _STANDIN_TYPES[n % len(_STANDIN_TYPES)],
+            "description": f"Work at lot {n}",
+            "site_address": f"{100 + n} Palm Ave, Cape Coral FL 33904",
+            "status": "Issued",
+            "applied_date": "01/15/2025",
+        }
+        for n in range(pages * per_page)
+    ]
+
+
+def _standin_server(pages: int, per_page: int = 10):
+    """Serve a minimal Accela search flow that enforces ViewState round-tripping."""
+    import secrets
+    import threading
+    from html import escape
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    permits = _standin_permits(pages, per_page)
+    states = {}  # viewstate -> (page shown, event validation token)
+
+    def render(page: int, start: str = "", end: str = "") -> bytes:
+        viewstate, validation = secrets.token_hex(64), secrets.token_hex(16)
+        states[viewstate] = (page, validation)
+        results = ""
+        if page:
+            rows = "".join(
+                f'<tr class="ACA_TabRow_{"Odd" if i % 2 else "Even"}"><td><input type="checkbox" /></td>'
+                + "".join(f"<td>{escape(p[k])}</td>" for k in (
+                    "permit_number", "permit_type", "description", "site_address", "status", "applied_date"
+                ))
+                + "</tr>"
+                for i, p in enumerate(permits[(page - 1) * per_page:page * per_page])
+            )
+            pager = (
+                f"<a class=\"aca_pagination_PrevNext\" href=\"javascript:__doPostBack("
+                f"'ctl00$PlaceHolderMain$dgvPermitList$gdvPermitList','Page${page + 1}')\">Next &gt;</a>"
+                if page < pages else ""
+            )
+            results = f'<table class="ACA_Grid_OverFlow">{rows}</table>{pager}'
+        return _STANDIN_PAGE.format(
+            viewstate=viewstate, validation=validation, start_field=START_DATE_FIELD, end_field=END_DATE_FIELD,
+            start=escape(start), end=escape(end), button_id=SEARCH_BUTTON_ID, results=results,
+        ).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._send(200, render(0))
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode(), keep_blank_values=True).items()}
+            state = states.get(form.get("__VIEWSTATE"))
+            if state is None or form.get("__EVENTVALIDATION") != state[1]:
+                self._send(500, b"<h1>Server Error in '/' Application.</h1> Invalid postback or callback argument.")
+                return
+            start, end = form.get(START_DATE_FIELD, ""), form.get(END_DATE_FIELD, "")
+            target = form.get("__EVENTTARGET")
+            if target == "ctl00$PlaceHolderMain$btnNewSearch" and start and end:
+                page = 1
+            elif target.endswith("gdvPermitList") and form.get("__EVENTARGUMENT") == f"Page${state[0] + 1}":
+                page = state[0] + 1
+            else:
+                self._send(500, b"<h1>Server Error in '/' Application.</h1> Unexpected postback.")
+                return
+            self._send(200, render(page, start, end))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/LEECO/Cap/CapHome.aspx?module=Permitting&TabName=Home"
+    return server, url, permits
+
+
+def benchmark_standin(pages: int = 10, selenium: bool = False) -> dict:
+    """Time the HTTP client (and optionally Selenium) against the stand-in portal."""
+    from lee_county import _parse_results_html, _search_selenium
+
+    server, url, fixture = _standin_server(pages)
+    expected = {p["permit_number"] for p in fixture}
+    results = {"pages": pages, "expected_permits": len(expected)}
+
+    try:
+        start = time.perf_counter()
+        with AccelaClient(url, throttle=HostThrottle("stand-in", 0, 1)) as client:
+            found = [p for html in client.iter_result_pages("01/01/2025", "01/31/2025", pages)
+                     for p in _parse_results_html(html)]
+        results["http_seconds"] = round(time.perf_counter() - start, 3)
+        results["http_ok"] = {p["permit_number"] for p in found} == expected and len(found) == len(expected)
+
+        if selenium:
+            start = time.perf_counter()
+            found, _ = _search_selenium("01/01/2025", "01/31/2025", pages, url=url)
+            results["selenium_seconds"] = round(time.perf_counter() - start, 3)
+            results["selenium_ok"] = {p["permit_number"] for p in found} == expected
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Accela HTTP client")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="Check and time the client against a local stand-in portal")
+    bench.add_argument("--pages", type=int, default=10)
+    bench.add_argument("--selenium", action="store_true", help="Also time the Selenium scraper (needs Chrome)")
+
+    args = parser.parse_args()
+    result = benchmark_standin(args.pages, args.selenium)
+    print(f"Result: {result}")
+    sys.exit(0 if result["http_ok"] and result.get("selenium_ok", True) else 1)
@@ -0,0 +1,135 @@
+"""Canonical address keys for matching leads and permits across sources.
+
+Accela, CityView, NAL (title-cased S_ADDR) and PDF imports all spell the
+same street address differently. normalize_address() reduces them to one
+key, e.g.:
+
+    "123 North Main Street, Apt 4B, Cape Coral FL 33904" -> "123 N MAIN ST UNIT 4B"
+    "123 n. main st #4b"                                 -> "123 N MAIN ST UNIT 4B"
+
+Every ingest path stores this key in leads.address_key / permits.address_key,
+so lookups and joins by address use plain indexes.
+"""
+
+import re
+
+DIRECTIONALS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+    "N": "N", "S": "S", "E": "E", "W": "W",
+    "NE": "NE", "NW": "NW", "SE": "SE", "SW": "SW",
+}
+
+# USPS Publication 28 suffixes common in Lee and Collier County
+STREET_SUFFIXES = {
+    "ALLEY": "ALY", "AVENUE": "AVE", "AV": "AVE", "AVE": "AVE",
+    "BOULEVARD": "BLVD", "BLVD": "BLVD", "BEND": "BND", "BND": "BND",
+    "CIRCLE": "CIR", "CIR": "CIR", "CIRCLES": "CIRS", "COURT": "CT", "CT": "CT",
+    "COVE": "CV", "CV": "CV", "CRESCENT": "CRES", "CRES": "CRES",
+    "CROSSING": "XING", "XING": "XING", "DRIVE": "DR", "DR": "DR",
+    "EXPRESSWAY": "EXPY", "EXPY": "EXPY", "HIGHWAY": "HWY", "HWY": "HWY",
+    "ISLAND": "IS", "IS": "IS", "LANE": "LN", "LN": "LN", "LOOP": "LOOP",
+    "PARKWAY": "PKWY", "PKWY": "PKWY", "PKY": "PKWY", "PASS": "PASS",
+    "PATH": "PATH", "PLACE": "PL", "PL": "PL", "PLAZA": "PLZ", "PLZ": "PLZ",
+    "POINT": "PT", "PT": "PT", "ROAD": "RD", "RD": "RD", "RUN": "RUN",
+    "SQUARE": "SQ", "SQ": "SQ", "STREET": "ST", "ST": "ST", "STR": "ST",
+    "TERRACE": "TER", "TER": "TER", "TRAIL": "TRL", "TRL": "TRL",
+    "TRACE": "TRCE", "TRCE": "TRCE", "WAY": "WAY", "WY": "WAY",
+}
+
+UNIT_DESIGNATORS = {
+    "APT", "APARTMENT", "UNIT", "STE", "SUITE", "BLDG", "BUILDING",
+    "LOT", "RM", "ROOM", "FL", "FLOOR", "SPC", "SPACE", "#",
+}
+
+_UNIT_PATTERN = re.compile(
+    r"(?:^|\s)(" + "|".join(sorted((re.escape(u) for u in UNIT_DESIGNATORS), key=len, reverse=True))
+    + r")\s*#?\s*([A-Z0-9-]+)\s*$"
+)
+
+# Cities that trail comma-less site addresses ("123 MAIN ST CAPE CORAL FL 33904")
+SWFL_CITIES = [
+    "NORTH FORT MYERS", "FORT MYERS BEACH", "FORT MYERS", "FT MYERS", "CAPE CORAL",
+    "LEHIGH ACRES", "BONITA SPRINGS", "ESTERO", "NAPLES", "MARCO ISLAND", "IMMOKALEE",
+    "GOLDEN GATE", "SANIBEL", "PINE ISLAND", "MATLACHA", "AVE MARIA", "EVERGLADES CITY",
+]
+
+_TRAILING_CITY = re.compile(r"\s(?:" + "|".join(SWFL_CITIES) + r")\s*$")
+_TRAILING_STATE_ZIP = re.compile(r"\s+FL(?:ORIDA)?(?:\s+\d{5}(?:-\d{4})?)?\s*$|\s+\d{5}(?:-\d{4})?\s*$")
+
+
+def _clean(text: str) -> str:
+    text = text.replace("#", " # ")
+    text = re.sub(r"[^A-Z0-9#\s-]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _ends_with_suffix(text: str) -> bool:
+    """True when text ends in a street suffix, optionally followed by a directional."""
+    words = text.split()
+    if words and words[-1] in DIRECTIONALS:
+        words = words[:-1]
+    return len(words) >= 2 and words[-1] in STREET_SUFFIXES
+
+
+def _trailing_unit(street: str) -> re.Match | None:
+    """A unit designator ending the street, if it follows the suffix ("12 LOT LN" has none)."""
+    match = _UNIT_PATTERN.search(street)
+    if match and (match.group(1) == "#" or _ends_with_suffix(street[: match.start()])):
+        return match
+    return None
+
+
+def normalize_address(raw: str | None) -> str | None:
+    """
+    Canonical street-address key: uppercase, standard directionals and
+    suffixes, unit number as a trailing "UNIT x", city/state/zip removed.
+
+    Unit designators ("LOT", "FL", ...) and trailing city names only count
+    after a street suffix or a comma, so "12 Lot Ln" and "123 Estero" keep
+    their words. Returns None when there is no house-number street address.
+    """
+    if not raw:
+        return None
+
+    # Street part only: city/state/zip usually follow the first comma, unless
+    # the comma separates the unit ("123 Main St, Apt 4")
+    parts = [p.strip() for p in str(raw).upper().split(",")]
+    unit = None
+    if len(parts) > 1:
+        match = _UNIT_PATTERN.match(_clean(_TRAILING_STATE_ZIP.sub("", " " + parts[1])))
+        if match:
+            unit = match.group(2)
+
+    street = _TRAILING_STATE_ZIP.sub("", _clean(parts[0]))
+    city = _TRAILING_CITY.search(street)
+    if city:
+        before = street[: city.start()]
+        if _ends_with_suffix(before) or _trailing_unit(before):
+            street = before
+
+    match = _trailing_unit(street)
+    if match:
+        unit = match.group(2)
+        street = street[: match.start()].strip()
+    if unit:
+        unit = unit.strip("-")
+
+    words = street.split()
+    if not words or not words[0][0].isdigit():
+        return None
+
+    out = [words[0]]
+    last = len(words) - 1
+    for i, word in enumerate(words[1:], 1):
+        # "1 North Rd": a directional is only a prefix when a name and suffix follow
+        if word in DIRECTIONALS and ((i == 1 and last >= 3) or (i == last and i >= 3)):
+            out.append(DIRECTIONALS[word])
+        elif word in STREET_SUFFIXES and i >= 2 and (i == last or words[i + 1] in DIRECTIONALS):
+            out.append(STREET_SUFFIXES[word])
+        else:
+            out.append(word)
+
+    if unit:
+        out += ["UNIT", unit]
+    return " ".join(out)
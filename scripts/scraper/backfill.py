@@ -0,0 +1,140 @@
+"""Historical permit backfill over a long date range.
+
+A single portal search stops at max_pages, so a year in one search would
+silently truncate. The range is instead cut into windows of
+BACKFILL_WINDOW_DAYS per county. A window whose search still hits the page
+cap is split in half and searched again (down to single days), so every
+window stored fits under the cap.
+
+Windows from all counties run in one thread pool of BACKFILL_CONCURRENCY
+sessions; each host's throttle (politeness.host_throttle) still caps its
+concurrent sessions and request rate. Finished windows are deduped on
+permit_number across the whole backfill and upserted as they complete, so
+an interrupted backfill keeps what it already fetched. One scraping_runs
+row per county records the totals.
+"""
+
+import os
+import time
+import logging
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from counties import COUNTY_SEARCHES, county_name
+from db import insert_permits_batch, log_scraping_run, complete_scraping_run
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_WINDOW_DAYS = int(os.getenv("BACKFILL_WINDOW_DAYS", "7"))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+# Page cap per window search; windows that reach it are split
+BACKFILL_MAX_PAGES = int(os.getenv("BACKFILL_MAX_PAGES", "50"))
+
+
+def date_windows(start: date, end: date, days: int) -> list[tuple[date, date]]:
+    """Consecutive inclusive windows of at most `days` days covering start..end."""
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=days - 1), end)
+        windows.append((start, window_end))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+def split_window(start: date, end: date) -> list[tuple[date, date]]:
+    """Halve an inclusive window (a single day can't be split)."""
+    if start >= end:
+        return [(start, end)]
+    middle = start + (end - start) // 2
+    return [(start, middle), (middle + timedelta(days=1), end)]
+
+
+def run_backfill(
+    start: date,
+    end: date,
+    counties: list[str] = None,
+    window_days: int = BACKFILL_WINDOW_DAYS,
+    concurrency: int = BACKFILL_CONCURRENCY,
+    max_pages: int = BACKFILL_MAX_PAGES,
+) -> dict:
+    """
+    Scrape every permit between start and end (inclusive) for the given counties.
+
+    Returns:
+        Dict per county: windows searched and split, permits found and stored,
+        plus any windows that failed or stayed truncated at a single day
+    """
+    counties = counties or list(COUNTY_SEARCHES)
+    started = time.time()
+    results = {
+        county: {
+            "run_id": log_scraping_run(f"{county}_county_backfill"),
+            "windows": 0, "splits": 0, "found": 0, "unique": 0, "new": 0, "updated": 0,
+            "failed_windows": [], "truncated_days": [],
+        }
+        for county in counties
+    }
+    seen = {county: set() for county in counties}
+
+    # Interleave counties so the pool doesn't queue behind one host's session cap
+    windows = date_windows(start, end, window_days)
+    queue = [(county, window) for window in windows for county in counties]
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="backfill") as executor:
+        futures = {}
+
+        def submit(county: str, window: tuple[date, date]):
+            future = executor.submit(COUNTY_SEARCHES[county], window[0], window[1], max_pages)
+            futures[future] = (county, window)
+
+        for county, window in queue:
+            submit(county, window)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                county, window = futures.pop(future)
+                stats = results[county]
+                label = f"{county_name(county)} {window[0]}..{window[1]}"
+                try:
+                    permits, truncated = future.result()
+                except Exception as e:
+                    logger.error(f"Backfill window {label} failed: {e}")
+                    stats["failed_windows"].append(f"{window[0]}..{window[1]}: {e}")
+                    continue
+
+                if truncated and window[0] < window[1]:
+                    # Over the page cap: search both halves instead
+                    stats["splits"] += 1
+                    for half in split_window(*window):
+                        submit(county, half)
+                    continue
+                if truncated:
+                    logger.warning(f"Backfill window {label} exceeds {max_pages} pages even for one day")
+                    stats["truncated_days"].append(str(window[0]))
+
+                fresh = [p for p in permits if p.get("permit_number") and p["permit_number"] not in seen[county]]
+                seen[county].update(p["permit_number"] for p in fresh)
+                new_count, updated_count, _ = insert_permits_batch(fresh) if fresh else (0, 0, 0)
+
+                stats["windows"] += 1
+                stats["found"] += len(permits)
+                stats["unique"] = len(seen[county])
+                stats["new"] += new_count
+                stats["updated"] += updated_count
+                logger.info(f"Backfill window {label}: {len(permits)} permits, {len(fresh)} unseen, {new_count} new")
+
+    for county, stats in results.items():
+        problems = stats["failed_windows"] + [f"{day}: truncated" for day in stats["truncated_days"]]
+        complete_scraping_run(
+            stats["run_id"],
+            records_found=stats["unique"],
+            records_new=stats["new"],
+            records_updated=stats["updated"],
+            errors=len(problems),
+            error_details="\n".join(problems) or None,
+            status="failed" if stats["failed_windows"] and not stats["windows"] else "completed",
+        )
+    results["seconds"] = round(time.time() - started, 1)
+    logger.info(f"Backfill {start}..{end} complete: {results}")
+    return results
@@ -0,0 +1,239 @@
+"""Shared pool of warm headless Chrome drivers for the Selenium scrapers.
+
+Starting Chrome is the slowest part of a Selenium scrape, so drivers are
+kept after use and handed to the next scrape, whichever county it is for.
+Each driver blocks images, fonts, media, stylesheets and analytics through
+the DevTools Network domain, so a portal page costs only its HTML and
+scripts. A driver is recycled (quit and replaced on next use) after
+BROWSER_MAX_PAGES pages, when its Chrome process tree grows past
+BROWSER_MAX_RSS_MB, after it raised, or after sitting idle for
+BROWSER_IDLE_SECONDS.
+
+    pool = get_browser_pool()
+    with pool.browser() as browser:
+        browser.driver.get(url)
+        ...
+        browser.count_page()
+
+Every lease logs its pages per minute and Chrome RSS and returns them in
+browser.stats.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+BROWSER_IDLE_SECONDS = int(os.getenv("BROWSER_IDLE_SECONDS", "900"))
+
+# Requests the scrapers never need (Network.setBlockedURLs wildcard patterns)
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*.css",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*newrelic.com*", "*nr-data.net*",
+]
+
+
+def new_chrome_driver() -> webdriver.Chrome:
+    """Create a headless Chrome WebDriver with non-essential resources blocked."""
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument(
+        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    )
+    # Images are also refused at the content-settings level (covers data and CSS images)
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    try:
+        import undetected_chromedriver as uc
+        driver = uc.Chrome(options=options, headless=True)
+    except ImportError:
+        service = Service()
+        driver = webdriver.Chrome(service=service, options=options)
+
+    driver.implicitly_wait(10)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+def _process_tree_rss(pid: int) -> int:
+    """Resident bytes of a process and all its descendants (0 where /proc is unavailable)."""
+    children: dict[int, list[int]] = {}
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # Field 4 is the parent pid; split after the ")" closing the command name
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return 0
+
+    total, stack = 0, [pid]
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+class PooledBrowser:
+    """A pooled driver plus the page count and timing of the current lease."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.total_pages = 0
+        self.pages = 0
+        self.leased_at = 0.0
+        self.released_at = time.monotonic()
+        self.broken = False
+        self.stats = {}
+
+    def count_page(self, n: int = 1):
+        """Record that the scraper loaded another page (drives recycling and stats)."""
+        self.pages += n
+        self.total_pages += n
+
+    def rss_bytes(self) -> int:
+        service = getattr(self.driver, "service", None)
+        process = getattr(service, "process", None)
+        return _process_tree_rss(process.pid) if process is not None else 0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting Chrome: {e}")
+
+
+class BrowserPool:
+    """Thread-safe pool of at most `size` Chrome drivers."""
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_rss_mb: int = BROWSER_MAX_RSS_MB,
+        idle_seconds: int = BROWSER_IDLE_SECONDS,
+        factory=new_chrome_driver,
+    ):
+        self.max_pages = max_pages
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.idle_seconds = idle_seconds
+        self._factory = factory
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: list[PooledBrowser] = []
+        self.stats = {"started": 0, "reused": 0, "recycled": 0}
+
+    @contextmanager
+    def browser(self):
+        """Lease a warm driver (starting one if none is idle) for the duration of the block."""
+        self._slots.acquire()
+        try:
+            browser = self._acquire()
+            try:
+                yield browser
+            except BaseException:
+                # The page state is unknown (crash, timeout); don't hand it to the next scrape
+                browser.broken = True
+                raise
+            finally:
+                self._release(browser)
+        finally:
+            self._slots.release()
+
+    def _acquire(self) -> PooledBrowser:
+        self.close_idle()
+        with self._lock:
+            browser = self._idle.pop() if self._idle else None
+        if browser is None:
+            browser = PooledBrowser(self._factory())
+            self.stats["started"] += 1
+        else:
+            self.stats["reused"] += 1
+        browser.pages = 0
+        browser.leased_at = time.monotonic()
+        return browser
+
+    def _release(self, browser: PooledBrowser):
+        elapsed = time.monotonic() - browser.leased_at
+        rss = browser.rss_bytes()
+        browser.stats = {
+            "pages": browser.pages,
+            "seconds": round(elapsed, 1),
+            "pages_per_minute": round(browser.pages / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            "chrome_rss_mb": round(rss / 1024 / 1024, 1),
+        }
+        logger.info(f"Browser lease: {browser.stats}")
+
+        if browser.broken or browser.total_pages >= self.max_pages or rss > self.max_rss_bytes:
+            self.stats["recycled"] += 1
+            logger.info(
+                f"Recycling Chrome after {browser.total_pages} pages "
+                f"({browser.stats['chrome_rss_mb']} MB{', after error' if browser.broken else ''})"
+            )
+            browser.quit()
+            return
+        browser.released_at = time.monotonic()
+        with self._lock:
+            self._idle.append(browser)
+
+    def close_idle(self, max_idle_seconds: float = None):
+        """Quit drivers idle longer than max_idle_seconds (default: the pool's idle limit)."""
+        limit = self.idle_seconds if max_idle_seconds is None else max_idle_seconds
+        now = time.monotonic()
+        with self._lock:
+            stale = [b for b in self._idle if now - b.released_at >= limit]
+            self._idle = [b for b in self._idle if b not in stale]
+        for browser in stale:
+            browser.quit()
+
+    def close(self):
+        """Quit every idle driver (leased ones are quit when they come back broken or full)."""
+        self.close_idle(0)
+
+
+_pool: BrowserPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """The process-wide pool shared by all county scrapers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            # Don't leave orphaned Chrome processes behind when the scraper exits
+            atexit.register(_pool.close)
+        return _pool
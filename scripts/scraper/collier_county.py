@@ -2,7 +2,7 @@
 
 Source: https://cvportal.colliercountyfl.gov/cityviewweb/
 Platform: CityView (Harris Computers)
-Requires: Selenium (JavaScript-rendered, may have CAPTCHA)
+Requires: Selenium via browser_pool (JavaScript-rendered, may have CAPTCHA)
 
 Scrapes: Building permits for remodeling, roofing, construction
 Target: Homeowners with active renovation projects in Collier County, FL
@@ -10,23 +10,32 @@ Target: Homeowners with active renovation projects in Collier County, FL
 
 import time
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from bs4 import BeautifulSoup
 
-from db import insert_permit, log_scraping_run, complete_scraping_run
+from browser_pool import get_browser_pool
+from politeness import host_throttle
+from db import log_scraping_run, complete_scraping_run
+from scrape_checkpoint import PageCheckpoint
 
 logger = logging.getLogger(__name__)
 
 CITYVIEW_URL = "https://cvportal.colliercountyfl.gov/cityviewweb/"
 PERMIT_SEARCH_URL = "https://cvportal.colliercountyfl.gov/CityViewWeb/Permit/Search"
 
+# Politeness budget for the CityView host: seconds between requests, concurrent searches
+REQUEST_INTERVAL_SECONDS = 3.0
+MAX_SESSIONS = 2
+
+
+class CaptchaDetected(Exception):
+    """The portal served a CAPTCHA instead of the search form."""
+
+
 RENOVATION_KEYWORDS = [
     "remodel", "renovation", "addition", "alteration", "interior",
     "kitchen", "bathroom", "flooring", "roof", "re-roof",
@@ -34,139 +43,159 @@ RENOVATION_KEYWORDS = [
 ]
 
 
-def get_chrome_driver() -> webdriver.Chrome:
-    """Create a headless Chrome WebDriver."""
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-
-    try:
-        import undetected_chromedriver as uc
-        driver = uc.Chrome(options=options, headless=True)
-    except ImportError:
-        service = Service()
-        driver = webdriver.Chrome(service=service, options=options)
-
-    driver.implicitly_wait(10)
-    return driver
-
-
-def scrape_collier_permits(days_back: int = 1, max_pages: int = 20) -> list[dict]:
+def scrape_collier_permits(days_back: int = 1, max_pages: int = 20, resume_run: dict = None) -> list[dict]:
     """
     Scrape recent building permits from Collier County CityView portal.
 
+    Permits are stored page by page and the run is checkpointed after each
+    page (see scrape_checkpoint).
+
     Args:
         days_back: How many days back to search
         max_pages: Maximum result pages to process
+        resume_run: scraping_runs row of a failed run to continue (its date window is reused)
 
     Returns:
         List of permit dictionaries
     """
-    run_id = log_scraping_run("collier_county_permits")
+    if resume_run:
+        run_id, start, end = resume_run["id"], resume_run["search_start"], resume_run["search_end"]
+    else:
+        end = date.today()
+        start = end - timedelta(days=days_back)
+        run_id = log_scraping_run("collier_county_permits", search_start=start, search_end=end)
+    checkpoint = PageCheckpoint(run_id, resume_run)
     permits = []
     errors = 0
-    driver = None
 
     try:
-        driver = get_chrome_driver()
-        logger.info("Navigating to Collier County CityView portal...")
-        driver.get(PERMIT_SEARCH_URL)
+        permits, _ = search_collier_permits(start, end, max_pages, on_page=checkpoint)
+        checkpoint.finish()
 
-        # Wait for page load
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "form"))
+        complete_scraping_run(
+            run_id,
+            records_found=checkpoint.found,
+            records_new=checkpoint.new,
+            records_updated=checkpoint.updated,
+            errors=errors,
         )
-        time.sleep(3)
-
-        # Check for CAPTCHA
-        page_source = driver.page_source.lower()
-        if "captcha" in page_source or "recaptcha" in page_source:
-            logger.warning("CAPTCHA detected on Collier County portal. Skipping scrape.")
-            complete_scraping_run(
-                run_id,
-                errors=1,
-                error_details="CAPTCHA detected - manual intervention required",
-                status="failed",
-            )
-            return []
-
-        # Set date range
-        start_date = (datetime.now() - timedelta(days=days_back)).strftime("%m/%d/%Y")
-        end_date = datetime.now().strftime("%m/%d/%Y")
-
-        # Try to find and fill date fields
-        date_fields = driver.find_elements(By.CSS_SELECTOR, "input[type='date'], input[type='text'][name*='date' i]")
-        if len(date_fields) >= 2:
-            date_fields[0].clear()
-            date_fields[0].send_keys(start_date)
-            date_fields[1].clear()
-            date_fields[1].send_keys(end_date)
-
-        # Submit search
-        search_buttons = driver.find_elements(
-            By.CSS_SELECTOR, "button[type='submit'], input[type='submit'], button.btn-primary"
+        logger.info(
+            f"Collier County: Found {checkpoint.found} permits, {checkpoint.new} new, {checkpoint.updated} updated"
         )
-        if search_buttons:
-            search_buttons[0].click()
-            time.sleep(5)
-
-        # Process results
-        page = 1
-        while page <= max_pages:
-            logger.info(f"Processing page {page}...")
-            page_permits = _parse_cityview_results(driver)
-            permits.extend(page_permits)
-
-            if not page_permits:
-                break
-
-            # Try next page
-            try:
-                next_btns = driver.find_elements(
-                    By.CSS_SELECTOR, "a.next, li.next a, a[aria-label='Next']"
-                )
-                if next_btns:
-                    next_btns[0].click()
-                    time.sleep(3)
-                    page += 1
-                else:
-                    break
-            except Exception:
-                break
-
-        # Insert into database
-        new_count = 0
-        for permit in permits:
-            result = insert_permit(permit)
-            if result:
-                new_count += 1
 
+    except CaptchaDetected:
+        logger.warning("CAPTCHA detected on Collier County portal. Skipping scrape.")
         complete_scraping_run(
             run_id,
-            records_found=len(permits),
-            records_new=new_count,
-            errors=errors,
+            records_found=checkpoint.found,
+            records_new=checkpoint.new,
+            records_updated=checkpoint.updated,
+            errors=1,
+            error_details="CAPTCHA detected - manual intervention required",
+            status="failed",
         )
-        logger.info(f"Collier County: Found {len(permits)} permits, {new_count} new")
 
     except Exception as e:
-        logger.error(f"Collier County scraper error: {e}")
-        complete_scraping_run(run_id, errors=1, error_details=str(e), status="failed")
-
-    finally:
-        if driver:
-            driver.quit()
+        logger.error(f"Collier County scraper error (run {run_id}, stored through page {checkpoint.last_page}): {e}")
+        complete_scraping_run(
+            run_id,
+            records_found=checkpoint.found,
+            records_new=checkpoint.new,
+            records_updated=checkpoint.updated,
+            errors=1,
+            error_details=str(e),
+            status="failed",
+        )
 
     return permits
 
 
+def search_collier_permits(start: date, end: date, max_pages: int = 20, on_page=None) -> tuple[list[dict], bool]:
+    """
+    Search one date range (inclusive) without recording a scraping run.
+
+    on_page(page_number, page_permits) is called after each results page.
+    Raises CaptchaDetected when the portal serves a CAPTCHA.
+
+    Returns:
+        tuple: (renovation permits, whether max_pages cut the results short)
+    """
+    throttle = host_throttle(PERMIT_SEARCH_URL, REQUEST_INTERVAL_SECONDS, MAX_SESSIONS)
+    with throttle.session(), get_browser_pool().browser() as browser:
+        result = _search_cityview(browser, throttle, f"{start:%m/%d/%Y}", f"{end:%m/%d/%Y}", max_pages, on_page)
+    logger.info(f"Collier County browser: {browser.stats}")
+    return result
+
+
+def _search_cityview(
+    browser, throttle, start_date: str, end_date: str, max_pages: int, on_page=None
+) -> tuple[list[dict], bool]:
+    """Run the date-range search on the CityView portal in a pooled Chrome."""
+    driver = browser.driver
+    permits = []
+    truncated = False
+
+    logger.info("Navigating to Collier County CityView portal...")
+    throttle.wait()
+    driver.get(PERMIT_SEARCH_URL)
+
+    # Wait for page load
+    WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.TAG_NAME, "form"))
+    )
+    time.sleep(3)
+
+    # Check for CAPTCHA
+    page_source = driver.page_source.lower()
+    if "captcha" in page_source or "recaptcha" in page_source:
+        raise CaptchaDetected()
+
+    # Try to find and fill date fields
+    date_fields = driver.find_elements(By.CSS_SELECTOR, "input[type='date'], input[type='text'][name*='date' i]")
+    if len(date_fields) >= 2:
+        date_fields[0].clear()
+        date_fields[0].send_keys(start_date)
+        date_fields[1].clear()
+        date_fields[1].send_keys(end_date)
+
+    # Submit search
+    search_buttons = driver.find_elements(
+        By.CSS_SELECTOR, "button[type='submit'], input[type='submit'], button.btn-primary"
+    )
+    if search_buttons:
+        throttle.wait()
+        search_buttons[0].click()
+        time.sleep(5)
+
+    # Process results
+    page = 1
+    while True:
+        logger.info(f"Processing page {page}...")
+        page_permits = _parse_cityview_results(driver)
+        permits.extend(page_permits)
+        browser.count_page()
+        if on_page:
+            on_page(page, page_permits)
+
+        # A page can hold no renovation permits; only a missing Next link ends the results.
+        # Errors propagate so the run or backfill window is marked failed, not complete.
+        next_btns = driver.find_elements(
+            By.CSS_SELECTOR, "a.next, li.next a, a[aria-label='Next']"
+        )
+        if not next_btns:
+            break
+        if page >= max_pages:
+            truncated = True
+            logger.warning(f"Collier County search {start_date}-{end_date} truncated at max_pages={max_pages}")
+            break
+        throttle.wait()
+        next_btns[0].click()
+        time.sleep(3)
+        page += 1
+
+    return permits, truncated
+
+
 def _parse_cityview_results(driver) -> list[dict]:
     """Parse CityView search results page."""
     permits = []
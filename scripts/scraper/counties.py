@@ -0,0 +1,30 @@
+"""County permit scrapers run by the daily scrape and the backfill.
+
+main_scraper.run_daily_scrape runs every COUNTY_SCRAPERS entry
+concurrently, one thread per county; each scraper paces itself with its
+host's politeness budget (politeness.host_throttle), so adding a county is
+one entry here.
+
+Every scraper is called as scrape(days_back=N) and returns the list of
+permits it stored. It logs its scraping_runs row as "<county>_county_permits"
+with a page checkpoint, and continues that run when called as
+scrape(resume_run=row) (main_scraper.py --resume). COUNTY_SEARCHES holds the matching single-window search,
+search(start, end, max_pages) -> (permits, truncated), used by backfill.
+"""
+
+from lee_county import scrape_lee_permits, search_lee_permits
+from collier_county import scrape_collier_permits, search_collier_permits
+
+COUNTY_SCRAPERS = {
+    "lee": scrape_lee_permits,
+    "collier": scrape_collier_permits,
+}
+
+COUNTY_SEARCHES = {
+    "lee": search_lee_permits,
+    "collier": search_collier_permits,
+}
+
+
+def county_name(county: str) -> str:
+    return f"{county.title()} County"
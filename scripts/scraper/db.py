@@ -1,16 +1,48 @@
 """Database connection and helper functions for Empire Sales Agent."""
 
 import os
+import re
+import threading
+from datetime import date
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
 from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
 
+from address import normalize_address
+from opt_out_cache import OptOutCache
+from dnc_registry import DncRegistry, DNC_REGISTRY_PATH
+
 load_dotenv()
 
+# Serve is_opted_out from an in-process set kept fresh by LISTEN/NOTIFY
+OPT_OUT_CACHE_ENABLED = os.getenv("OPT_OUT_CACHE", "1") == "1"
 
-def get_connection():
-    """Get a PostgreSQL database connection."""
-    return psycopg2.connect(
+# Calling window (FTSA: 8:00 AM - 8:00 PM in the called party's time zone)
+CALLING_TIMEZONE = "America/New_York"
+CALLING_HOURS = (8, 20)
+
+# How long a call worker holds claimed leads before they return to the queue
+LEAD_LEASE_SECONDS = int(os.getenv("LEAD_LEASE_SECONDS", "900"))
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds to wait for a free pooled connection before giving up
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_pid = None
+# ThreadedConnectionPool.getconn() raises as soon as POOL_MAX connections are
+# out instead of waiting; checkouts hold one of these slots first
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _connect_params() -> dict:
+    """Connection keyword arguments shared by direct and pooled connections."""
+    return dict(
         host=os.getenv("DB_HOST", "localhost"),
         port=os.getenv("DB_PORT", "5432"),
         dbname=os.getenv("DB_NAME", "empire_leads"),
@@ -20,108 +52,754 @@ def get_connection():
     )
 
 
-def is_opted_out(phone: str) -> bool:
-    """Check if a phone number is in the opt-out list."""
-    with get_connection() as conn:
+def get_connection():
+    """Get a new, unpooled PostgreSQL database connection."""
+    return psycopg2.connect(**_connect_params())
+
+
+def get_pool() -> pg_pool.ThreadedConnectionPool:
+    """Get the process-wide connection pool, creating it on first use.
+
+    Size is controlled by DB_POOL_MIN / DB_POOL_MAX. A forked child starts
+    without one (_forget_inherited_connections) and opens its own.
+    """
+    global _pool, _pool_pid, _pool_slots
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = pg_pool.ThreadedConnectionPool(POOL_MIN, POOL_MAX, **_connect_params())
+            _pool_slots = threading.BoundedSemaphore(POOL_MAX)
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    """Close every pooled connection (call on shutdown)."""
+    global _pool, _pool_pid, _pool_slots
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+        _pool_slots = None
+
+
+def _checkout(timeout: float = POOL_TIMEOUT):
+    """
+    Take a healthy connection from the pool, replacing dead ones.
+
+    Returns (conn, slot); hand both back to _checkin.
+
+    Waits up to `timeout` seconds for a connection when all POOL_MAX are in
+    use (a thread nesting a pooled call inside its own session() holds two).
+    """
+    p = get_pool()
+    slots = _pool_slots
+    if not slots.acquire(timeout=timeout):
+        raise pg_pool.PoolError(
+            f"Timed out after {timeout:g}s waiting for a database connection "
+            f"(all DB_POOL_MAX={POOL_MAX} in use)"
+        )
+    try:
+        for _ in range(POOL_MAX + 1):
+            conn = p.getconn()
+            try:
+                if not conn.closed:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    conn.rollback()
+                    return conn, slots
+            except psycopg2.Error:
+                pass
+            p.putconn(conn, close=True)
+    except BaseException:
+        slots.release()
+        raise
+    slots.release()
+    raise psycopg2.OperationalError("No healthy database connection available in pool")
+
+
+def _checkin(conn, slot):
+    """Return a connection taken with _checkout (closing it if it died)."""
+    try:
+        get_pool().putconn(conn, close=bool(conn.closed))
+    finally:
+        slot.release()
+
+
+@contextmanager
+def session():
+    """Hold one pooled connection across many operations as a single transaction.
+
+    Commits on normal exit, rolls back on error, and always returns the
+    connection to the pool. Pass the yielded connection as ``conn=`` to the
+    helpers below to reuse it.
+    """
+    conn, slot = _checkout()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        _checkin(conn, slot)
+
+
+@contextmanager
+def _cursor(conn=None):
+    """Cursor on the caller's connection, or on a short pooled session.
+
+    When ``conn`` is given the caller owns the transaction; otherwise the
+    statement is committed when the block exits.
+    """
+    if conn is not None:
         with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM opt_outs WHERE phone = %s", (phone,))
-            return cur.fetchone() is not None
+            yield cur
+        return
+    with session() as own:
+        with own.cursor() as cur:
+            yield cur
+
+
+_opt_out_cache = None
+_opt_out_cache_lock = threading.Lock()
+
+
+def get_opt_out_cache() -> OptOutCache | None:
+    """The process-wide opt-out cache, or None when disabled (OPT_OUT_CACHE=0)."""
+    global _opt_out_cache
+    if not OPT_OUT_CACHE_ENABLED:
+        return None
+    with _opt_out_cache_lock:
+        if _opt_out_cache is None:
+            _opt_out_cache = OptOutCache(get_connection)
+        return _opt_out_cache
+
 
+# The parent's pool and opt-out cache as seen by a forked child; referenced
+# forever so their connections are never closed or collected in the child
+_inherited = []
 
-def add_opt_out(phone: str, source: str = "manual"):
+
+def _forget_inherited_connections():
+    """
+    After fork(), in the child: drop the parent's pool and opt-out cache
+    without closing them. Their sockets are shared with the parent, and
+    closing one sends Terminate to the parent's server session. The locks
+    are replaced too, since another parent thread may have held them.
+    """
+    global _pool, _pool_pid, _pool_slots, _pool_lock, _opt_out_cache, _opt_out_cache_lock
+    _inherited.extend(obj for obj in (_pool, _opt_out_cache) if obj is not None)
+    _pool = _pool_pid = _pool_slots = _opt_out_cache = None
+    _pool_lock = threading.Lock()
+    _opt_out_cache_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited_connections)
+
+
+_dnc_registry = None
+_dnc_registry_lock = threading.Lock()
+
+
+def get_dnc_registry() -> DncRegistry | None:
+    """The memory-mapped National DNC registry, or None until one has been built."""
+    global _dnc_registry
+    if _dnc_registry is None:
+        if not os.path.exists(DNC_REGISTRY_PATH):
+            return None
+        with _dnc_registry_lock:
+            if _dnc_registry is None:
+                _dnc_registry = DncRegistry(DNC_REGISTRY_PATH)
+    return _dnc_registry
+
+
+def _phone_key(phone: str | None) -> str | None:
+    """Last 10 digits of a phone number (the opt_outs/leads phone_key column)."""
+    digits = re.sub(r"\D", "", phone or "")[-10:]
+    return digits or None
+
+
+def is_opted_out(phone: str, conn=None) -> bool:
+    """Check if a phone number is opted out or on the National DNC registry."""
+    registry = get_dnc_registry()
+    if registry is not None and registry.contains(phone):
+        return True
+
+    cache = get_opt_out_cache()
+    if cache is not None:
+        cached = cache.contains(phone)
+        if cached is not None:
+            return cached
+
+    key = _phone_key(phone)
+    if key is None:
+        return False
+    with _cursor(conn) as cur:
+        cur.execute("SELECT 1 FROM opt_outs WHERE phone_key = %s LIMIT 1", (key,))
+        return cur.fetchone() is not None
+
+
+def add_opt_out(phone: str, source: str = "manual", conn=None):
     """Add a phone number to the opt-out list."""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO opt_outs (phone, source) VALUES (%s, %s) ON CONFLICT (phone) DO NOTHING",
-                (phone, source),
-            )
-        conn.commit()
+    with _cursor(conn) as cur:
+        cur.execute(
+            "INSERT INTO opt_outs (phone, source) VALUES (%s, %s) ON CONFLICT (phone) DO NOTHING",
+            (phone, source),
+        )
+
+    # Only safe to record locally once committed; with a caller-held conn the
+    # NOTIFY arrives at commit instead
+    cache = get_opt_out_cache()
+    if cache is not None and conn is None:
+        cache.add(phone)
+
+
+def filter_opted_out(phones: list[str], conn=None) -> set[str]:
+    """Batch is_opted_out: the subset of phones that must not be contacted."""
+    phones = [p for p in dict.fromkeys(phones) if p]
+    if not phones:
+        return set()
+
+    blocked = set()
+    registry = get_dnc_registry()
+    if registry is not None:
+        blocked = {p for p, hit in zip(phones, registry.contains_many(phones)) if hit}
+
+    remaining = [p for p in phones if p not in blocked]
+    cache = get_opt_out_cache()
+    if cache is not None and remaining:
+        cached = [cache.contains(p) for p in remaining]
+        if None not in cached:
+            return blocked | {p for p, hit in zip(remaining, cached) if hit}
 
+    keys = {p: _phone_key(p) for p in remaining}
+    keys = {p: k for p, k in keys.items() if k is not None}
+    if keys:
+        with _cursor(conn) as cur:
+            cur.execute("SELECT phone_key FROM opt_outs WHERE phone_key = ANY(%s)", (list(set(keys.values())),))
+            hits = {row["phone_key"] for row in cur.fetchall()}
+        blocked |= {p for p, k in keys.items() if k in hits}
+    return blocked
 
-def get_daily_contact_count(lead_id: int) -> int:
+
+def get_daily_contact_count(lead_id: int, conn=None) -> int:
     """Get number of outbound contacts in the last 24 hours (FTSA compliance)."""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT count_daily_contacts(%s)", (lead_id,))
-            row = cur.fetchone()
-            return row["count_daily_contacts"] if row else 0
+    with _cursor(conn) as cur:
+        cur.execute("SELECT count_daily_contacts(%s)", (lead_id,))
+        row = cur.fetchone()
+        return row["count_daily_contacts"] if row else 0
 
 
-def insert_lead(lead: dict) -> int | None:
-    """Insert a new lead, skip if phone already exists. Returns lead ID or None."""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            # Check for duplicate phone
-            if lead.get("phone"):
-                cur.execute("SELECT id FROM leads WHERE phone = %s", (lead["phone"],))
-                existing = cur.fetchone()
-                if existing:
-                    return None
-
-            columns = [k for k in lead.keys() if lead[k] is not None]
-            values = [lead[k] for k in columns]
-            placeholders = ", ".join(["%s"] * len(columns))
-            col_names = ", ".join(columns)
+def _group_by_columns(records) -> dict[tuple[str, ...], list[tuple]]:
+    """Group heterogeneous dicts by their set of non-null columns, as value tuples."""
+    groups: dict[tuple[str, ...], list[tuple]] = {}
+    for record in records:
+        columns = tuple(sorted(k for k, v in record.items() if v is not None))
+        groups.setdefault(columns, []).append(tuple(record[k] for k in columns))
+    return groups
+
+
+def _with_address_key(record: dict, field: str) -> dict:
+    """Record with address_key derived from its ``field`` address, unless already set."""
+    if record.get(field) and not record.get("address_key"):
+        return {**record, "address_key": normalize_address(record[field])}
+    return record
+
+
+def insert_lead(lead: dict, conn=None) -> int | None:
+    """Insert a new lead, skip if phone (or phoneless parcel) already exists. Returns lead ID or None."""
+    lead = _with_address_key(lead, "address")
+    with _cursor(conn) as cur:
+        columns = [k for k in lead.keys() if lead[k] is not None]
+        values = [lead[k] for k in columns]
+        placeholders = ", ".join(["%s"] * len(columns))
+        col_names = ", ".join(columns)
 
+        cur.execute(
+            f"INSERT INTO leads ({col_names}) VALUES ({placeholders}) "
+            "ON CONFLICT DO NOTHING RETURNING id",
+            values,
+        )
+        result = cur.fetchone()
+        return result["id"] if result else None
+
+
+def insert_leads_batch(leads: list[dict], conn=None) -> tuple[int, int, list[int]]:
+    """
+    Bulk insert leads with one set-based merge per column signature.
+
+    Rows are staged in a temp table with execute_values, then merged with a
+    single INSERT ... ON CONFLICT DO NOTHING. Duplicates by normalized phone
+    (or by parcel_id for leads with no phone and NAL leads, or by county and
+    address_key for leads with neither), both against existing rows and
+    within the batch, are skipped. Leads with no phone, parcel_id or address
+    can't be deduped and are skipped too.
+
+    Returns:
+        tuple: (inserted count, skipped count, list of new lead IDs)
+    """
+    if conn is None:
+        with session() as conn:
+            return insert_leads_batch(leads, conn=conn)
+
+    keyed = [_with_address_key(lead, "address") for lead in leads]
+    keyed = [lead for lead in keyed if lead.get("phone") or lead.get("parcel_id") or lead.get("address_key")]
+    groups = _group_by_columns(keyed)
+
+    new_ids = []
+    with conn.cursor() as cur:
+        for columns, rows in groups.items():
+            if not columns:
+                continue
+            col_names = ", ".join(columns)
+            cur.execute("DROP TABLE IF EXISTS _lead_stage")
             cur.execute(
-                f"INSERT INTO leads ({col_names}) VALUES ({placeholders}) RETURNING id",
-                values,
+                f"CREATE TEMP TABLE _lead_stage ON COMMIT DROP AS "
+                f"SELECT {col_names} FROM leads WITH NO DATA"
             )
-            result = cur.fetchone()
-            conn.commit()
-            return result["id"] if result else None
+            cur.execute("ALTER TABLE _lead_stage ADD COLUMN _ord SERIAL")
+            execute_values(
+                cur,
+                f"INSERT INTO _lead_stage ({col_names}) VALUES %s",
+                rows,
+                page_size=1000,
+            )
+            cur.execute(
+                f"""INSERT INTO leads ({col_names})
+                    SELECT {col_names} FROM _lead_stage ORDER BY _ord
+                    ON CONFLICT DO NOTHING
+                    RETURNING id"""
+            )
+            new_ids.extend(row["id"] for row in cur.fetchall())
+        cur.execute("DROP TABLE IF EXISTS _lead_stage")
 
+    return len(new_ids), len(leads) - len(new_ids), new_ids
 
-def insert_leads_batch(leads: list[dict]) -> tuple[int, int]:
-    """Batch insert leads. Returns (inserted, skipped) counts."""
-    inserted = 0
-    skipped = 0
+
+# Property facts a newer NAL release may correct. Status, contact and consent
+# fields are never overwritten, so leads already being worked keep their state.
+NAL_REFRESH_FIELDS = (
+    "full_name", "address", "address_key", "city", "zip_code", "year_built", "square_footage",
+    "assessed_value", "market_value", "last_sale_price", "last_sale_date",
+    "homestead", "renovation_score", "score_reasons",
+)
+
+
+def upsert_leads_by_parcel(leads: list[dict], conn=None) -> tuple[int, list[int]]:
+    """
+    Insert phoneless parcel leads, refreshing NAL_REFRESH_FIELDS on existing ones.
+
+    Existing leads match on the idx_leads_parcel key, which includes NAL leads
+    that have since gained a phone. Leads without a parcel_id are ignored;
+    repeats within the batch keep the last occurrence. The refresh replaces
+    renovation_score with the NAL-only score, so callers rescore updated leads
+    that have linked permits (permit_linker.rescore_leads).
+
+    Returns:
+        tuple: (inserted count, IDs of updated leads)
+    """
+    if conn is None:
+        with session() as conn:
+            return upsert_leads_by_parcel(leads, conn=conn)
+
+    unique = {}
     for lead in leads:
-        result = insert_lead(lead)
-        if result:
-            inserted += 1
-        else:
-            skipped += 1
-    return inserted, skipped
+        if lead.get("parcel_id") and not lead.get("phone"):
+            unique[lead["parcel_id"]] = _with_address_key(lead, "address")
 
+    inserted = 0
+    updated = []
+    with conn.cursor() as cur:
+        for columns, rows in _group_by_columns(unique.values()).items():
+            col_names = ", ".join(columns)
+            refresh = [c for c in NAL_REFRESH_FIELDS if c in columns]
+            if refresh:
+                assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in refresh)
+                old = ", ".join(f"leads.{c}" for c in refresh)
+                new = ", ".join(f"EXCLUDED.{c}" for c in refresh)
+                conflict = f"DO UPDATE SET {assignments} WHERE ROW({old}) IS DISTINCT FROM ROW({new})"
+            else:
+                conflict = "DO NOTHING"
 
-def insert_permit(permit: dict) -> int | None:
-    """Insert a permit record. Returns permit ID or None if duplicate."""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id FROM permits WHERE permit_number = %s",
-                (permit.get("permit_number"),),
+            results = execute_values(
+                cur,
+                f"""INSERT INTO leads ({col_names}) VALUES %s
+                    ON CONFLICT (parcel_id)
+                    WHERE parcel_id IS NOT NULL AND (phone_key IS NULL OR source = 'scraper_nal')
+                    {conflict}
+                    RETURNING id, (xmax = 0) AS inserted""",
+                rows,
+                page_size=1000,
+                fetch=True,
             )
-            if cur.fetchone():
-                return None
+            for row in results:
+                if row["inserted"]:
+                    inserted += 1
+                else:
+                    updated.append(row["id"])
+
+    return inserted, updated
+
+
+def start_nal_delta(conn):
+    """Begin a delta NAL import on ``conn``: reset the set of parcels seen in this file."""
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS _nal_seen")
+        cur.execute("CREATE TEMP TABLE _nal_seen (parcel_id VARCHAR(30) PRIMARY KEY)")
+
+
+def diff_nal_fingerprints(county: str, fingerprints: list[tuple[str, int]], conn) -> tuple[list[str], list[str]]:
+    """
+    Compare (parcel_id, fingerprint) pairs with those stored by the last import.
+
+    The pairs stay staged for save_nal_fingerprints in the same transaction,
+    and the parcels are recorded as seen for prune_nal_fingerprints.
+
+    Returns:
+        tuple: (new parcel IDs, changed parcel IDs)
+    """
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS _nal_fp_stage")
+        cur.execute(
+            "CREATE TEMP TABLE _nal_fp_stage (parcel_id VARCHAR(30) PRIMARY KEY, fingerprint BIGINT) "
+            "ON COMMIT DROP"
+        )
+        execute_values(cur, "INSERT INTO _nal_fp_stage (parcel_id, fingerprint) VALUES %s", fingerprints, page_size=1000)
+        cur.execute("INSERT INTO _nal_seen SELECT parcel_id FROM _nal_fp_stage ON CONFLICT DO NOTHING")
+        cur.execute(
+            """SELECT s.parcel_id, f.parcel_id IS NULL AS is_new
+               FROM _nal_fp_stage s
+               LEFT JOIN nal_fingerprints f ON f.county = %s AND f.parcel_id = s.parcel_id
+               WHERE f.fingerprint IS DISTINCT FROM s.fingerprint""",
+            (county,),
+        )
+        rows = cur.fetchall()
+
+    new = [r["parcel_id"] for r in rows if r["is_new"]]
+    changed = [r["parcel_id"] for r in rows if not r["is_new"]]
+    return new, changed
 
-            columns = [k for k in permit.keys() if permit[k] is not None]
-            values = [permit[k] for k in columns]
-            placeholders = ", ".join(["%s"] * len(columns))
+
+def save_nal_fingerprints(county: str, conn):
+    """Store the fingerprints staged by diff_nal_fingerprints, rewriting only changed ones."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """INSERT INTO nal_fingerprints (county, parcel_id, fingerprint)
+               SELECT %s, parcel_id, fingerprint FROM _nal_fp_stage
+               ON CONFLICT (county, parcel_id) DO UPDATE
+               SET fingerprint = EXCLUDED.fingerprint, updated_at = NOW()
+               WHERE nal_fingerprints.fingerprint <> EXCLUDED.fingerprint""",
+            (county,),
+        )
+
+
+def prune_nal_fingerprints(county: str, conn) -> int:
+    """Forget parcels of ``county`` that were not in this import. Returns the removed count."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """DELETE FROM nal_fingerprints f
+               WHERE f.county = %s
+                 AND NOT EXISTS (SELECT 1 FROM _nal_seen s WHERE s.parcel_id = f.parcel_id)""",
+            (county,),
+        )
+        removed = cur.rowcount
+        cur.execute("DROP TABLE _nal_seen")
+    return removed
+
+
+def insert_permit(permit: dict, conn=None) -> int | None:
+    """Insert a permit record. Returns permit ID or None if duplicate."""
+    permit = _with_address_key(permit, "site_address")
+    with _cursor(conn) as cur:
+        cur.execute(
+            "SELECT id FROM permits WHERE permit_number = %s",
+            (permit.get("permit_number"),),
+        )
+        if cur.fetchone():
+            return None
+
+        columns = [k for k in permit.keys() if permit[k] is not None]
+        values = [permit[k] for k in columns]
+        placeholders = ", ".join(["%s"] * len(columns))
+        col_names = ", ".join(columns)
+
+        cur.execute(
+            f"INSERT INTO permits ({col_names}) VALUES ({placeholders}) RETURNING id",
+            values,
+        )
+        result = cur.fetchone()
+        return result["id"] if result else None
+
+
+# Permit fields whose change means the permit progressed (applied -> issued -> finaled)
+PERMIT_TRACKED_FIELDS = ("status", "applied_date", "issued_date", "finaled_date", "valuation")
+
+
+def insert_permits_batch(permits: list[dict], conn=None) -> tuple[int, int, int]:
+    """
+    Upsert permits on permit_number in one statement per column signature.
+
+    Existing permits are only rewritten when a tracked field (status, dates,
+    valuation) actually changed. Permits without a number are ignored, and
+    repeats within the batch keep the last occurrence.
+
+    Returns:
+        tuple: (new count, updated count, unchanged count)
+    """
+    if conn is None:
+        with session() as conn:
+            return insert_permits_batch(permits, conn=conn)
+
+    unique = {}
+    for permit in permits:
+        if permit.get("permit_number"):
+            unique[permit["permit_number"]] = _with_address_key(permit, "site_address")
+
+    groups = _group_by_columns(unique.values())
+
+    new_count = 0
+    updated_count = 0
+    with conn.cursor() as cur:
+        for columns, rows in groups.items():
             col_names = ", ".join(columns)
+            tracked = [c for c in PERMIT_TRACKED_FIELDS if c in columns]
+            if tracked:
+                assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in tracked)
+                old = ", ".join(f"permits.{c}" for c in tracked)
+                new = ", ".join(f"EXCLUDED.{c}" for c in tracked)
+                conflict = (
+                    f"DO UPDATE SET {assignments}, scraped_at = NOW() "
+                    f"WHERE ROW({old}) IS DISTINCT FROM ROW({new})"
+                )
+            else:
+                conflict = "DO NOTHING"
 
-            cur.execute(
-                f"INSERT INTO permits ({col_names}) VALUES ({placeholders}) RETURNING id",
-                values,
+            results = execute_values(
+                cur,
+                f"""INSERT INTO permits ({col_names}) VALUES %s
+                    ON CONFLICT (permit_number) {conflict}
+                    RETURNING id, (xmax = 0) AS inserted""",
+                rows,
+                page_size=1000,
+                fetch=True,
             )
-            result = cur.fetchone()
-            conn.commit()
-            return result["id"] if result else None
+            for row in results:
+                if row["inserted"]:
+                    new_count += 1
+                else:
+                    updated_count += 1
 
+    return new_count, updated_count, len(unique) - new_count - updated_count
 
-def log_scraping_run(source: str) -> int:
-    """Start a scraping run log entry. Returns the run ID."""
-    with get_connection() as conn:
-        with conn.cursor() as cur:
+
+def link_unlinked_permits(conn=None) -> list[int]:
+    """
+    Link every unlinked permit to a lead in one set-based UPDATE.
+
+    A permit matches a lead by parcel_id first, then by exact address_key
+    within the same county, and finally by trigram similarity on
+    address_key with the same house number. The exact matches are retried
+    every pass; the trigram search only runs for permits no pass has tried
+    yet (link_attempted_at), so its cost follows new permits rather than the
+    unlinked backlog. Returns the IDs of leads that gained at least one permit.
+    """
+    with _cursor(conn) as cur:
+        cur.execute("SET LOCAL pg_trgm.similarity_threshold = 0.6")
+        cur.execute(
+            """WITH unlinked AS (
+                   SELECT id, county, parcel_id, address_key, link_attempted_at
+                   FROM permits WHERE linked_lead_id IS NULL
+               ),
+               exact AS (
+                   SELECT u.id AS permit_id, l.id AS lead_id, 1 AS priority
+                   FROM unlinked u JOIN leads l ON l.parcel_id = u.parcel_id
+                   UNION ALL
+                   SELECT u.id, l.id, 2
+                   FROM unlinked u
+                   JOIN leads l ON l.county = u.county AND l.address_key = u.address_key
+               ),
+               fuzzy AS (
+                   SELECT u.id AS permit_id, f.id AS lead_id, 3 AS priority
+                   FROM unlinked u
+                   CROSS JOIN LATERAL (
+                       SELECT l.id FROM leads l
+                       WHERE l.address_key % u.address_key
+                         AND l.county = u.county
+                         AND split_part(l.address_key, ' ', 1) = split_part(u.address_key, ' ', 1)
+                       ORDER BY similarity(l.address_key, u.address_key) DESC, l.id
+                       LIMIT 1
+                   ) f
+                   WHERE u.address_key IS NOT NULL
+                     AND u.link_attempted_at IS NULL
+                     AND NOT EXISTS (SELECT 1 FROM exact e WHERE e.permit_id = u.id)
+               ),
+               best AS (
+                   SELECT DISTINCT ON (permit_id) permit_id, lead_id
+                   FROM (SELECT * FROM exact UNION ALL SELECT * FROM fuzzy) m
+                   ORDER BY permit_id, priority, lead_id
+               )
+               UPDATE permits p SET linked_lead_id = b.lead_id
+               FROM best b WHERE p.id = b.permit_id
+               RETURNING p.linked_lead_id"""
+        )
+        linked = [row["linked_lead_id"] for row in cur.fetchall()]
+        cur.execute(
+            """UPDATE permits SET link_attempted_at = NOW()
+               WHERE linked_lead_id IS NULL AND link_attempted_at IS NULL"""
+        )
+        return linked
+
+
+def backfill_address_keys(batch_size: int = 5000, conn=None) -> int:
+    """Fill address_key for leads/permits inserted without one (e.g. manual SQL). Returns rows updated."""
+    updated = 0
+    with _cursor(conn) as cur:
+        for table, field in (("leads", "address"), ("permits", "site_address")):
+            last_id = 0
+            while True:
+                cur.execute(
+                    f"""SELECT id, {field} AS address FROM {table}
+                        WHERE id > %s AND address_key IS NULL AND {field} IS NOT NULL
+                        ORDER BY id LIMIT %s""",
+                    (last_id, batch_size),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                keys = [(r["id"], normalize_address(r["address"])) for r in rows]
+                keys = [k for k in keys if k[1]]
+                if keys:
+                    execute_values(
+                        cur,
+                        f"UPDATE {table} t SET address_key = v.key FROM (VALUES %s) AS v(id, key) WHERE t.id = v.id",
+                        keys,
+                        page_size=1000,
+                    )
+                    updated += len(keys)
+    return updated
+
+
+def find_leads_by_address(address: str, county: str = None, fuzzy: bool = True, limit: int = 5, conn=None) -> list[dict]:
+    """Look up leads by address via the address_key indexes (exact, then trigram fallback)."""
+    key = normalize_address(address)
+    if not key:
+        return []
+    with _cursor(conn) as cur:
+        cur.execute(
+            """SELECT * FROM leads
+               WHERE address_key = %s AND (%s::text IS NULL OR county = %s)
+               ORDER BY id LIMIT %s""",
+            (key, county, county, limit),
+        )
+        rows = cur.fetchall()
+        if not rows and fuzzy:
             cur.execute(
-                "INSERT INTO scraping_runs (source) VALUES (%s) RETURNING id",
-                (source,),
+                """SELECT *, similarity(address_key, %s) AS match_score FROM leads
+                   WHERE address_key %% %s AND (%s::text IS NULL OR county = %s)
+                   ORDER BY address_key <-> %s LIMIT %s""",
+                (key, key, county, county, key, limit),
             )
-            result = cur.fetchone()
-            conn.commit()
-            return result["id"]
+            rows = cur.fetchall()
+        return [dict(row) for row in rows]
+
+
+def get_leads_with_permits(lead_ids: list[int], conn=None) -> list[tuple[dict, list[dict]]]:
+    """Fetch leads and all of their linked permits in two queries."""
+    with _cursor(conn) as cur:
+        cur.execute("SELECT * FROM leads WHERE id = ANY(%s)", (list(lead_ids),))
+        leads = [dict(row) for row in cur.fetchall()]
+        cur.execute("SELECT * FROM permits WHERE linked_lead_id = ANY(%s)", (list(lead_ids),))
+        permits: dict[int, list[dict]] = {}
+        for row in cur.fetchall():
+            permits.setdefault(row["linked_lead_id"], []).append(dict(row))
+    return [(lead, permits.get(lead["id"], [])) for lead in leads]
+
+
+def update_lead_scores(scores: list[tuple[int, int, list[str]]], conn=None):
+    """Set (lead_id, renovation_score, score_reasons) for many leads in one UPDATE."""
+    if not scores:
+        return
+    with _cursor(conn) as cur:
+        execute_values(
+            cur,
+            """UPDATE leads l SET renovation_score = v.score, score_reasons = v.reasons
+               FROM (VALUES %s) AS v(id, score, reasons)
+               WHERE l.id = v.id""",
+            scores,
+            template="(%s, %s, %s::text[])",
+            page_size=1000,
+        )
+
+
+def log_scraping_run(source: str, conn=None, search_start: date = None, search_end: date = None) -> int:
+    """Start a scraping run log entry (with the searched date window, if any). Returns the run ID."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            "INSERT INTO scraping_runs (source, search_start, search_end) VALUES (%s, %s, %s) RETURNING id",
+            (source, search_start, search_end),
+        )
+        result = cur.fetchone()
+        return result["id"]
+
+
+def get_scraping_run(run_id: int, conn=None) -> dict | None:
+    with _cursor(conn) as cur:
+        cur.execute("SELECT * FROM scraping_runs WHERE id = %s", (run_id,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+
+def reopen_scraping_run(run_id: int, conn=None):
+    """Mark a failed or interrupted run as running again (for --resume)."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            "UPDATE scraping_runs SET status = 'running', completed_at = NULL WHERE id = %s",
+            (run_id,),
+        )
+
+
+def checkpoint_scraping_run(
+    run_id: int,
+    last_page: int,
+    last_permit_number: str = None,
+    records_found: int = 0,
+    records_new: int = 0,
+    records_updated: int = 0,
+    conn=None,
+):
+    """Advance a run's cursor once a results page's permits are stored."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE scraping_runs
+               SET last_page = %s, last_permit_number = %s, checkpointed_at = NOW(),
+                   records_found = %s, records_new = %s, records_updated = %s
+               WHERE id = %s""",
+            (last_page, last_permit_number, records_found, records_new, records_updated, run_id),
+        )
+
+
+def update_scraping_run(
+    run_id: int,
+    records_found: int = 0,
+    records_new: int = 0,
+    records_updated: int = 0,
+    errors: int = 0,
+    conn=None,
+):
+    """Record partial progress on a running scraping run."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE scraping_runs
+               SET records_found = %s, records_new = %s, records_updated = %s, errors = %s
+               WHERE id = %s""",
+            (records_found, records_new, records_updated, errors, run_id),
+        )
 
 
 def complete_scraping_run(
@@ -132,23 +810,739 @@ def complete_scraping_run(
     errors: int = 0,
     error_details: str = None,
     status: str = "completed",
+    conn=None,
 ):
     """Complete a scraping run log entry."""
-    with get_connection() as conn:
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE scraping_runs
+               SET completed_at = NOW(), records_found = %s, records_new = %s,
+                   records_updated = %s, errors = %s, error_details = %s, status = %s
+               WHERE id = %s""",
+            (records_found, records_new, records_updated, errors, error_details, status, run_id),
+        )
+
+
+# Everything but the transcript body; transcript_hash is the handle for get_transcript()
+INTERACTION_COLUMNS = (
+    "id, lead_id, type, direction, status, duration_seconds, transcript_hash, transcript_chars, "
+    "sms_content, notes, twilio_sid, created_at"
+)
+
+
+def get_interactions(lead_id: int, limit: int = 50, conn=None) -> list[dict]:
+    """A lead's most recent interactions, metadata only (load transcripts with get_transcript)."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            f"SELECT {INTERACTION_COLUMNS} FROM interactions WHERE lead_id = %s ORDER BY created_at DESC LIMIT %s",
+            (lead_id, limit),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_transcripts(transcript_hashes: list[str], conn=None) -> dict[str, str]:
+    """Transcript text by hash, for the hashes that exist."""
+    hashes = [h for h in set(transcript_hashes) if h]
+    if not hashes:
+        return {}
+    with _cursor(conn) as cur:
+        cur.execute("SELECT hash, body FROM interaction_transcripts WHERE hash = ANY(%s)", (hashes,))
+        return {row["hash"]: row["body"] for row in cur.fetchall()}
+
+
+def get_transcript(transcript_hash: str, conn=None) -> str | None:
+    """Load one transcript on demand."""
+    return get_transcripts([transcript_hash], conn).get(transcript_hash)
+
+
+def prune_transcripts(min_age_days: int = 1, conn=None) -> int:
+    """Delete stored transcripts no interaction references (e.g. after archival)."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """DELETE FROM interaction_transcripts t
+               WHERE t.created_at < NOW() - make_interval(days => %s)
+                 AND NOT EXISTS (SELECT 1 FROM interactions i WHERE i.transcript_hash = t.hash)""",
+            (min_age_days,),
+        )
+        return cur.rowcount
+
+
+def ensure_interaction_partitions(months_ahead: int = 2, conn=None) -> int:
+    """Create missing monthly interactions partitions through months_ahead; returns how many."""
+    with _cursor(conn) as cur:
+        cur.execute("SELECT ensure_interaction_partitions(%s) AS created", (months_ahead,))
+        return cur.fetchone()["created"]
+
+
+def get_contactable_leads(limit: int = 50, conn=None) -> list[dict]:
+    """Get leads ready to be contacted (respects opt-outs and daily limits)."""
+    with _cursor(conn) as cur:
+        cur.execute("SELECT * FROM contactable_leads LIMIT %s", (limit,))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def get_report(day: str = None, conn=None) -> dict:
+    """
+    Pipeline and activity report from the rollup tables only (constant cost
+    regardless of history). `day` is an Eastern date (YYYY-MM-DD); today
+    when omitted.
+    """
+    with _cursor(conn) as cur:
+        cur.execute("SELECT COALESCE(%s::DATE, report_day(NOW()::TIMESTAMP)) AS day", (day,))
+        day = cur.fetchone()["day"]
+
+        cur.execute(
+            """SELECT status, SUM(lead_count)::INTEGER AS count,
+                      ROUND(SUM(score_sum)::NUMERIC / NULLIF(SUM(lead_count), 0))::INTEGER AS avg_score
+               FROM pipeline_rollup WHERE do_not_call = false
+               GROUP BY status HAVING SUM(lead_count) > 0 ORDER BY count DESC"""
+        )
+        pipeline = [dict(row) for row in cur.fetchall()]
+
+        cur.execute(
+            """SELECT county, source, SUM(lead_count)::INTEGER AS count
+               FROM pipeline_rollup
+               GROUP BY county, source HAVING SUM(lead_count) > 0 ORDER BY count DESC"""
+        )
+        by_county_source = [dict(row) for row in cur.fetchall()]
+
+        cur.execute(
+            """SELECT type, direction, status, interaction_count::INTEGER AS count,
+                      duration_seconds_sum::INTEGER AS duration_seconds
+               FROM interaction_daily_rollup WHERE day = %s AND interaction_count > 0
+               ORDER BY type, direction, status""",
+            (day,),
+        )
+        activity = [dict(row) for row in cur.fetchall()]
+
+        cur.execute(
+            """SELECT source, SUM(leads_created)::INTEGER AS count
+               FROM lead_daily_rollup WHERE day = %s
+               GROUP BY source HAVING SUM(leads_created) > 0 ORDER BY count DESC""",
+            (day,),
+        )
+        new_leads = [dict(row) for row in cur.fetchall()]
+
+    def activity_count(**match) -> int:
+        return sum(a["count"] for a in activity if all(a[k] == v for k, v in match.items()))
+
+    status_counts = {row["status"]: row["count"] for row in pipeline}
+    return {
+        "day": str(day),
+        "totals": {
+            "leads": sum(row["count"] for row in by_county_source),
+            "new": status_counts.get("new", 0),
+            "interested": status_counts.get("interested", 0),
+            "estimates_booked": status_counts.get("estimate_booked", 0),
+            "closed_won": status_counts.get("closed_won", 0),
+            "new_leads_today": sum(row["count"] for row in new_leads),
+            "calls_made": activity_count(type="call", direction="outbound"),
+            "sms_sent": activity_count(type="sms", direction="outbound"),
+            "opted_out": activity_count(status="opted_out"),
+            "interactions": activity_count(),
+        },
+        "pipeline": pipeline,
+        "by_county_source": by_county_source,
+        "activity": activity,
+        "new_leads_by_source": new_leads,
+    }
+
+
+def get_upcoming_follow_ups(
+    horizon_seconds: int, limit: int, redispatch_seconds: int, max_dispatches: int, conn=None
+) -> list[dict]:
+    """
+    Open follow-ups due within the horizon (idx_followups_scheduled), as
+    id and due (epoch seconds). A follow-up already handed off is due again
+    only once its redispatch delay has passed, and not at all once it has
+    been handed off max_dispatches times.
+    """
+    with _cursor(conn) as cur:
+        cur.execute(
+            """
+            SELECT id,
+                   EXTRACT(EPOCH FROM GREATEST(
+                       scheduled_at,
+                       COALESCE(dispatched_at + make_interval(secs => %s), scheduled_at)
+                   )::TIMESTAMPTZ)::FLOAT AS due
+            FROM follow_ups
+            WHERE completed = false
+              AND scheduled_at < NOW() + make_interval(secs => %s)
+              AND dispatch_count < %s
+            ORDER BY scheduled_at
+            LIMIT %s
+            """,
+            (redispatch_seconds, horizon_seconds, max_dispatches, limit),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def claim_due_follow_ups(
+    follow_up_ids: list[int], redispatch_seconds: int, max_dispatches: int, conn=None
+) -> list[dict]:
+    """
+    Mark due, not-yet-dispatched follow-ups as dispatched and return them
+    with their lead's name, phone and score. Rows another dispatcher holds
+    are skipped, so each follow-up is handed off once, and rows already
+    handed off max_dispatches times are not claimed again.
+    """
+    with _cursor(conn) as cur:
+        cur.execute(
+            """
+            WITH due AS (
+                SELECT id FROM follow_ups
+                WHERE id = ANY(%s)
+                  AND completed = false
+                  AND scheduled_at <= NOW()
+                  AND (dispatched_at IS NULL OR dispatched_at <= NOW() - make_interval(secs => %s))
+                  AND dispatch_count < %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE follow_ups f SET dispatched_at = NOW(), dispatch_count = f.dispatch_count + 1
+            FROM due, leads l
+            WHERE f.id = due.id AND l.id = f.lead_id
+            RETURNING f.id, f.lead_id, f.type, f.attempt_number, f.message_template, f.scheduled_at,
+                      f.dispatch_count,
+                      EXTRACT(EPOCH FROM f.scheduled_at::TIMESTAMPTZ)::FLOAT AS due,
+                      l.full_name, l.phone, l.renovation_score
+            """,
+            (list(follow_up_ids), redispatch_seconds, max_dispatches),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def reset_follow_up_dispatch(follow_up_ids: list[int], conn=None):
+    """Undo claim_due_follow_ups for follow-ups that were not handed off."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE follow_ups SET dispatched_at = NULL, dispatch_count = GREATEST(dispatch_count - 1, 0)
+               WHERE id = ANY(%s) AND completed = false AND dispatched_at IS NOT NULL""",
+            (list(follow_up_ids),),
+        )
+
+
+def expire_dispatched_follow_ups(redispatch_seconds: int, max_dispatches: int, conn=None) -> int:
+    """
+    Close follow-ups handed off max_dispatches times that the agent still
+    hasn't completed a redispatch delay after the last hand-off
+    (result 'dispatch_limit'). Returns the number closed.
+    """
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE follow_ups SET completed = true, completed_at = NOW(), result = 'dispatch_limit'
+               WHERE completed = false
+                 AND dispatch_count >= %s
+                 AND dispatched_at <= NOW() - make_interval(secs => %s)""",
+            (max_dispatches, redispatch_seconds),
+        )
+        return cur.rowcount
+
+
+def skip_follow_ups(follow_up_ids: list[int], result: str = "skipped_compliance", conn=None):
+    """Close follow-ups that must not be executed."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE follow_ups SET completed = true, completed_at = NOW(), result = %s
+               WHERE id = ANY(%s) AND completed = false""",
+            (result, list(follow_up_ids)),
+        )
+
+
+def enroll_cadence(
+    cadence: str = "standard",
+    lead_ids: list[int] = None,
+    source: str = None,
+    min_score: int = None,
+    statuses: tuple[str, ...] = ("new",),
+    created_since=None,
+    conn=None,
+) -> dict:
+    """
+    Enroll every selected lead in a cadence (cadence_steps) in one statement.
+
+    Leads are selected by lead_ids, or by the source/min_score/statuses/
+    created_since filters. Opted-out, do_not_call and closed leads, and
+    leads with open follow-ups from this cadence, are skipped. Step times
+    are shifted into the 8AM-8PM Eastern window. National DNC registry
+    numbers are caught by the compliance check at dispatch time.
+
+    Returns counts: selected, skipped_not_contactable (no phone, opted
+    out, do_not_call or closed), skipped_already_enrolled, enrolled,
+    follow_ups_created.
+    """
+    conditions, params = [], {"cadence": cadence}
+    if lead_ids is not None:
+        conditions.append("l.id = ANY(%(lead_ids)s)")
+        params["lead_ids"] = list(lead_ids)
+    if source is not None:
+        conditions.append("l.source = %(source)s")
+        params["source"] = source
+    if min_score is not None:
+        conditions.append("l.renovation_score >= %(min_score)s")
+        params["min_score"] = min_score
+    if statuses and lead_ids is None:
+        conditions.append("l.status = ANY(%(statuses)s)")
+        params["statuses"] = list(statuses)
+    if created_since is not None:
+        conditions.append("l.created_at >= %(created_since)s")
+        params["created_since"] = created_since
+    where = " AND ".join(conditions) or "true"
+
+    with _cursor(conn) as cur:
+        cur.execute("SELECT COUNT(*) AS steps FROM cadence_steps WHERE cadence = %s", (cadence,))
+        if not cur.fetchone()["steps"]:
+            raise ValueError(f"Unknown cadence: {cadence}")
+
+        # Concurrent enrollments in the same cadence would both miss each other's rows
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('enroll_cadence'), hashtext(%s))", (cadence,))
+        cur.execute(
+            f"""
+            WITH selected AS (
+                SELECT l.id, l.phone, l.phone_key, l.do_not_call, l.status FROM leads l WHERE {where}
+            ),
+            eligible AS (
+                SELECT s.id FROM selected s
+                WHERE s.phone IS NOT NULL
+                  AND s.do_not_call = false
+                  AND s.status NOT IN ('do_not_call', 'closed_won', 'closed_lost')
+                  AND NOT EXISTS (SELECT 1 FROM opt_outs o WHERE o.phone_key = s.phone_key)
+            ),
+            fresh AS (
+                SELECT e.id FROM eligible e
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM follow_ups f
+                    WHERE f.lead_id = e.id AND f.cadence = %(cadence)s AND f.completed = false
+                )
+            ),
+            created AS (
+                INSERT INTO follow_ups (lead_id, scheduled_at, type, attempt_number, message_template, cadence)
+                SELECT fresh.id,
+                       shift_into_calling_hours((NOW() + make_interval(days => c.day_offset))::TIMESTAMP),
+                       c.type, c.attempt_number, c.message_template, c.cadence
+                FROM fresh CROSS JOIN cadence_steps c
+                WHERE c.cadence = %(cadence)s
+                ORDER BY fresh.id, c.step
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM selected) AS selected,
+                   (SELECT COUNT(*) FROM eligible) AS eligible,
+                   (SELECT COUNT(*) FROM fresh) AS enrolled,
+                   (SELECT COUNT(*) FROM created) AS follow_ups_created
+            """,
+            params,
+        )
+        row = cur.fetchone()
+
+    return {
+        "selected": row["selected"],
+        "skipped_not_contactable": row["selected"] - row["eligible"],
+        "skipped_already_enrolled": row["eligible"] - row["enrolled"],
+        "enrolled": row["enrolled"],
+        "follow_ups_created": row["follow_ups_created"],
+    }
+
+
+def claim_leads(worker: str, limit: int = 10, lease_seconds: int = LEAD_LEASE_SECONDS, conn=None) -> list[dict]:
+    """
+    Lease the next `limit` contactable leads (score order) to `worker`.
+
+    Rows another worker is claiming right now are skipped (SKIP LOCKED)
+    rather than waited on, and a lead with a live lease is never handed
+    out twice. Expired leases are reclaimed. Each returned lead carries its
+    leased_until; finish with complete_lease() or release_lease().
+    """
+    with _cursor(conn) as cur:
+        cur.execute(
+            """
+            WITH picked AS (
+                SELECT l.id
+                FROM leads l
+                WHERE l.status NOT IN ('do_not_call', 'closed_won', 'closed_lost')
+                  AND l.do_not_call = false
+                  AND l.phone IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM opt_outs o WHERE o.phone_key = l.phone_key)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM contact_budget b
+                      WHERE b.lead_id = l.id AND b.blocked_until > NOW()
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM lead_leases ll
+                      WHERE ll.lead_id = l.id AND ll.leased_until > NOW()
+                  )
+                ORDER BY l.renovation_score DESC, l.created_at ASC
+                LIMIT %(limit)s
+                FOR NO KEY UPDATE OF l SKIP LOCKED
+            ),
+            leased AS (
+                INSERT INTO lead_leases (lead_id, worker, leased_until)
+                SELECT id, %(worker)s, NOW() + make_interval(secs => %(secs)s) FROM picked
+                ON CONFLICT (lead_id) DO UPDATE
+                    SET worker = EXCLUDED.worker, leased_at = NOW(), leased_until = EXCLUDED.leased_until
+                    -- A lease committed after our snapshot was taken still wins
+                    WHERE lead_leases.leased_until <= NOW()
+                RETURNING lead_id, leased_until
+            )
+            SELECT l.*, leased.leased_until
+            FROM leased JOIN leads l ON l.id = leased.lead_id
+            ORDER BY l.renovation_score DESC, l.created_at ASC
+            """,
+            {"limit": limit, "worker": worker, "secs": lease_seconds},
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def renew_lease(lead_ids: list[int], worker: str, lease_seconds: int = LEAD_LEASE_SECONDS, conn=None) -> list[int]:
+    """Extend worker's live leases (e.g. during a long call); returns the ids still held."""
+    with _cursor(conn) as cur:
+        cur.execute(
+            """UPDATE lead_leases SET leased_until = NOW() + make_interval(secs => %s)
+               WHERE lead_id = ANY(%s) AND worker = %s AND leased_until > NOW()
+               RETURNING lead_id""",
+            (lease_seconds, list(lead_ids), worker),
+        )
+        return [row["lead_id"] for row in cur.fetchall()]
+
+
+def complete_lease(lead_id: int, worker: str, conn=None) -> bool:
+    """Drop worker's lease once the lead has been contacted; the contact budget takes over."""
+    with _cursor(conn) as cur:
+        cur.execute("DELETE FROM lead_leases WHERE lead_id = %s AND worker = %s", (lead_id, worker))
+        return cur.rowcount == 1
+
+
+def release_lease(lead_id: int, worker: str, retry_after_seconds: int = 0, conn=None) -> bool:
+    """Give an uncontacted lead back to the queue, now or after `retry_after_seconds`."""
+    with _cursor(conn) as cur:
+        if retry_after_seconds:
+            cur.execute(
+                """UPDATE lead_leases SET leased_until = NOW() + make_interval(secs => %s)
+                   WHERE lead_id = %s AND worker = %s""",
+                (retry_after_seconds, lead_id, worker),
+            )
+        else:
+            cur.execute("DELETE FROM lead_leases WHERE lead_id = %s AND worker = %s", (lead_id, worker))
+        return cur.rowcount == 1
+
+
+def check_contactable(lead_ids: list[int], conn=None) -> list[dict]:
+    """
+    Pre-dial compliance verdicts for a batch of leads in one query.
+
+    Checks, in order: lead exists and has a phone, do_not_call, opt_outs,
+    National DNC registry, closed status, the 3-per-24h contact budget and
+    the calling window (database clock, Eastern time).
+
+    Returns one dict per requested id, in order: lead_id, allowed, reason
+    (None when allowed), blocked_until (for daily_limit) and lead (the
+    leads row, or None).
+    """
+    if not lead_ids:
+        return []
+
+    with _cursor(conn) as cur:
+        cur.execute(
+            """
+            SELECT q.id AS requested_id, l.*,
+                   EXISTS (SELECT 1 FROM opt_outs o WHERE o.phone_key = l.phone_key) AS _opted_out,
+                   b.blocked_until AS _blocked_until,
+                   EXTRACT(HOUR FROM NOW() AT TIME ZONE %s)::INTEGER AS _local_hour
+            FROM unnest(%s::INTEGER[]) WITH ORDINALITY AS q(id, ord)
+            LEFT JOIN leads l ON l.id = q.id
+            LEFT JOIN contact_budget b ON b.lead_id = l.id AND b.blocked_until > NOW()
+            ORDER BY q.ord
+            """,
+            (CALLING_TIMEZONE, list(lead_ids)),
+        )
+        rows = [dict(row) for row in cur.fetchall()]
+
+    registry = get_dnc_registry()
+    on_registry = registry.contains_many([r["phone"] for r in rows]) if registry is not None else [False] * len(rows)
+
+    verdicts = []
+    for row, registered in zip(rows, on_registry):
+        opted_out = row.pop("_opted_out")
+        blocked_until = row.pop("_blocked_until")
+        local_hour = row.pop("_local_hour")
+        lead_id = row.pop("requested_id")
+
+        if row["id"] is None:
+            reason = "not_found"
+        elif not row["phone"]:
+            reason = "no_phone"
+        elif row["do_not_call"]:
+            reason = "do_not_call"
+        elif opted_out:
+            reason = "opted_out"
+        elif registered:
+            reason = "dnc_registry"
+        elif row["status"] in ("do_not_call", "closed_won", "closed_lost"):
+            reason = f"status_{row['status']}"
+        elif blocked_until is not None:
+            reason = "daily_limit"
+        elif not CALLING_HOURS[0] <= local_hour < CALLING_HOURS[1]:
+            reason = "outside_calling_hours"
+        else:
+            reason = None
+
+        verdicts.append({
+            "lead_id": lead_id,
+            "allowed": reason is None,
+            "reason": reason,
+            "blocked_until": blocked_until,
+            "lead": row if row["id"] is not None else None,
+        })
+    return verdicts
+
+
+def _benchmark_inserts(n: int = 2000) -> dict:
+    """Compare inserts/sec: one connection per row vs one pooled session."""
+    import time
+
+    ddl = "CREATE TABLE IF NOT EXISTS _bench_inserts (id SERIAL PRIMARY KEY, v TEXT)"
+    with session() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ddl)
+            cur.execute("TRUNCATE _bench_inserts")
+
+    start = time.perf_counter()
+    for i in range(n):
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("INSERT INTO _bench_inserts (v) VALUES (%s)", (str(i),))
+            conn.commit()
+        conn.close()
+    unpooled = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with session() as conn:
+        for i in range(n):
+            with _cursor(conn) as cur:
+                cur.execute("INSERT INTO _bench_inserts (v) VALUES (%s)", (str(i),))
+    pooled = n / (time.perf_counter() - start)
+
+    with session() as conn:
         with conn.cursor() as cur:
+            cur.execute("DROP TABLE _bench_inserts")
+
+    return {"rows": n, "unpooled_per_sec": round(unpooled), "pooled_per_sec": round(pooled)}
+
+
+def _benchmark_transcripts(n: int = 5000, transcript_chars: int = 8000) -> dict:
+    """
+    Table size and per-lead listing latency: transcripts inline (as before)
+    vs metadata plus the side store. Uses scratch tables; interactions is untouched.
+    """
+    import time
+
+    words = "yeah so we were thinking about redoing the kitchen cabinets countertops maybe the master bath".split()
+    setup = f"""
+        DROP TABLE IF EXISTS _bench_inline, _bench_meta, _bench_transcripts;
+        CREATE TABLE _bench_inline (id SERIAL PRIMARY KEY, lead_id INTEGER, status TEXT,
+                                    transcript TEXT, created_at TIMESTAMP DEFAULT NOW());
+        CREATE TABLE _bench_transcripts (hash CHAR(64) PRIMARY KEY, body TEXT COMPRESSION lz4 NOT NULL);
+        CREATE TABLE _bench_meta (id SERIAL PRIMARY KEY, lead_id INTEGER, status TEXT,
+                                  transcript_hash CHAR(64), created_at TIMESTAMP DEFAULT NOW());
+        INSERT INTO _bench_inline (lead_id, status, transcript)
+        SELECT g % 500, 'completed',
+               (SELECT string_agg((ARRAY{words!r})[1 + ((g * 7 + w * 13) % {len(words)})], ' ')
+                FROM generate_series(1, {transcript_chars // 6}) w)
+        FROM generate_series(1, {n}) g;
+        INSERT INTO _bench_transcripts (hash, body)
+        SELECT DISTINCT encode(sha256(convert_to(transcript, 'UTF8')), 'hex'), transcript FROM _bench_inline;
+        INSERT INTO _bench_meta (lead_id, status, transcript_hash, created_at)
+        SELECT lead_id, status, encode(sha256(convert_to(transcript, 'UTF8')), 'hex'), created_at FROM _bench_inline;
+        CREATE INDEX ON _bench_inline(lead_id);
+        CREATE INDEX ON _bench_meta(lead_id);
+        ANALYZE _bench_inline, _bench_meta, _bench_transcripts;
+    """
+
+    def timed(cur, sql: str, runs: int = 200) -> float:
+        start = time.perf_counter()
+        for i in range(runs):
+            cur.execute(sql, (i % 500,))
+            cur.fetchall()
+        return round((time.perf_counter() - start) / runs * 1000, 3)
+
+    with session() as conn:
+        with conn.cursor() as cur:
+            cur.execute(setup)
             cur.execute(
-                """UPDATE scraping_runs
-                   SET completed_at = NOW(), records_found = %s, records_new = %s,
-                       records_updated = %s, errors = %s, error_details = %s, status = %s
-                   WHERE id = %s""",
-                (records_found, records_new, records_updated, errors, error_details, status, run_id),
+                """SELECT pg_total_relation_size('_bench_inline') AS inline_bytes,
+                          pg_total_relation_size('_bench_meta') AS meta_bytes,
+                          pg_total_relation_size('_bench_transcripts') AS store_bytes"""
             )
-        conn.commit()
+            sizes = dict(cur.fetchone())
+            inline_ms = timed(cur, "SELECT * FROM _bench_inline WHERE lead_id = %s")
+            meta_ms = timed(cur, "SELECT * FROM _bench_meta WHERE lead_id = %s")
+            cur.execute("DROP TABLE _bench_inline, _bench_meta, _bench_transcripts")
 
+    return {
+        "rows": n,
+        **sizes,
+        "listing_ms_inline": inline_ms,
+        "listing_ms_metadata": meta_ms,
+    }
 
-def get_contactable_leads(limit: int = 50) -> list[dict]:
-    """Get leads ready to be contacted (respects opt-outs and daily limits)."""
-    with get_connection() as conn:
+
+def _stress_lease_queue(workers: int = 8, rounds: int = 25, batch: int = 5) -> dict:
+    """
+    Concurrency check for claim_leads against a local Postgres: `workers`
+    threads claim and complete leads in a loop; no lead may ever be held by
+    two workers at once. Seeds its own leads and removes them afterwards.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    marker = "_lease_stress_"
+    with session() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM contactable_leads LIMIT %s", (limit,))
-            return [dict(row) for row in cur.fetchall()]
+            cur.execute("DELETE FROM leads WHERE full_name = %s", (marker,))
+            cur.execute(
+                """INSERT INTO leads (full_name, phone, renovation_score)
+                   SELECT %s, '000' || LPAD(g::TEXT, 7, '0'), 100 FROM generate_series(1, %s) g""",
+                (marker, workers * batch * 2),
+            )
+
+    held, claims, duplicates = {}, [0], []
+    held_lock = threading.Lock()
+
+    def run(worker: str):
+        for _ in range(rounds):
+            leads = claim_leads(worker, batch)
+            with held_lock:
+                claims[0] += len(leads)
+                for lead in leads:
+                    if lead["id"] in held:
+                        duplicates.append((lead["id"], held[lead["id"]], worker))
+                    held[lead["id"]] = worker
+            time.sleep(0.005)
+            for lead in leads:
+                # Forget the lead before the lease row goes, so a re-claim isn't a false duplicate
+                with held_lock:
+                    held.pop(lead["id"], None)
+                complete_lease(lead["id"], worker)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, [f"stress-{i}" for i in range(workers)]))
+        elapsed = time.perf_counter() - start
+
+        # Expiry: a lapsed lease is reclaimable by another worker
+        first = claim_leads("stress-expiry-a", 1, lease_seconds=1)
+        time.sleep(1.5)
+        second = claim_leads("stress-expiry-b", batch * workers * 2)
+        expired_reclaimed = bool(first) and first[0]["id"] in {lead["id"] for lead in second}
+    finally:
+        with session() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM lead_leases WHERE worker LIKE %s", ("stress-%",))
+                cur.execute("DELETE FROM leads WHERE full_name = %s", (marker,))
+
+    return {
+        "workers": workers,
+        "claims": claims[0],
+        "claims_per_sec": int(claims[0] / elapsed),
+        "duplicates": len(duplicates),
+        "expired_lease_reclaimed": expired_reclaimed,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    usage = (
+        "Usage: python db.py bench [rows]\n"
+        "       python db.py check <lead_id> [lead_id ...]\n"
+        "       python db.py claim <worker> [count]\n"
+        "       python db.py complete|release <worker> <lead_id> [lead_id ...]\n"
+        "       python db.py lease-stress [workers] [rounds]\n"
+        "       python db.py enroll <cadence> [lead_id ...] [--source S] [--min-score N] [--since YYYY-MM-DD]\n"
+        "       python db.py report [YYYY-MM-DD]\n"
+        "       python db.py interactions <lead_id> [limit]\n"
+        "       python db.py transcript <transcript_hash>\n"
+        "       python db.py transcript-bench [rows]"
+    )
+    commands = (
+        "bench", "check", "claim", "complete", "release", "lease-stress", "enroll", "report",
+        "interactions", "transcript", "transcript-bench",
+    )
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(usage)
+        sys.exit(1)
+
+    if sys.argv[1] in ("claim", "complete", "release"):
+        if len(sys.argv) < (3 if sys.argv[1] == "claim" else 4):
+            print(usage)
+            sys.exit(1)
+        worker = sys.argv[2]
+        if sys.argv[1] == "claim":
+            count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+            for lead in claim_leads(worker, count):
+                print(json.dumps(lead, default=str))
+        else:
+            finish = complete_lease if sys.argv[1] == "complete" else release_lease
+            for lead_id in sys.argv[3:]:
+                print(json.dumps({"lead_id": int(lead_id), sys.argv[1] + "d": finish(int(lead_id), worker)}))
+        sys.exit(0)
+
+    if sys.argv[1] in ("interactions", "transcript"):
+        if len(sys.argv) < 3:
+            print(usage)
+            sys.exit(1)
+        if sys.argv[1] == "interactions":
+            limit = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+            for interaction in get_interactions(int(sys.argv[2]), limit):
+                print(json.dumps(interaction, default=str))
+        else:
+            transcript = get_transcript(sys.argv[2])
+            print(transcript if transcript is not None else "Transcript not found")
+            sys.exit(0 if transcript is not None else 1)
+        sys.exit(0)
+
+    if sys.argv[1] == "transcript-bench":
+        print(f"Result: {_benchmark_transcripts(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)}")
+        sys.exit(0)
+
+    if sys.argv[1] == "report":
+        print(json.dumps(get_report(sys.argv[2] if len(sys.argv) > 2 else None), indent=2, default=str))
+        sys.exit(0)
+
+    if sys.argv[1] == "enroll":
+        import argparse
+        parser = argparse.ArgumentParser(prog="python db.py enroll")
+        parser.add_argument("cadence")
+        parser.add_argument("lead_ids", type=int, nargs="*")
+        parser.add_argument("--source")
+        parser.add_argument("--min-score", type=int)
+        parser.add_argument("--since", help="Only leads created on or after this date")
+        args = parser.parse_args(sys.argv[2:])
+        result = enroll_cadence(
+            args.cadence,
+            lead_ids=args.lead_ids or None,
+            source=args.source,
+            min_score=args.min_score,
+            created_since=args.since,
+        )
+        print(f"Result: {result}")
+        sys.exit(0)
+
+    if sys.argv[1] == "lease-stress":
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 25
+        result = _stress_lease_queue(workers, rounds)
+        print(f"Result: {result}")
+        sys.exit(1 if result["duplicates"] or not result["expired_lease_reclaimed"] else 0)
+
+    if sys.argv[1] == "check":
+        if len(sys.argv) < 3:
+            print(usage)
+            sys.exit(1)
+        # One JSON verdict per line, in the order given
+        for verdict in check_contactable([int(arg) for arg in sys.argv[2:]]):
+            print(json.dumps(verdict, default=str))
+        sys.exit(0)
+
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    print(f"Result: {_benchmark_inserts(rows)}")
@@ -0,0 +1,412 @@
+"""National Do-Not-Call registry lookups from a memory-mapped sorted array.
+
+The FTC registry for the Florida area codes is tens of millions of numbers,
+too many for opt_outs rows or a Python set. build_registry() turns the
+downloaded area-code files into one sorted, de-duplicated int64 .npy file
+(8 bytes per number); DncRegistry memory-maps it and answers lookups by
+binary search, so the OS page cache (shared by every worker process) holds
+the data instead of each process's heap.
+
+Every build or change also writes a Bloom filter next to the array
+(registry.bloom.npy, ~1.2 bytes per number, ~1% false positives). With
+DNC_BLOOM=1 registries map it too and reject most numbers that are not
+registered without touching the array's pages. The filter carries the
+inode and mtime of the array it was built from, and a filter that doesn't
+match the mapped array is ignored.
+
+FTC files carry one number per line, either as 10 digits or as
+"area code,number". Daily change files add a flag column: A/ADD to
+register, D/DEL/DELETE to remove. Lines that fit none of these are counted
+and logged, and a file with more than DNC_MAX_REJECTED (a fraction of its
+lines) is refused. apply_changes() rewrites the array atomically, and open
+registries pick up the new file on their next lookup.
+"""
+
+import os
+import re
+import csv
+import time
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DNC_REGISTRY_PATH = os.getenv("DNC_REGISTRY_PATH", "/app/data/dnc/registry.npy")
+DNC_BLOOM_ENABLED = os.getenv("DNC_BLOOM", "0") == "1"
+# Largest fraction of unparseable lines tolerated in a registry or change file
+DNC_MAX_REJECTED = float(os.getenv("DNC_MAX_REJECTED", "0.001"))
+
+# Seconds between checks for a rewritten registry file
+RELOAD_CHECK_INTERVAL = 30
+
+READ_CHUNK_ROWS = 5_000_000
+
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+# Bloom file: (inode, mtime_ns) of its registry array as int64s, then the bits
+_BLOOM_STAMP_BYTES = 16
+# Odd 64-bit multipliers for multiply-shift hashing, one per Bloom hash
+_BLOOM_MULTIPLIERS = np.array([
+    0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+    0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0xA0761D6478BD642F,
+], dtype=np.uint64)[:BLOOM_HASHES]
+
+
+def phone_key(phone: str | None) -> int:
+    """Last 10 digits of a phone as an int; -1 when there are none."""
+    digits = re.sub(r"\D", "", str(phone or ""))[-10:]
+    return int(digits) if digits else -1
+
+
+def phone_keys(phones) -> np.ndarray:
+    """Vectorized phone_key(): int64 array, -1 where there are no digits."""
+    phones = pd.Series(phones, dtype="string")
+    # Registry files are plain digits; only formatted numbers need the regex
+    keys = pd.to_numeric(phones, errors="coerce")
+    formatted = keys.isna() & phones.notna()
+    if formatted.any():
+        digits = phones[formatted].str.replace(r"\D", "", regex=True).str[-10:]
+        keys[formatted] = pd.to_numeric(digits.replace("", pd.NA), errors="coerce")
+    return (keys % 10_000_000_000).fillna(-1).to_numpy(dtype=np.int64)
+
+
+# One registry or change line: the number's digits, optionally an A/D flag field
+_LINE = re.compile(r"^\s*(?P<number>[\d\s()\-]+(?:,[\d\s()\-]+)?)\s*(?:,\s*(?P<flag>[A-Za-z]+)\s*)?$")
+_ADD_FLAGS = ["A", "ADD"]
+_DELETE_FLAGS = ["D", "DEL", "DELETE"]
+
+
+def _read_numbers(path: str) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Read an FTC registry or change file.
+
+    Returns (numbers, deleted, rejected) where deleted marks D/DEL/DELETE
+    rows of a change file (all False for a full registry file) and rejected
+    counts non-blank lines that are not a 10-digit number with an optional
+    flag. Raises ValueError when more than DNC_MAX_REJECTED of the lines
+    were rejected.
+    """
+    numbers, deleted = [], []
+    lines = 0
+    rejected = 0
+    # Whole lines as one field: the ragged change-file layouts are parsed below
+    reader = pd.read_csv(
+        path, header=None, names=["line"], dtype=str, sep="\x1f", quoting=csv.QUOTE_NONE,
+        chunksize=READ_CHUNK_ROWS, skip_blank_lines=True, engine="c",
+    )
+    for chunk in reader:
+        line = chunk["line"].str.strip()
+        lines += len(line)
+
+        # Full registry files are plain 10-digit lines; only the rest need the regex
+        keys = pd.to_numeric(line, errors="coerce")
+        plain = keys.between(1_000_000_000, 9_999_999_999) & line.str.len().eq(10)
+        chunk_keys = [keys[plain].to_numpy(dtype=np.int64)]
+        chunk_deleted = [np.zeros(int(plain.sum()), dtype=bool)]
+
+        other = line[~plain]
+        if len(other):
+            parts = other.str.extract(_LINE)
+            digits = parts["number"].str.replace(r"\D", "", regex=True)
+            flags = parts["flag"].str.upper()
+            valid = digits.str.len().eq(10) & (flags.isna() | flags.isin(_ADD_FLAGS + _DELETE_FLAGS))
+            rejected += int((~valid).sum())
+            chunk_keys.append(digits[valid].astype(np.int64).to_numpy())
+            chunk_deleted.append(flags[valid].isin(_DELETE_FLAGS).to_numpy())
+
+        numbers.append(np.concatenate(chunk_keys))
+        deleted.append(np.concatenate(chunk_deleted))
+
+    if rejected:
+        logger.warning(f"{os.path.basename(path)}: rejected {rejected} of {lines} lines")
+        if rejected > DNC_MAX_REJECTED * lines:
+            raise ValueError(
+                f"{path}: {rejected} of {lines} lines are not registry numbers "
+                f"(more than DNC_MAX_REJECTED={DNC_MAX_REJECTED:g})"
+            )
+    if not numbers:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), rejected
+    return np.concatenate(numbers), np.concatenate(deleted), rejected
+
+
+def bloom_path(path: str = DNC_REGISTRY_PATH) -> str:
+    """Bloom filter file written alongside a registry array."""
+    return f"{os.path.splitext(path)[0]}.bloom.npy"
+
+
+def _write_registry(numbers: np.ndarray, path: str):
+    """
+    Atomically replace the registry file and its Bloom filter; mapped readers
+    keep the old inodes.
+
+    The filter is stamped with the new array's inode and mtime (kept by the
+    rename) and replaced first, so a reader never pairs a filter with an
+    array it wasn't built from.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(numbers, dtype=np.int64))
+    st = os.stat(tmp)
+
+    stamp = np.array([st.st_ino, st.st_mtime_ns], dtype=np.int64).view(np.uint8)
+    bloom_tmp = f"{bloom_path(path)}.tmp"
+    with open(bloom_tmp, "wb") as f:
+        np.save(f, np.concatenate([stamp, _BloomFilter.build(numbers).bits]))
+    os.replace(bloom_tmp, bloom_path(path))
+    os.replace(tmp, path)
+
+
+def build_registry(filepaths: list[str], path: str = DNC_REGISTRY_PATH) -> dict:
+    """Build the sorted registry array from full FTC area-code files."""
+    start = time.time()
+    parts = []
+    rejected = 0
+    for filepath in filepaths:
+        numbers, _, file_rejected = _read_numbers(filepath)
+        logger.info(f"{os.path.basename(filepath)}: {len(numbers)} numbers")
+        parts.append(numbers)
+        rejected += file_rejected
+
+    registry = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    _write_registry(registry, path)
+
+    stats = {
+        "numbers": len(registry),
+        "rejected_lines": rejected,
+        "file_mb": round(os.path.getsize(path) / 1e6, 1),
+        "bloom_mb": round(os.path.getsize(bloom_path(path)) / 1e6, 1),
+        "seconds": round(time.time() - start, 1),
+    }
+    logger.info(f"DNC registry built at {path}: {stats}")
+    return stats
+
+
+def apply_changes(filepaths: list[str], path: str = DNC_REGISTRY_PATH) -> dict:
+    """Merge daily change files (in order) into the registry."""
+    start = time.time()
+    registry = np.load(path, mmap_mode="r")
+    before = len(registry)
+
+    added, removed = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    rejected = 0
+    for filepath in filepaths:
+        numbers, deleted, file_rejected = _read_numbers(filepath)
+        rejected += file_rejected
+        # A later file wins over an earlier one for the same number
+        added = np.union1d(np.setdiff1d(added, numbers[deleted]), numbers[~deleted])
+        removed = np.union1d(np.setdiff1d(removed, numbers[~deleted]), numbers[deleted])
+
+    merged = np.union1d(np.setdiff1d(registry, removed, assume_unique=True), added)
+    del registry
+    _write_registry(merged, path)
+
+    stats = {
+        "numbers": len(merged),
+        "net_change": len(merged) - before,
+        "change_adds": len(added),
+        "change_deletes": len(removed),
+        "rejected_lines": rejected,
+        "seconds": round(time.time() - start, 1),
+    }
+    logger.info(f"DNC changes applied to {path}: {stats}")
+    return stats
+
+
+class _BloomFilter:
+    """Bit-array Bloom filter over int64 keys (multiply-shift hashes)."""
+
+    def __init__(self, bits: np.ndarray):
+        # A power-of-two number of bits, as written by build()
+        self.bits = bits
+        self._log2 = (len(bits) * 8).bit_length() - 1
+        self._shift = np.uint64(64 - self._log2)
+
+    @classmethod
+    def build(cls, keys: np.ndarray) -> "_BloomFilter":
+        log2 = int(np.ceil(np.log2(max(64, BLOOM_BITS_PER_KEY * len(keys)))))
+        bloom = cls(np.zeros((1 << log2) // 8, dtype=np.uint8))
+        for start in range(0, len(keys), READ_CHUNK_ROWS):
+            for positions in bloom._positions(keys[start:start + READ_CHUNK_ROWS]):
+                np.bitwise_or.at(bloom.bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        return bloom
+
+    @classmethod
+    def load(cls, path: str, registry_stat: os.stat_result) -> "_BloomFilter | None":
+        """Map the filter built for the registry file with this stat, or None if there is none."""
+        try:
+            data = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        stamp = np.asarray(data[:_BLOOM_STAMP_BYTES]).view(np.int64)
+        if len(stamp) != 2 or (int(stamp[0]), int(stamp[1])) != (registry_stat.st_ino, registry_stat.st_mtime_ns):
+            return None
+        return cls(data[_BLOOM_STAMP_BYTES:])
+
+    def _positions(self, keys: np.ndarray):
+        keys = np.asarray(keys, dtype=np.int64).view(np.uint64)
+        for multiplier in _BLOOM_MULTIPLIERS:
+            yield ((keys * multiplier) >> self._shift).astype(np.int64)
+
+    def might_contain_one(self, key: int) -> bool:
+        shift = int(self._shift)
+        for multiplier in _BLOOM_MULTIPLIERS.tolist():
+            position = ((key * multiplier) & 0xFFFFFFFFFFFFFFFF) >> shift
+            if not (self.bits[position >> 3] >> (position & 7)) & 1:
+                return False
+        return True
+
+    def might_contain(self, keys: np.ndarray) -> np.ndarray:
+        result = np.ones(len(keys), dtype=bool)
+        for positions in self._positions(keys):
+            result &= (self.bits[positions >> 3] >> (positions & 7)) & 1 == 1
+        return result
+
+
+class DncRegistry:
+    """Memory-mapped registry; reopens itself when the file is replaced."""
+
+    def __init__(self, path: str = DNC_REGISTRY_PATH, bloom: bool = DNC_BLOOM_ENABLED):
+        self.path = path
+        self.use_bloom = bloom
+        self._numbers = None
+        self._bloom = None
+        # (inode, mtime_ns) of the mapped file
+        self._identity = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _current(self) -> np.ndarray:
+        now = time.monotonic()
+        if self._numbers is not None and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return self._numbers
+        with self._lock:
+            self._checked_at = now
+            st = os.stat(self.path)
+            identity = (st.st_ino, st.st_mtime_ns)
+            if identity != self._identity:
+                numbers = np.load(self.path, mmap_mode="r")
+                after = os.stat(self.path)
+                if (after.st_ino, after.st_mtime_ns) != identity:
+                    # Replaced while mapping: don't pair it with a filter; retry next lookup
+                    self._numbers, self._bloom, self._checked_at = numbers, None, 0.0
+                    return numbers
+                bloom = _BloomFilter.load(bloom_path(self.path), st) if self.use_bloom else None
+                if self.use_bloom and bloom is None:
+                    logger.warning(f"No Bloom filter matches {self.path}; rebuild it with dnc_registry.py build/apply")
+                self._numbers, self._bloom, self._identity = numbers, bloom, identity
+                logger.info(f"DNC registry mapped: {len(numbers)} numbers from {self.path}")
+            return self._numbers
+
+    def contains_many(self, phones) -> np.ndarray:
+        """Boolean array: which phones are on the registry."""
+        numbers = self._current()
+        keys = phone_keys(phones)
+        found = np.zeros(len(keys), dtype=bool)
+        candidates = keys >= 0
+        if self._bloom is not None:
+            candidates &= self._bloom.might_contain(keys)
+        if not len(numbers) or not candidates.any():
+            return found
+
+        probe = keys[candidates]
+        idx = np.searchsorted(numbers, probe)
+        idx[idx == len(numbers)] = 0
+        found[candidates] = numbers[idx] == probe
+        return found
+
+    def contains(self, phone: str) -> bool:
+        key = phone_key(phone)
+        if key < 0:
+            return False
+        numbers = self._current()
+        if self._bloom is not None and not self._bloom.might_contain_one(key):
+            return False
+        idx = int(np.searchsorted(numbers, key))
+        return idx < len(numbers) and int(numbers[idx]) == key
+
+    def __len__(self) -> int:
+        return len(self._current())
+
+    def memory_info(self) -> dict:
+        numbers = self._current()
+        return {
+            "numbers": len(numbers),
+            "mapped_mb": round(numbers.nbytes / 1e6, 1),
+            "bloom_mb": round(self._bloom.bits.nbytes / 1e6, 1) if self._bloom is not None else 0,
+            "max_rss_mb": _max_rss_mb(),
+        }
+
+
+def _max_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def benchmark_lookups(registry: DncRegistry, count: int = 1_000_000) -> dict:
+    """Lookup throughput for half registered / half random numbers, batched and one by one."""
+    numbers = registry._current()
+    rng = np.random.default_rng(0)
+    hits = numbers[rng.integers(0, len(numbers), count // 2)] if len(numbers) else np.empty(0, dtype=np.int64)
+    misses = rng.integers(2_000_000_000, 9_999_999_999, count - len(hits))
+    phones = np.concatenate([hits, misses]).astype(str)
+
+    start = time.perf_counter()
+    found = registry.contains_many(phones)
+    batch_seconds = time.perf_counter() - start
+
+    single = phones[:min(count, 20_000)]
+    start = time.perf_counter()
+    for phone in single:
+        registry.contains(phone)
+    single_seconds = time.perf_counter() - start
+
+    return {
+        **registry.memory_info(),
+        "bloom": registry._bloom is not None,
+        "batch_lookups_per_sec": int(count / batch_seconds),
+        "single_lookups_per_sec": int(len(single) / single_seconds),
+        "hit_rate": round(float(found.mean()), 3),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+
+    usage = (
+        "Usage: python dnc_registry.py build <ftc_file.txt> [...]\n"
+        "       python dnc_registry.py apply <change_file.txt> [...]\n"
+        "       python dnc_registry.py check <phone>\n"
+        "       python dnc_registry.py info|bench [lookups]\n"
+        f"  registry file: DNC_REGISTRY_PATH ({DNC_REGISTRY_PATH})"
+    )
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "apply", "check", "info", "bench"):
+        print(usage)
+        sys.exit(1)
+
+    command, args = sys.argv[1], sys.argv[2:]
+    if command in ("build", "apply", "check") and not args:
+        print(usage)
+        sys.exit(1)
+
+    if command == "build":
+        result = build_registry(args)
+    elif command == "apply":
+        result = apply_changes(args)
+    elif command == "check":
+        result = {"phone": args[0], "on_dnc_registry": DncRegistry().contains(args[0])}
+    elif command == "info":
+        result = DncRegistry().memory_info()
+    else:
+        result = benchmark_lookups(DncRegistry(), int(args[0]) if args else 1_000_000)
+    print(f"Result: {result}")
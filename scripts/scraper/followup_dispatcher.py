@@ -0,0 +1,265 @@
+"""Event-driven follow-up dispatcher.
+
+Replaces waiting for the fixed follow-up sweeps: the dispatcher keeps a
+min-heap of the upcoming follow-ups (loaded from idx_followups_scheduled)
+and sleeps on its LISTEN connection until the earliest one comes due or
+the follow_up_notify trigger reports a new, rescheduled or completed row.
+
+Due follow-ups are claimed (dispatched_at), run through check_contactable,
+and handed to the OpenClaw agent webhook in score-ordered batches. Outside
+the 8AM-8PM Eastern window nothing is dispatched; due items wait for the
+window to open. The agent executes and completes them with the
+follow-up-scheduler skill, as before.
+"""
+
+import os
+import json
+import heapq
+import select
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import psycopg2
+import requests
+
+from db import (
+    session,
+    get_connection,
+    check_contactable,
+    get_upcoming_follow_ups,
+    claim_due_follow_ups,
+    reset_follow_up_dispatch,
+    expire_dispatched_follow_ups,
+    skip_follow_ups,
+    CALLING_TIMEZONE,
+    CALLING_HOURS,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "follow_up_changes"
+
+OPENCLAW_HOOK_URL = os.getenv("OPENCLAW_HOOK_URL", "http://127.0.0.1:3000/hooks/agent")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+
+DISPATCH_BATCH_SIZE = int(os.getenv("FOLLOWUP_BATCH_SIZE", "10"))
+# Heap holds follow-ups due within this window; it is reloaded when the window passes
+HORIZON_SECONDS = 6 * 3600
+HORIZON_LIMIT = 5000
+# A handed-off follow-up the agent hasn't completed is dispatched again after this
+REDISPATCH_SECONDS = 3600
+# Hand-offs before an uncompleted follow-up is closed as 'dispatch_limit'
+MAX_DISPATCHES = int(os.getenv("FOLLOWUP_MAX_DISPATCHES", "3"))
+# Retry delay after a failed hand-off or a daily-limit deferral
+RETRY_SECONDS = 900
+# Longest sleep between wakeups (connection health check)
+MAX_IDLE_SECONDS = 60
+
+# Compliance denials that only delay a follow-up; anything else closes it
+_DEFER_REASONS = {"daily_limit", "outside_calling_hours"}
+
+
+def next_calling_window(now: float) -> float:
+    """Epoch seconds when calling is next allowed (now, if inside the window)."""
+    tz = ZoneInfo(CALLING_TIMEZONE)
+    local = datetime.fromtimestamp(now, tz)
+    start, end = CALLING_HOURS
+    if start <= local.hour < end:
+        return now
+    opens = local.replace(hour=start, minute=0, second=0, microsecond=0)
+    if local.hour >= end:
+        opens += timedelta(days=1)
+    return opens.timestamp()
+
+
+def post_to_agent(follow_ups: list[dict]):
+    """Hand a score-ordered batch of due follow-ups to the OpenClaw agent."""
+    lines = [
+        f"- follow_up id={f['id']} lead_id={f['lead_id']} type={f['type']} attempt={f['attempt_number']} "
+        f"template={f['message_template']} name={f['full_name']} phone={f['phone']} score={f['renovation_score']}"
+        for f in follow_ups
+    ]
+    message = (
+        "These follow-ups are due now and passed the compliance check. Execute them in this order "
+        "with the follow-up-scheduler skill, then mark each one completed:\n" + "\n".join(lines)
+    )
+    response = requests.post(
+        OPENCLAW_HOOK_URL,
+        json={"name": "follow-up-dispatcher", "message": message},
+        headers={"Authorization": f"Bearer {WEBHOOK_SECRET_TOKEN}"},
+        timeout=15,
+    )
+    response.raise_for_status()
+
+
+class FollowUpDispatcher:
+    """Timer heap of upcoming follow-ups, woken by due times and NOTIFY."""
+
+    def __init__(self, send=post_to_agent, batch_size: int = DISPATCH_BATCH_SIZE):
+        self.send = send
+        self.batch_size = batch_size
+        self._conn = None
+        self._heap: list[tuple[float, int]] = []
+        # Current due time per follow-up; heap entries that disagree are stale
+        self._due: dict[int, float] = {}
+        self._horizon_end = 0.0
+        self.stats = {"dispatched": 0, "skipped": 0, "deferred": 0, "max_lateness_seconds": 0.0}
+
+    def run(self, stop: threading.Event = None):
+        """Dispatch until `stop` is set (forever when None)."""
+        logger.info("Follow-up dispatcher started")
+        while stop is None or not stop.is_set():
+            try:
+                self._step()
+            except (psycopg2.Error, OSError) as e:
+                logger.error(f"Follow-up dispatcher connection error, reconnecting: {e}")
+                self._close()
+                time.sleep(5)
+            except Exception as e:
+                # Anything else would end the thread silently; reload from the database instead
+                logger.error(f"Follow-up dispatcher error, reloading: {e}", exc_info=True)
+                self._close()
+                time.sleep(5)
+        self._close()
+
+    def _step(self):
+        now = time.time()
+        if self._conn is None or self._conn.closed or now >= self._horizon_end:
+            self._load()
+
+        self._drain()
+        now = time.time()
+        if self._heap and self._heap[0][0] <= now:
+            window = next_calling_window(now)
+            if window <= now:
+                self._dispatch_due(now)
+                return
+            wake = window
+        else:
+            wake = self._heap[0][0] if self._heap else self._horizon_end
+
+        timeout = max(0.0, min(wake - now, self._horizon_end - now, MAX_IDLE_SECONDS))
+        if select.select([self._conn], [], [], timeout) == ([], [], []):
+            # Idle wakeup: make sure the listening connection is still alive
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT 1")
+
+    def _load(self):
+        """(Re)open the LISTEN connection, then rebuild the heap from the index."""
+        self._close()
+        conn = get_connection()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        expired = expire_dispatched_follow_ups(REDISPATCH_SECONDS, MAX_DISPATCHES, conn)
+        if expired:
+            logger.warning(f"Closed {expired} follow-ups handed off {MAX_DISPATCHES} times without completion")
+        rows = get_upcoming_follow_ups(HORIZON_SECONDS, HORIZON_LIMIT, REDISPATCH_SECONDS, MAX_DISPATCHES, conn)
+
+        self._conn = conn
+        self._due = {row["id"]: row["due"] for row in rows}
+        self._heap = [(due, follow_up_id) for follow_up_id, due in self._due.items()]
+        heapq.heapify(self._heap)
+        self._horizon_end = time.time() + HORIZON_SECONDS
+        if len(rows) == HORIZON_LIMIT:
+            # Truncated: anything after the last loaded row is picked up on the next load
+            self._horizon_end = max(min(self._horizon_end, max(self._due.values())), time.time() + MAX_IDLE_SECONDS)
+        logger.info(f"Follow-up heap loaded: {len(rows)} due in the next {HORIZON_SECONDS // 3600}h")
+
+    def _drain(self):
+        """Apply received follow_up_changes notifications."""
+        self._conn.poll()
+        while self._conn.notifies:
+            change = json.loads(self._conn.notifies.pop(0).payload)
+            if change["due"] is None:
+                self._due.pop(change["id"], None)
+            elif change["due"] < self._horizon_end:
+                self._schedule(change["id"], change["due"])
+
+    def _schedule(self, follow_up_id: int, due: float):
+        self._due[follow_up_id] = due
+        heapq.heappush(self._heap, (due, follow_up_id))
+
+    def _pop_due(self, now: float) -> list[int]:
+        ids = []
+        while self._heap and self._heap[0][0] <= now:
+            due, follow_up_id = heapq.heappop(self._heap)
+            if self._due.get(follow_up_id) == due:
+                del self._due[follow_up_id]
+                ids.append(follow_up_id)
+        return ids
+
+    def _dispatch_due(self, now: float):
+        ids = self._pop_due(now)
+        if not ids:
+            return
+
+        with session() as conn:
+            claimed = claim_due_follow_ups(ids, REDISPATCH_SECONDS, MAX_DISPATCHES, conn)
+            verdicts = {v["lead_id"]: v for v in check_contactable([f["lead_id"] for f in claimed], conn)}
+
+            allowed, deferred, denied = [], [], []
+            for follow_up in claimed:
+                reason = verdicts[follow_up["lead_id"]]["reason"]
+                if reason is None:
+                    allowed.append(follow_up)
+                elif reason in _DEFER_REASONS:
+                    deferred.append(follow_up["id"])
+                else:
+                    logger.info(f"Follow-up {follow_up['id']} skipped: {reason}")
+                    denied.append(follow_up["id"])
+
+            skip_follow_ups(denied, conn=conn)
+            reset_follow_up_dispatch(deferred, conn)
+
+        # Not claimed: completed or rescheduled (its notification already updated
+        # the heap), held by another dispatcher, or not yet due by the database clock
+        claimed_ids = {f["id"] for f in claimed}
+        for follow_up_id in deferred + [i for i in ids if i not in claimed_ids]:
+            if follow_up_id not in self._due:
+                self._schedule(follow_up_id, now + RETRY_SECONDS)
+        self.stats["skipped"] += len(denied)
+        self.stats["deferred"] += len(deferred)
+
+        allowed.sort(key=lambda f: (-(f["renovation_score"] or 0), f["due"]))
+        for i in range(0, len(allowed), self.batch_size):
+            batch = allowed[i:i + self.batch_size]
+            try:
+                self.send(batch)
+            except requests.RequestException as e:
+                logger.error(f"Follow-up hand-off failed, retrying in {RETRY_SECONDS}s: {e}")
+                ids = [f["id"] for f in batch]
+                reset_follow_up_dispatch(ids)
+                for follow_up_id in ids:
+                    self._schedule(follow_up_id, time.time() + RETRY_SECONDS)
+                continue
+
+            # Re-dispatch if the agent never completes it (completion drops the entry);
+            # after the last allowed hand-off the next heap load closes it instead
+            for follow_up in batch:
+                if follow_up["dispatch_count"] < MAX_DISPATCHES:
+                    self._schedule(follow_up["id"], time.time() + REDISPATCH_SECONDS)
+            lateness = time.time() - min(f["due"] for f in batch)
+            self.stats["dispatched"] += len(batch)
+            self.stats["max_lateness_seconds"] = max(self.stats["max_lateness_seconds"], round(lateness, 1))
+            logger.info(f"Dispatched {len(batch)} follow-ups (oldest {lateness:.0f}s after due)")
+
+    def _close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
+
+def start_dispatcher_thread() -> threading.Thread:
+    """Run a dispatcher in a daemon thread (used by the scraper daemon)."""
+    thread = threading.Thread(target=FollowUpDispatcher().run, name="followup-dispatcher", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    FollowUpDispatcher().run()
@@ -0,0 +1,337 @@
+"""Retention for the monthly interactions partitions.
+
+Partitions whose month ended more than INTERACTION_RETENTION_MONTHS ago are
+detached from interactions first, so no write can land in them while they
+are read, then exported to zstd-compressed Parquet under
+INTERACTION_ARCHIVE_DIR (month=YYYY-MM/interactions_yYYYYmMM.parquet),
+verified by row count and dropped. A detached table left by a run that
+failed before dropping it is picked up by the next run. Rows backdated into
+an archived month later land in interactions_default, get their month
+recreated by ensure_interaction_partitions() and are archived to a second
+file next to the first. The reporting rollups keep their history;
+detaching does not fire the delete triggers. Transcripts are
+written into the files in full from interaction_transcripts; stored
+transcripts no longer referenced by any interaction are then pruned.
+
+Archived interactions stay queryable offline with
+read_archived_interactions(), which filters across the Parquet files with
+pyarrow.dataset.
+"""
+
+import os
+import re
+import time
+import tempfile
+import logging
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from db import session, ensure_interaction_partitions, prune_transcripts
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_RETENTION_MONTHS = int(os.getenv("INTERACTION_RETENTION_MONTHS", "6"))
+INTERACTION_ARCHIVE_DIR = os.getenv("INTERACTION_ARCHIVE_DIR", "/app/data/archive/interactions")
+
+EXPORT_BATCH_ROWS = 10000
+# Longest wait for the lock DETACH PARTITION takes on interactions
+DETACH_LOCK_TIMEOUT = os.getenv("INTERACTION_DETACH_LOCK_TIMEOUT", "10s")
+
+# Scratch partition used by check_archival(), outside the monthly name pattern
+_CHECK_PARTITION = "interactions_archive_check"
+_CHECK_MONTH = date(1900, 1, 1)
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("lead_id", pa.int32()),
+    ("type", pa.string()),
+    ("direction", pa.string()),
+    ("status", pa.string()),
+    ("duration_seconds", pa.int32()),
+    ("transcript", pa.string()),
+    ("transcript_hash", pa.string()),
+    ("sms_content", pa.string()),
+    ("notes", pa.string()),
+    ("twilio_sid", pa.string()),
+    ("created_at", pa.timestamp("us")),
+])
+
+_PARTITION_NAME = re.compile(r"^interactions_y(\d{4})m(\d{2})$")
+
+
+def list_partitions(detached: bool = False) -> list[dict]:
+    """
+    Monthly interactions partitions (oldest first) with their month and size.
+
+    With detached=True, lists the monthly tables already detached but not dropped.
+    """
+    with session() as conn:
+        with conn.cursor() as cur:
+            if detached:
+                cur.execute(
+                    """
+                    SELECT c.relname AS name, c.reltuples::BIGINT AS estimated_rows,
+                           pg_total_relation_size(c.oid) AS bytes
+                    FROM pg_class c
+                    WHERE c.relkind = 'r' AND NOT c.relispartition
+                      AND c.relname ~ '^interactions_y[0-9]{4}m[0-9]{2}$'
+                      AND pg_table_is_visible(c.oid)
+                    ORDER BY c.relname
+                    """
+                )
+            else:
+                cur.execute(
+                    """
+                    SELECT c.relname AS name, c.reltuples::BIGINT AS estimated_rows,
+                           pg_total_relation_size(c.oid) AS bytes
+                    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'interactions'::regclass
+                    ORDER BY c.relname
+                    """
+                )
+            rows = [dict(row) for row in cur.fetchall()]
+
+    partitions = []
+    for row in rows:
+        match = _PARTITION_NAME.match(row["name"])
+        if match:
+            row["month"] = date(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append(row)
+    return partitions
+
+
+def _retention_cutoff(retention_months: int, today: date = None) -> date:
+    """First month that is kept: months before it are archived."""
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def archive_path(month: date, archive_dir: str = INTERACTION_ARCHIVE_DIR) -> str:
+    """Archive file for a month; a month archived again gets the next free -N suffix."""
+    base = os.path.join(archive_dir, f"month={month:%Y-%m}", f"interactions_y{month:%Y}m{month:%m}")
+    path, n = f"{base}.parquet", 1
+    while os.path.exists(path):
+        path, n = f"{base}-{n}.parquet", n + 1
+    return path
+
+
+def export_partition(name: str, path: str) -> int:
+    """Stream one detached partition to Parquet; returns rows written (checked against COUNT(*))."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Dot-prefixed so read_archived_interactions never picks up a partial file
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    rows = 0
+    # The transcript body lives in interaction_transcripts; inline text only on pre-store rows
+    columns = ", ".join(
+        "COALESCE(t.body, i.transcript) AS transcript" if column == "transcript" else f"i.{column}"
+        for column in ARCHIVE_SCHEMA.names
+    )
+
+    try:
+        with session() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f'SELECT COUNT(*) AS n FROM "{name}"')
+                expected = cur.fetchone()["n"]
+
+            # Server-side cursor: the partition is never held in memory at once
+            with conn.cursor(name=f"archive_{name}") as cur, \
+                    pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+                cur.itersize = EXPORT_BATCH_ROWS
+                cur.execute(
+                    f'SELECT {columns} FROM "{name}" i '
+                    f"LEFT JOIN interaction_transcripts t ON t.hash = i.transcript_hash "
+                    f"ORDER BY i.created_at, i.id"
+                )
+                while True:
+                    batch = cur.fetchmany(EXPORT_BATCH_ROWS)
+                    if not batch:
+                        break
+                    writer.write_table(pa.Table.from_pylist([dict(r) for r in batch], schema=ARCHIVE_SCHEMA))
+                    rows += len(batch)
+
+        if rows != expected or pq.ParquetFile(tmp_path).metadata.num_rows != expected:
+            raise RuntimeError(f"{name}: exported {rows} rows, expected {expected}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows
+
+
+def detach_partition(name: str):
+    """
+    Detach a partition from interactions.
+
+    Postgres refuses DETACH ... CONCURRENTLY while interactions_default
+    exists, so this takes a short ACCESS EXCLUSIVE lock on interactions.
+    lock_timeout keeps it from queueing writers behind a long-running query;
+    the next run retries.
+    """
+    with session() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('lock_timeout', %s, true)", (DETACH_LOCK_TIMEOUT,))
+            cur.execute(f'ALTER TABLE interactions DETACH PARTITION "{name}"')
+
+
+def retire_detached(name: str, drop: bool = True) -> str | None:
+    """Drop an exported detached table, or rename it out of the partition namespace to keep it."""
+    kept = None if drop else f"{name}_archived_{date.today():%Y%m%d}"
+    with session() as conn:
+        with conn.cursor() as cur:
+            if drop:
+                cur.execute(f'DROP TABLE "{name}"')
+            else:
+                cur.execute(f'ALTER TABLE "{name}" RENAME TO "{kept}"')
+    return kept
+
+
+def archive_old_partitions(
+    retention_months: int = INTERACTION_RETENTION_MONTHS,
+    archive_dir: str = INTERACTION_ARCHIVE_DIR,
+    drop: bool = True,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Detach, export and drop every partition older than the retention horizon.
+
+    Returns:
+        Dict with the cutoff month and, per archived partition, rows and file size
+    """
+    cutoff = _retention_cutoff(retention_months)
+    results = {"cutoff": str(cutoff), "archived": {}}
+
+    expired = [p for p in list_partitions() if p["month"] < cutoff]
+    if dry_run:
+        for partition in expired + list_partitions(detached=True):
+            results["archived"][partition["name"]] = {"estimated_rows": partition["estimated_rows"], "dry_run": True}
+        return results
+
+    for partition in expired:
+        detach_partition(partition["name"])
+
+    # This run's detached tables plus any an earlier run failed to export
+    for partition in list_partitions(detached=True):
+        name = partition["name"]
+        start = time.time()
+        path = archive_path(partition["month"], archive_dir)
+        rows = export_partition(name, path)
+        kept = retire_detached(name, drop=drop)
+        results["archived"][name] = {
+            "rows": rows,
+            "path": path,
+            "file_bytes": os.path.getsize(path),
+            "table_bytes": partition["bytes"],
+            "kept_as": kept,
+            "seconds": round(time.time() - start, 1),
+        }
+        logger.info(f"Archived {name}: {results['archived'][name]}")
+
+    if results["archived"] and drop:
+        results["transcripts_pruned"] = prune_transcripts()
+    return results
+
+
+def check_archival() -> dict:
+    """
+    Run the archival steps against the live schema on an empty scratch partition.
+
+    Creates a partition for a month no interaction uses, then detaches,
+    exports and drops it exactly as archive_old_partitions() does, so DDL the
+    schema rejects (e.g. a detach mode not allowed with the default partition)
+    fails here instead of in the nightly job.
+    """
+    steps = []
+    with tempfile.TemporaryDirectory(prefix="interaction_archive_check_") as archive_dir:
+        path = archive_path(_CHECK_MONTH, archive_dir)
+        try:
+            with session() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f'CREATE TABLE "{_CHECK_PARTITION}" PARTITION OF interactions '
+                        f"FOR VALUES FROM (%s) TO (%s)",
+                        (_CHECK_MONTH, date(_CHECK_MONTH.year, _CHECK_MONTH.month + 1, 1)),
+                    )
+            steps.append("create")
+            detach_partition(_CHECK_PARTITION)
+            steps.append("detach")
+            rows = export_partition(_CHECK_PARTITION, path)
+            steps.append("export")
+            retire_detached(_CHECK_PARTITION)
+            steps.append("drop")
+        finally:
+            with session() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(f'DROP TABLE IF EXISTS "{_CHECK_PARTITION}"')
+    return {"ok": True, "steps": steps, "rows": rows}
+
+
+def run_interaction_maintenance() -> dict:
+    """Daily job: create upcoming partitions, then archive expired ones."""
+    created = ensure_interaction_partitions()
+    result = archive_old_partitions()
+    result["partitions_created"] = created
+    return result
+
+
+def read_archived_interactions(
+    since=None,
+    until=None,
+    lead_id: int = None,
+    columns: list[str] = None,
+    archive_dir: str = INTERACTION_ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """Query archived interactions offline; filters are pushed down to the Parquet files."""
+    if not os.path.isdir(archive_dir):
+        return pd.DataFrame(columns=columns or ARCHIVE_SCHEMA.names)
+
+    dataset = ds.dataset(archive_dir, format="parquet", schema=ARCHIVE_SCHEMA, partitioning="hive")
+    condition = None
+    for clause in (
+        ds.field("created_at") >= pd.Timestamp(since) if since is not None else None,
+        ds.field("created_at") < pd.Timestamp(until) if until is not None else None,
+        ds.field("lead_id") == lead_id if lead_id is not None else None,
+    ):
+        if clause is not None:
+            condition = clause if condition is None else condition & clause
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Interactions partition retention")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    archive = sub.add_parser("archive", help="Archive partitions older than the retention horizon")
+    archive.add_argument("--months", type=int, default=INTERACTION_RETENTION_MONTHS)
+    archive.add_argument("--keep-detached", action="store_true",
+                         help="Keep each exported table, renamed to <name>_archived_YYYYMMDD")
+    archive.add_argument("--dry-run", action="store_true")
+
+    sub.add_parser("partitions", help="Create upcoming partitions and list attached ones")
+    sub.add_parser("check", help="Create, detach, export and drop a scratch partition against the live schema")
+
+    query = sub.add_parser("query", help="Read archived interactions to CSV on stdout")
+    query.add_argument("--since")
+    query.add_argument("--until")
+    query.add_argument("--lead-id", type=int)
+
+    args = parser.parse_args()
+    if args.command == "archive":
+        result = archive_old_partitions(args.months, drop=not args.keep_detached, dry_run=args.dry_run)
+        print(f"Result: {result}")
+    elif args.command == "check":
+        print(f"Result: {check_archival()}")
+    elif args.command == "partitions":
+        print(f"Created: {ensure_interaction_partitions()}")
+        for partition in list_partitions():
+            print(f"{partition['name']}  ~{partition['estimated_rows']} rows  {partition['bytes']} bytes")
+    else:
+        df = read_archived_interactions(args.since, args.until, args.lead_id)
+        print(df.to_csv(index=False), end="")
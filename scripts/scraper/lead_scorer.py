@@ -6,6 +6,9 @@ Higher score = more likely to need remodeling services.
 
 from datetime import datetime, date
 
+import numpy as np
+import pandas as pd
+
 
 def calculate_score(lead: dict, permits: list[dict] = None) -> tuple[int, list[str]]:
     """
@@ -116,3 +119,156 @@ def calculate_score(lead: dict, permits: list[dict] = None) -> tuple[int, list[s
     score = max(0, min(100, score))
 
     return score, reasons
+
+
+def score_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized calculate_score for a cleaned NAL DataFrame (no permits).
+
+    Missing values (NaN/NaT/None) are treated as absent, matching the
+    per-row path after NaN removal. Scores and reason strings are identical
+    to calculate_score(row) for every row.
+
+    Returns:
+        DataFrame indexed like df with renovation_score and score_reasons
+    """
+    n = len(df)
+    score = np.zeros(n, dtype=np.int64)
+    tiers = []
+
+    def column(name):
+        if name in df.columns:
+            return df[name]
+        return pd.Series(np.nan, index=df.index)
+
+    def numeric(name):
+        return pd.to_numeric(column(name), errors="coerce").to_numpy(dtype=float)
+
+    def add(mask, points, labels):
+        nonlocal score
+        score = score + np.where(mask, points, 0)
+        tier = np.full(n, None, dtype=object)
+        if mask.any():
+            tier[mask] = labels(mask)
+        tiers.append(tier)
+
+    # --- Tier 2: Recent purchase ---
+    sale_dates = _to_dates(column("last_sale_date"))
+    days = (pd.Timestamp(date.today()) - sale_dates).dt.days.to_numpy(dtype=float)
+    has_sale = ~np.isnan(days)
+    new_buyer = has_sale & (days <= 365)
+    add(new_buyer, 20, lambda m: [f"Purchased {d:.0f} days ago (new buyer)" for d in days[m]])
+    add(has_sale & ~new_buyer & (days <= 730), 10, lambda m: "Purchased within last 2 years")
+
+    # --- Tier 2: Below market value purchase ---
+    sale_price = numeric("last_sale_price")
+    market_value = numeric("market_value")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = sale_price / market_value
+    has_ratio = (
+        ~np.isnan(sale_price) & (sale_price != 0) & ~np.isnan(market_value) & (market_value > 0)
+    )
+    fixer = has_ratio & (ratio < 0.75)
+    add(fixer, 15, lambda m: [f"Bought at {r:.0%} of market value (fixer-upper)" for r in ratio[m]])
+    add(has_ratio & ~fixer & (ratio < 0.85), 8,
+        lambda m: [f"Bought below market value ({r:.0%})" for r in ratio[m]])
+
+    # --- Tier 3: Age of home ---
+    year_built = numeric("year_built")
+    has_year = ~np.isnan(year_built) & (year_built != 0)
+    age = datetime.now().year - np.trunc(np.where(has_year, year_built, 0))
+    old = has_year & (age >= 30)
+    aging = has_year & ~old & (age >= 20)
+    add(old, 20, lambda m: [f"Home is {a:.0f} years old (likely needs major updates)" for a in age[m]])
+    add(aging, 15, lambda m: [f"Home is {a:.0f} years old (aging systems)" for a in age[m]])
+    add(has_year & ~old & ~aging & (age >= 15), 8,
+        lambda m: [f"Home is {a:.0f} years old" for a in age[m]])
+
+    # --- Tier 3: No homestead (investor property) ---
+    homestead = column("homestead")
+    if homestead.dtype == bool:
+        investor = ~homestead.to_numpy()
+    else:
+        investor = homestead.map(lambda v: v is False).to_numpy(dtype=bool)
+    add(investor, 10, lambda m: "No homestead exemption (likely investor)")
+
+    # --- Tier 3: High assessed value (can afford renovation) ---
+    assessed = numeric("assessed_value")
+    has_assessed = ~np.isnan(assessed) & (assessed != 0)
+    high = has_assessed & (assessed >= 500000)
+    add(high, 10, lambda m: [f"High-value property (${a:,.0f})" for a in assessed[m]])
+    add(has_assessed & ~high & (assessed >= 300000), 5,
+        lambda m: [f"Mid-high value property (${a:,.0f})" for a in assessed[m]])
+
+    # --- Tier 3: Long ownership + no permits ---
+    years_owned = days / 365
+    add(has_sale & (years_owned >= 15), 10,
+        lambda m: [f"Owned {y:.0f} years with no permits" for y in years_owned[m]])
+
+    # --- Negative signals ---
+    dnc = column("do_not_call").map(lambda v: bool(v) if pd.notna(v) else False)
+    add(dnc.to_numpy(dtype=bool), -50, lambda m: "NEGATIVE: On do-not-call list")
+
+    reasons = [[r for r in row if r is not None] for row in zip(*tiers)]
+    return pd.DataFrame(
+        {"renovation_score": np.clip(score, 0, 100), "score_reasons": reasons},
+        index=df.index,
+    )
+
+
+def _to_dates(values: pd.Series) -> pd.Series:
+    """Coerce sale dates the way calculate_score does (date objects or YYYY-MM-DD strings)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.normalize()
+    is_str = values.map(lambda v: isinstance(v, str)).astype(bool)
+    parsed = pd.to_datetime(values.where(~is_str), errors="coerce")
+    if is_str.any():
+        parsed[is_str] = pd.to_datetime(values[is_str], format="%Y-%m-%d", errors="coerce")
+    return parsed
+
+
+def _check_parity(rows: int = 20000, seed: int = 7) -> dict:
+    """Compare score_dataframe with calculate_score over a synthetic NAL frame."""
+    rng = np.random.default_rng(seed)
+    today = date.today().toordinal()
+
+    def sometimes_missing(values, rate=0.15):
+        values = np.asarray(values, dtype=object)
+        values[rng.random(rows) < rate] = None
+        return values
+
+    df = pd.DataFrame({
+        "last_sale_date": sometimes_missing(
+            [date.fromordinal(today - int(d)) for d in rng.integers(-30, 365 * 30, rows)]
+        ),
+        "last_sale_price": sometimes_missing(rng.choice([0, 50000, 180000, 250000, 420000], rows)
+                                             * rng.uniform(0.5, 1.5, rows)),
+        "market_value": sometimes_missing(rng.uniform(-1000, 900000, rows)),
+        "assessed_value": sometimes_missing(rng.choice([0, 299999.5, 300000, 499999.5, 500000, 1e6], rows)),
+        "year_built": sometimes_missing(rng.integers(1940, datetime.now().year + 1, rows).astype(float)),
+        "homestead": rng.random(rows) < 0.5,
+    })
+    for col in ["last_sale_price", "market_value", "assessed_value", "year_built"]:
+        df[col] = pd.to_numeric(df[col])
+
+    vectorized = score_dataframe(df)
+    mismatches = 0
+    for lead, score, reasons in zip(
+        df.to_dict("records"), vectorized["renovation_score"], vectorized["score_reasons"]
+    ):
+        lead = {k: v for k, v in lead.items() if pd.notna(v)}
+        if calculate_score(lead) != (int(score), reasons):
+            mismatches += 1
+    return {"rows": rows, "mismatches": mismatches}
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "parity":
+        print("Usage: python lead_scorer.py parity [rows]")
+        sys.exit(1)
+
+    result = _check_parity(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+    print(f"Result: {result}")
+    sys.exit(1 if result["mismatches"] else 0)
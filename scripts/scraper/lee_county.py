@@ -2,30 +2,39 @@
 
 Source: https://aca-prod.accela.com/LEECO/
 Platform: Accela Citizen Access (ASP.NET with ViewState)
-Requires: Selenium (JavaScript-rendered pages)
+Fetches: Plain HTTP postbacks (accela_client); pooled Selenium (browser_pool) as a fallback
 
 Scrapes: Building permits for remodeling, roofing, electrical, plumbing
 Target: Homeowners with active renovation projects in Lee County, FL
 """
 
+import os
 import time
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from bs4 import BeautifulSoup
+import requests
 
-from db import insert_permit, log_scraping_run, complete_scraping_run
+from accela_client import AccelaClient, AccelaError
+from browser_pool import get_browser_pool
+from politeness import host_throttle
+from db import log_scraping_run, complete_scraping_run
+from scrape_checkpoint import PageCheckpoint
 
 logger = logging.getLogger(__name__)
 
 ACCELA_URL = "https://aca-prod.accela.com/LEECO/Cap/CapHome.aspx?module=Permitting&TabName=Home"
 
+# 0 = always drive the portal with Chrome
+ACCELA_HTTP_ENABLED = os.getenv("ACCELA_HTTP", "1") == "1"
+# Politeness budget for the Accela host: seconds between requests, concurrent searches
+REQUEST_INTERVAL_SECONDS = 1.0
+MAX_SESSIONS = 3
+
 # Permit types that signal renovation intent
 RENOVATION_PERMIT_TYPES = [
     "Building",
@@ -39,50 +48,109 @@ RENOVATION_PERMIT_TYPES = [
 ]
 
 
-def get_chrome_driver() -> webdriver.Chrome:
-    """Create a headless Chrome WebDriver for scraping."""
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument(
-        "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-
-    try:
-        import undetected_chromedriver as uc
-        driver = uc.Chrome(options=options, headless=True)
-    except ImportError:
-        service = Service()
-        driver = webdriver.Chrome(service=service, options=options)
-
-    driver.implicitly_wait(10)
-    return driver
-
-
-def scrape_lee_permits(days_back: int = 1, max_pages: int = 20) -> list[dict]:
+def scrape_lee_permits(days_back: int = 1, max_pages: int = 20, resume_run: dict = None) -> list[dict]:
     """
     Scrape recent building permits from Lee County Accela portal.
 
+    Permits are stored page by page and the run is checkpointed after each
+    page (see scrape_checkpoint).
+
     Args:
         days_back: How many days back to search (default: 1 for daily runs)
         max_pages: Maximum result pages to process
+        resume_run: scraping_runs row of a failed run to continue (its date window is reused)
 
     Returns:
         List of permit dictionaries
     """
-    run_id = log_scraping_run("lee_county_permits")
+    if resume_run:
+        run_id, start, end = resume_run["id"], resume_run["search_start"], resume_run["search_end"]
+    else:
+        end = date.today()
+        start = end - timedelta(days=days_back)
+        run_id = log_scraping_run("lee_county_permits", search_start=start, search_end=end)
+    checkpoint = PageCheckpoint(run_id, resume_run)
     permits = []
     errors = 0
-    driver = None
 
     try:
-        driver = get_chrome_driver()
+        permits, _ = search_lee_permits(start, end, max_pages, on_page=checkpoint)
+        checkpoint.finish()
+
+        complete_scraping_run(
+            run_id,
+            records_found=checkpoint.found,
+            records_new=checkpoint.new,
+            records_updated=checkpoint.updated,
+            errors=errors,
+        )
+        logger.info(
+            f"Lee County: Found {checkpoint.found} permits, {checkpoint.new} new, {checkpoint.updated} updated"
+        )
+
+    except Exception as e:
+        logger.error(f"Lee County scraper error (run {run_id}, stored through page {checkpoint.last_page}): {e}")
+        complete_scraping_run(
+            run_id,
+            records_found=checkpoint.found,
+            records_new=checkpoint.new,
+            records_updated=checkpoint.updated,
+            errors=1,
+            error_details=str(e),
+            status="failed",
+        )
+        errors += 1
+
+    return permits
+
+
+def search_lee_permits(start: date, end: date, max_pages: int = 20, on_page=None) -> tuple[list[dict], bool]:
+    """
+    Search one date range (inclusive) without recording a scraping run.
+
+    on_page(page_number, page_permits) is called after each results page.
+
+    Returns:
+        tuple: (renovation permits, whether max_pages cut the results short)
+    """
+    start_date, end_date = f"{start:%m/%d/%Y}", f"{end:%m/%d/%Y}"
+    if ACCELA_HTTP_ENABLED:
+        try:
+            return _search_http(start_date, end_date, max_pages, on_page=on_page)
+        except (AccelaError, requests.RequestException) as e:
+            logger.warning(f"Accela HTTP search failed, falling back to Chrome: {e}")
+    return _search_selenium(start_date, end_date, max_pages, on_page=on_page)
+
+
+def _search_http(
+    start_date: str, end_date: str, max_pages: int, url: str = ACCELA_URL, on_page=None
+) -> tuple[list[dict], bool]:
+    """Run the date-range search with plain HTTP postbacks."""
+    permits = []
+    throttle = host_throttle(url, REQUEST_INTERVAL_SECONDS, MAX_SESSIONS)
+    with throttle.session(), AccelaClient(url, throttle=throttle) as client:
+        for page, html in enumerate(client.iter_result_pages(start_date, end_date, max_pages), start=1):
+            logger.info(f"Processing page {page}...")
+            page_permits = _parse_results_html(html)
+            permits.extend(page_permits)
+            if on_page:
+                on_page(page, page_permits)
+    return permits, client.truncated
+
+
+def _search_selenium(
+    start_date: str, end_date: str, max_pages: int, url: str = ACCELA_URL, on_page=None
+) -> tuple[list[dict], bool]:
+    """Run the date-range search in a pooled headless Chrome."""
+    permits = []
+    truncated = False
+    throttle = host_throttle(url, REQUEST_INTERVAL_SECONDS, MAX_SESSIONS)
+
+    with throttle.session(), get_browser_pool().browser() as browser:
+        driver = browser.driver
         logger.info("Navigating to Lee County Accela portal...")
-        driver.get(ACCELA_URL)
+        throttle.wait()
+        driver.get(url)
 
         # Wait for page to load
         WebDriverWait(driver, 15).until(
@@ -91,9 +159,6 @@ def scrape_lee_permits(days_back: int = 1, max_pages: int = 20) -> list[dict]:
         time.sleep(2)  # Extra wait for ASP.NET ViewState
 
         # Set date range
-        start_date = (datetime.now() - timedelta(days=days_back)).strftime("%m/%d/%Y")
-        end_date = datetime.now().strftime("%m/%d/%Y")
-
         start_field = driver.find_element(
             By.ID, "ctl00_PlaceHolderMain_generalSearchForm_txtGSStartDate"
         )
@@ -110,6 +175,7 @@ def scrape_lee_permits(days_back: int = 1, max_pages: int = 20) -> list[dict]:
         search_btn = driver.find_element(
             By.ID, "ctl00_PlaceHolderMain_btnNewSearch"
         )
+        throttle.wait()
         search_btn.click()
 
         # Wait for results
@@ -120,58 +186,45 @@ def scrape_lee_permits(days_back: int = 1, max_pages: int = 20) -> list[dict]:
 
         # Process result pages
         page = 1
-        while page <= max_pages:
+        while True:
             logger.info(f"Processing page {page}...")
             page_permits = _parse_results_page(driver)
             permits.extend(page_permits)
+            browser.count_page()
+            if on_page:
+                on_page(page, page_permits)
 
-            if not page_permits:
-                break
-
-            # Try to go to next page
-            try:
-                next_link = driver.find_element(
-                    By.XPATH, "//a[contains(@class, 'aca_pagination_PrevNext') and contains(text(), 'Next')]"
-                )
-                next_link.click()
-                time.sleep(3)  # Rate limiting
-                page += 1
-            except Exception:
+            # A page can hold no renovation permits; only a missing Next link ends the results
+            next_links = driver.find_elements(
+                By.XPATH, "//a[contains(@class, 'aca_pagination_PrevNext') and contains(text(), 'Next')]"
+            )
+            if not next_links:
                 break  # No more pages
+            if page >= max_pages:
+                truncated = True
+                logger.warning(f"Lee County search {start_date}-{end_date} truncated at max_pages={max_pages}")
+                break
 
-        # Insert permits into database
-        new_count = 0
-        for permit in permits:
-            result = insert_permit(permit)
-            if result:
-                new_count += 1
-
-        complete_scraping_run(
-            run_id,
-            records_found=len(permits),
-            records_new=new_count,
-            errors=errors,
-        )
-        logger.info(f"Lee County: Found {len(permits)} permits, {new_count} new")
-
-    except Exception as e:
-        logger.error(f"Lee County scraper error: {e}")
-        complete_scraping_run(run_id, errors=1, error_details=str(e), status="failed")
-        errors += 1
-
-    finally:
-        if driver:
-            driver.quit()
+            throttle.wait()
+            next_links[0].click()
+            time.sleep(3)  # Wait for the next page to render
+            page += 1
 
-    return permits
+    logger.info(f"Lee County browser: {browser.stats}")
+    return permits, truncated
 
 
 def _parse_results_page(driver) -> list[dict]:
     """Parse a single page of Accela search results."""
+    return _parse_results_html(driver.page_source)
+
+
+def _parse_results_html(html: str) -> list[dict]:
+    """Parse the HTML of a single page of Accela search results."""
     permits = []
 
     try:
-        soup = BeautifulSoup(driver.page_source, "lxml")
+        soup = BeautifulSoup(html, "lxml")
         rows = soup.select("table.ACA_Grid_OverFlow tr[class*='ACA_TabRow']")
 
         for row in rows:
@@ -8,13 +8,21 @@ import sys
 import time
 import logging
 import argparse
-from datetime import datetime
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import schedule
 
 from lee_county import scrape_lee_permits
 from collier_county import scrape_collier_permits
-from nal_processor import process_nal_file
+from counties import COUNTY_SCRAPERS, county_name
+from backfill import run_backfill
+from db import get_scraping_run, reopen_scraping_run
+from permit_linker import link_permits_to_leads
+from browser_pool import get_browser_pool
+from followup_dispatcher import FollowUpDispatcher, start_dispatcher_thread
+from interaction_archive import run_interaction_maintenance
+from nal_processor import process_nal_file, process_nal_files_parallel, DEFAULT_CHUNK_SIZE
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,34 +35,38 @@ logging.basicConfig(
 logger = logging.getLogger("main_scraper")
 
 
-def run_daily_scrape():
+def run_daily_scrape(days_back: int = 1):
     """Run all daily scraping tasks."""
     logger.info("=" * 60)
     logger.info(f"Starting daily scrape: {datetime.now()}")
     logger.info("=" * 60)
 
-    results = {"lee_permits": 0, "collier_permits": 0, "errors": []}
-
-    # 1. Scrape Lee County permits
-    try:
-        logger.info("--- Lee County Permits ---")
-        lee_permits = scrape_lee_permits(days_back=1)
-        results["lee_permits"] = len(lee_permits)
-    except Exception as e:
-        logger.error(f"Lee County scraper failed: {e}")
-        results["errors"].append(f"Lee County: {e}")
-
-    # Rate limiting between county scrapes
-    time.sleep(10)
-
-    # 2. Scrape Collier County permits
+    results = {f"{county}_permits": 0 for county in COUNTY_SCRAPERS}
+    results["errors"] = []
+
+    # 1. Scrape every county's permits concurrently; each portal host has its own rate limit
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=len(COUNTY_SCRAPERS), thread_name_prefix="county") as executor:
+        futures = {
+            executor.submit(scrape, days_back=days_back): county
+            for county, scrape in COUNTY_SCRAPERS.items()
+        }
+        for future in as_completed(futures):
+            county = futures[future]
+            try:
+                results[f"{county}_permits"] = len(future.result())
+            except Exception as e:
+                logger.error(f"{county_name(county)} scraper failed: {e}")
+                results["errors"].append(f"{county_name(county)}: {e}")
+    results["scrape_seconds"] = round(time.time() - started, 1)
+
+    # 2. Link new permits to leads and rescore the leads that gained permits
     try:
-        logger.info("--- Collier County Permits ---")
-        collier_permits = scrape_collier_permits(days_back=1)
-        results["collier_permits"] = len(collier_permits)
+        logger.info("--- Permit Linking ---")
+        results["permit_links"] = link_permits_to_leads()
     except Exception as e:
-        logger.error(f"Collier County scraper failed: {e}")
-        results["errors"].append(f"Collier County: {e}")
+        logger.error(f"Permit linking failed: {e}")
+        results["errors"].append(f"Permit linking: {e}")
 
     # Summary
     logger.info("=" * 60)
@@ -64,26 +76,99 @@ def run_daily_scrape():
     return results
 
 
-def run_nal_import(filepath: str, county_code: str = None):
-    """One-time NAL file import."""
-    logger.info(f"Importing NAL file: {filepath}")
-    result = process_nal_file(filepath, county_code)
+def resume_scrape(run_id: int):
+    """Continue a failed or interrupted county scrape after its last checkpointed page."""
+    run = get_scraping_run(run_id)
+    if run is None:
+        logger.error(f"Scraping run {run_id} not found")
+        return None
+    county = run["source"].removesuffix("_county_permits")
+    if county not in COUNTY_SCRAPERS or run["search_start"] is None:
+        logger.error(
+            f"Run {run_id} ({run['source']}) has no page checkpoint to resume"
+            + ("; re-run the windows in its error_details with --backfill" if "backfill" in run["source"] else "")
+        )
+        return None
+    if run["status"] == "completed":
+        logger.info(f"Run {run_id} already completed")
+        return None
+
+    logger.info(
+        f"Resuming {county_name(county)} run {run_id} ({run['search_start']}..{run['search_end']}) "
+        f"after page {run['last_page']}"
+    )
+    reopen_scraping_run(run_id)
+    permits = COUNTY_SCRAPERS[county](resume_run=run)
+    link_permits_to_leads()
+    return permits
+
+
+def run_permit_backfill(start: date, end: date, counties: list[str] = None):
+    """Scrape a historical date range in windows, then link the permits to leads."""
+    logger.info(f"Starting permit backfill {start}..{end} for {counties or 'all counties'}")
+    result = run_backfill(start, end, counties)
+    link_permits_to_leads()
+    return result
+
+
+def run_nal_import(
+    filepaths: list[str],
+    county_code: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    delta: bool = False,
+    workers: int = 1,
+):
+    """NAL file import (full, or delta against the previous release).
+
+    With more than one worker the files are partitioned and scored in a
+    process pool; delta imports always run sequentially.
+    """
+    logger.info(f"Importing NAL files: {filepaths}{' (delta)' if delta else ''}")
+    if workers > 1 and delta:
+        logger.warning(f"Delta NAL imports run sequentially; ignoring --workers {workers}")
+    if workers > 1 and not delta:
+        result = process_nal_files_parallel(filepaths, county_code, workers=workers, chunk_size=chunk_size)
+    else:
+        result = {
+            filepath: process_nal_file(filepath, county_code, chunk_size=chunk_size, delta=delta)
+            for filepath in filepaths
+        }
     logger.info(f"NAL import result: {result}")
+
+    # New parcel leads may match permits scraped before they existed
+    link_permits_to_leads()
     return result
 
 
-def daemon_mode():
-    """Run scraper in daemon mode with daily schedule."""
+def run_database_maintenance():
+    """Nightly: create upcoming interactions partitions and archive expired ones."""
+    try:
+        result = run_interaction_maintenance()
+        logger.info(f"Interaction partition maintenance: {result}")
+    except Exception as e:
+        logger.error(f"Interaction partition maintenance failed: {e}")
+
+
+def daemon_mode(followups: bool = True):
+    """Run scraper in daemon mode with daily schedule (and the follow-up dispatcher)."""
     logger.info("Starting scraper daemon (daily at 06:00 AM ET)...")
 
-    # Schedule daily scrape at 6 AM
+    # Follow-ups are dispatched as they come due, independent of the scrape schedule
+    if followups:
+        start_dispatcher_thread()
+
+    # Schedule daily scrape at 6 AM, partition maintenance at 3:30 AM
     schedule.every().day.at("06:00").do(run_daily_scrape)
+    schedule.every().day.at("03:30").do(run_database_maintenance)
 
     # Run immediately on first start
+    run_database_maintenance()
     run_daily_scrape()
 
     while True:
         schedule.run_pending()
+        # Warm browsers are only worth keeping while a scrape is in progress
+        get_browser_pool().close_idle()
         time.sleep(60)
 
 
@@ -93,21 +178,56 @@ if __name__ == "__main__":
     parser.add_argument("--once", action="store_true", help="Run all scrapers once and exit")
     parser.add_argument("--lee", action="store_true", help="Scrape Lee County only")
     parser.add_argument("--collier", action="store_true", help="Scrape Collier County only")
-    parser.add_argument("--nal", type=str, help="Import a NAL CSV file")
+    parser.add_argument("--nal", type=str, nargs="+", help="Import one or more NAL CSV files")
     parser.add_argument("--county", type=str, help="County code for NAL import (36=Lee, 11=Collier)")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help=f"Rows per chunk for NAL import (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="NAL import: worker processes for parallel partitioned import; reads the CSV directly "
+             "(no NAL cache) and is not used with --delta (default: 1)",
+    )
+    parser.add_argument(
+        "--delta", action="store_true",
+        help="NAL import: only process parcels changed since the previous import",
+    )
     parser.add_argument("--days", type=int, default=1, help="Days back to scrape (default: 1)")
+    parser.add_argument(
+        "--resume", type=int, metavar="RUN_ID",
+        help="Continue a failed county scrape (scraping_runs id) from its last stored page",
+    )
+    parser.add_argument(
+        "--backfill", nargs=2, metavar=("START", "END"), type=date.fromisoformat,
+        help="Scrape all permits between two dates (YYYY-MM-DD, inclusive); --lee/--collier limit the counties",
+    )
+    parser.add_argument("--followups", action="store_true", help="Run the follow-up dispatcher only")
+    parser.add_argument(
+        "--no-followups", action="store_true",
+        help="Daemon mode: don't start the follow-up dispatcher (e.g. when it runs elsewhere)",
+    )
 
     args = parser.parse_args()
 
     if args.daemon:
-        daemon_mode()
+        daemon_mode(followups=not args.no_followups)
+    elif args.followups:
+        FollowUpDispatcher().run()
+    elif args.resume:
+        resume_scrape(args.resume)
+    elif args.backfill:
+        counties = [county for county, selected in (("lee", args.lee), ("collier", args.collier)) if selected]
+        run_permit_backfill(*args.backfill, counties or None)
     elif args.nal:
-        run_nal_import(args.nal, args.county)
+        run_nal_import(args.nal, args.county, args.chunk_size, args.delta, args.workers)
     elif args.lee:
         scrape_lee_permits(days_back=args.days)
+        link_permits_to_leads()
     elif args.collier:
         scrape_collier_permits(days_back=args.days)
+        link_permits_to_leads()
     elif args.once:
-        run_daily_scrape()
+        run_daily_scrape(days_back=args.days)
     else:
         parser.print_help()
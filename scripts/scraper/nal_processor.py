@@ -13,14 +13,32 @@ Counties: Lee (code 36), Collier (code 11)
 Format: CSV
 """
 
+import io
 import os
+import time
+import hashlib
 import logging
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 import pandas as pd
-
-from db import insert_lead, log_scraping_run, complete_scraping_run
-from lead_scorer import calculate_score
+import pyarrow as pa
+
+from db import (
+    session,
+    insert_leads_batch,
+    upsert_leads_by_parcel,
+    start_nal_delta,
+    diff_nal_fingerprints,
+    save_nal_fingerprints,
+    prune_nal_fingerprints,
+    log_scraping_run,
+    update_scraping_run,
+    complete_scraping_run,
+)
+from lead_scorer import score_dataframe
+from permit_linker import rescore_leads
 
 logger = logging.getLogger(__name__)
 
@@ -67,14 +85,58 @@ RESIDENTIAL_USE_CODES = [
     "08",  # Multi-family (10+ units)
 ]
 
+# Rows read per chunk; bounds peak memory regardless of file size
+DEFAULT_CHUNK_SIZE = int(os.getenv("NAL_CHUNK_SIZE", "50000"))
+
+# Typed columnar cache (Arrow IPC, memory-mapped on reuse), keyed by file content hash.
+# Bump NAL_CACHE_VERSION whenever NAL_COLUMN_TYPES changes.
+NAL_CACHE_DIR = os.getenv("NAL_CACHE_DIR", "/app/data/nal_cache")
+NAL_CACHE_VERSION = 1
+
+NAL_NUMERIC_COLUMNS = [
+    "year_built", "square_footage", "num_buildings", "num_units",
+    "assessed_value", "homestead_value", "homestead_assessed", "taxable_value",
+    "last_sale_price", "prev_sale_price",
+]
+NAL_DATE_COLUMNS = ["last_sale_date", "prev_sale_date"]
+# Fixed categories so every cached batch shares one dictionary
+NAL_CATEGORY_COLUMNS = {
+    "county_code": pd.CategoricalDtype([f"{i:02d}" for i in range(100)]),
+    "property_use_code": pd.CategoricalDtype([f"{i:02d}" for i in range(100)]),
+}
+
 
-def process_nal_file(filepath: str, county_code: str = None) -> dict:
+def process_nal_file(
+    filepath: str,
+    county_code: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    use_cache: bool = True,
+    delta: bool = False,
+) -> dict:
     """
     Process a Florida DOR NAL file and import leads into the database.
 
+    The file is streamed in chunks of ``chunk_size`` rows; each chunk is
+    filtered, cleaned, scored and inserted before the next one is read, so
+    peak memory depends on the chunk size, not the file size. Progress is
+    written to scraping_runs after every chunk.
+
+    The first import of a file also writes a typed Arrow cache; later
+    imports of the same content read the memory-mapped cache instead of
+    parsing the CSV again.
+
+    In delta mode each residential parcel is fingerprinted and compared with
+    the fingerprints stored by the previous import of the county, so a new
+    DOR release only touches the parcels that actually changed. Existing
+    leads keep their status; only property facts and score are refreshed.
+
     Args:
         filepath: Path to the NAL CSV file
         county_code: Override county code (auto-detected from filename if not provided)
+        chunk_size: Rows per chunk
+        use_cache: Read/write the columnar cache in NAL_CACHE_DIR
+        delta: Only clean, score and upsert parcels whose fingerprint differs
+            from the previous import, refreshing existing leads in place
 
     Returns:
         Dict with processing stats
@@ -83,99 +145,429 @@ def process_nal_file(filepath: str, county_code: str = None) -> dict:
         logger.error(f"NAL file not found: {filepath}")
         return {"error": "File not found"}
 
-    # Detect county from filename if not provided
+    county_code = _detect_county(filepath, county_code)
     if not county_code:
-        filename = os.path.basename(filepath).lower()
-        if "36" in filename or "lee" in filename:
-            county_code = "36"
-        elif "11" in filename or "collier" in filename:
-            county_code = "11"
-        else:
-            logger.error("Cannot detect county from filename. Provide county_code.")
-            return {"error": "Unknown county"}
+        logger.error("Cannot detect county from filename. Provide county_code.")
+        return {"error": "Unknown county"}
 
     county_name = COUNTY_MAP.get(county_code, "Unknown")
     run_id = log_scraping_run(f"nal_{county_name.lower()}")
 
-    logger.info(f"Processing NAL file for {county_name} County: {filepath}")
+    logger.info(f"Processing NAL file for {county_name} County: {filepath} (chunks of {chunk_size})")
 
-    try:
-        # Read NAL file
-        df = pd.read_csv(
-            filepath,
-            dtype=str,
-            low_memory=False,
-            encoding="latin-1",
-        )
+    total = 0
+    inserted = 0
+    updated = 0
+    skipped = 0
+    added = 0
+    changed = 0
+    removed = 0
 
-        logger.info(f"Loaded {len(df)} records from NAL file")
-
-        # Rename columns to our standard names
-        rename_map = {}
-        for orig, new in NAL_COLUMNS.items():
-            if orig in df.columns:
-                rename_map[orig] = new
-        df = df.rename(columns=rename_map)
-
-        # Filter residential properties only
-        if "property_use_code" in df.columns:
-            df["property_use_code"] = df["property_use_code"].str.strip().str.zfill(2)
-            df = df[df["property_use_code"].isin(RESIDENTIAL_USE_CODES)]
-            logger.info(f"Filtered to {len(df)} residential properties")
-
-        # Clean and convert data
-        df = _clean_nal_data(df, county_name)
-
-        # Score and insert leads
-        inserted = 0
-        skipped = 0
-        scored = 0
-
-        for _, row in df.iterrows():
-            lead = row.to_dict()
-
-            # Remove NaN values
-            lead = {k: v for k, v in lead.items() if pd.notna(v)}
-
-            # Calculate renovation score
-            score, reasons = calculate_score(lead)
-            lead["renovation_score"] = score
-            lead["score_reasons"] = reasons
-            lead["source"] = "scraper_nal"
-
-            # Only import leads with score >= 20 (some renovation potential)
-            if score >= 20:
-                result = insert_lead(lead)
-                if result:
-                    inserted += 1
-                    scored += 1
+    try:
+        if use_cache:
+            chunks = _read_nal_cached(filepath, chunk_size)
+        else:
+            chunks = (_type_nal_chunk(df) for df in _read_nal_chunks(filepath, chunk_size))
+
+        # One pooled connection for the whole file, committed after every chunk
+        with session() as conn:
+            if delta:
+                start_nal_delta(conn)
+
+            for chunk_num, df in enumerate(chunks, 1):
+                loaded = len(df)
+                df = _filter_residential(df)
+
+                if delta:
+                    # Only parcels that are new or differ from the last import go further
+                    df = df.dropna(subset=["parcel_id"]).drop_duplicates("parcel_id", keep="last")
+                    new_parcels, changed_parcels = diff_nal_fingerprints(
+                        county_name, _fingerprints(df), conn
+                    )
+                    added += len(new_parcels)
+                    changed += len(changed_parcels)
+                    df = df[df["parcel_id"].isin(set(new_parcels) | set(changed_parcels))]
+
+                # Clean and convert data
+                df = _clean_nal_data(df, county_name)
+
+                # Score all parcels at once, keep those with some renovation potential (>= 20)
+                leads = _qualified_leads(df)
+
+                if delta:
+                    chunk_inserted, updated_ids = upsert_leads_by_parcel(leads, conn=conn)
+                    # The refresh wrote NAL-only scores; put permit bonuses back
+                    rescore_leads(updated_ids, conn=conn)
+                    chunk_updated = len(updated_ids)
+                    chunk_skipped = len(leads) - chunk_inserted - chunk_updated
+                    save_nal_fingerprints(county_name, conn)
                 else:
-                    skipped += 1
+                    chunk_inserted, chunk_skipped, _ = insert_leads_batch(leads, conn=conn)
+                    chunk_updated = 0
+                total += len(df)
+                inserted += chunk_inserted
+                updated += chunk_updated
+                skipped += chunk_skipped
+
+                update_scraping_run(
+                    run_id, records_found=total, records_new=inserted, records_updated=updated, conn=conn
+                )
+                conn.commit()
+                logger.info(
+                    f"Chunk {chunk_num}: {loaded} rows, {len(df)} residential, "
+                    f"{chunk_inserted} inserted ({total} residential / {inserted} inserted so far)"
+                )
+
+            if delta:
+                removed = prune_nal_fingerprints(county_name, conn)
 
         complete_scraping_run(
             run_id,
-            records_found=len(df),
+            records_found=total,
             records_new=inserted,
-            records_updated=0,
+            records_updated=updated,
             errors=0,
         )
 
         stats = {
             "county": county_name,
-            "total_records": len(df),
+            "total_records": total,
             "leads_inserted": inserted,
             "leads_skipped": skipped,
-            "avg_score": scored,
+            "avg_score": inserted,
         }
+        if delta:
+            stats.update({
+                "leads_updated": updated,
+                "parcels_added": added,
+                "parcels_changed": changed,
+                "parcels_removed": removed,
+            })
         logger.info(f"NAL processing complete: {stats}")
         return stats
 
     except Exception as e:
         logger.error(f"Error processing NAL file: {e}")
-        complete_scraping_run(run_id, errors=1, error_details=str(e), status="failed")
+        complete_scraping_run(
+            run_id,
+            records_found=total,
+            records_new=inserted,
+            errors=1,
+            error_details=str(e),
+            status="failed",
+        )
         return {"error": str(e)}
 
 
+def _detect_county(filepath: str, county_code: str = None) -> str | None:
+    """County code from the argument, or detected from the filename."""
+    if county_code:
+        return county_code
+    filename = os.path.basename(filepath).lower()
+    if "36" in filename or "lee" in filename:
+        return "36"
+    if "11" in filename or "collier" in filename:
+        return "11"
+    return None
+
+
+def process_nal_files_parallel(
+    filepaths: list[str],
+    county_code: str = None,
+    workers: int = None,
+    partitions_per_file: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Import several NAL files, each split into byte-range partitions, on all cores.
+
+    Worker processes parse, clean, score and insert their partition a chunk
+    at a time through their own connection pool, and hand only counts back,
+    so neither the workers nor the parent ever hold a whole partition's
+    leads. Every partition is logged as its own scraping_runs entry.
+
+    This path always parses the CSV itself: the columnar cache is not read
+    or written, and there is no delta mode (run_nal_import falls back to
+    process_nal_file for --delta).
+
+    Args:
+        filepaths: NAL CSV files (e.g. Lee and Collier)
+        county_code: Override county code for all files
+        workers: Worker processes (default: CPU count)
+        partitions_per_file: Byte-range partitions per file (default: workers)
+        chunk_size: Rows per chunk inside a partition
+
+    Returns:
+        Dict with per-file processing stats
+    """
+    workers = workers or os.cpu_count() or 1
+    partitions_per_file = partitions_per_file or workers
+
+    jobs = []
+    results = {}
+    for filepath in filepaths:
+        if not os.path.exists(filepath):
+            logger.error(f"NAL file not found: {filepath}")
+            results[filepath] = {"error": "File not found"}
+            continue
+        code = _detect_county(filepath, county_code)
+        if not code:
+            logger.error(f"Cannot detect county from filename: {filepath}. Provide county_code.")
+            results[filepath] = {"error": "Unknown county"}
+            continue
+        county_name = COUNTY_MAP.get(code, "Unknown")
+        results[filepath] = {
+            "county": county_name,
+            "partitions": 0,
+            "total_records": 0,
+            "leads_inserted": 0,
+            "leads_skipped": 0,
+            "errors": 0,
+        }
+        for start, end in _partition_offsets(filepath, partitions_per_file):
+            jobs.append((filepath, county_name, start, end))
+
+    logger.info(f"Processing {len(jobs)} NAL partitions with {workers} workers (CSV only, NAL cache not used)")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for filepath, county_name, start, end in jobs:
+            run_id = log_scraping_run(f"nal_{county_name.lower()}")
+            future = executor.submit(_import_partition, filepath, county_name, start, end, chunk_size)
+            futures[future] = (filepath, run_id)
+
+        for future in as_completed(futures):
+            filepath, run_id = futures.pop(future)
+            stats = results[filepath]
+            stats["partitions"] += 1
+            try:
+                residential, inserted, skipped = future.result()
+                complete_scraping_run(run_id, records_found=residential, records_new=inserted)
+                stats["total_records"] += residential
+                stats["leads_inserted"] += inserted
+                stats["leads_skipped"] += skipped
+            except Exception as e:
+                logger.error(f"Error processing NAL partition of {filepath}: {e}")
+                complete_scraping_run(run_id, errors=1, error_details=str(e), status="failed")
+                stats["errors"] += 1
+
+    logger.info(f"Parallel NAL processing complete: {results}")
+    return results
+
+
+def _partition_offsets(filepath: str, parts: int) -> list[tuple[int, int]]:
+    """Split the data rows of a CSV into ~equal byte ranges that start on line boundaries."""
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        f.readline()  # header
+        bounds = [f.tell()]
+        for i in range(1, parts):
+            target = bounds[0] + (size - bounds[0]) * i // parts
+            f.seek(max(target, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def _import_partition(filepath: str, county_name: str, start: int, end: int, chunk_size: int):
+    """
+    Worker: parse, filter, clean, score and insert one byte range.
+
+    Each chunk's leads are inserted and committed on this process's own pool
+    (db.get_pool is per process). Returns (residential rows, inserted, skipped).
+    """
+    with open(filepath, "rb") as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+
+    residential = 0
+    inserted = 0
+    skipped = 0
+    for df in _read_nal_chunks(io.BytesIO(header + data), chunk_size):
+        df = _clean_nal_data(_filter_residential(_type_nal_chunk(df)), county_name)
+        residential += len(df)
+        chunk_inserted, chunk_skipped, _ = insert_leads_batch(_qualified_leads(df))
+        inserted += chunk_inserted
+        skipped += chunk_skipped
+    return residential, inserted, skipped
+
+
+def _read_nal_chunks(filepath, chunk_size: int):
+    """Yield NAL rows in chunks (from a path or buffer), renamed to our standard column names.
+
+    Only the columns in NAL_COLUMNS are parsed; the rest of the (very wide)
+    DOR layout is skipped at read time.
+    """
+    reader = pd.read_csv(
+        filepath,
+        dtype=str,
+        encoding="latin-1",
+        usecols=lambda c: c in NAL_COLUMNS,
+        chunksize=chunk_size,
+    )
+    for df in reader:
+        # Rename columns to our standard names
+        yield df.rename(columns=NAL_COLUMNS)
+
+
+def _type_nal_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert a raw (all-string) NAL chunk to numeric, date and categorical dtypes."""
+    for col in NAL_COLUMNS.values():
+        if col not in df.columns:
+            df[col] = None
+    for col in NAL_NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    for col in NAL_DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], format="%Y%m%d", errors="coerce")
+    for col, dtype in NAL_CATEGORY_COLUMNS.items():
+        df[col] = df[col].str.strip().str.zfill(2).astype(dtype)
+    return df[list(NAL_COLUMNS.values())]
+
+
+def _nal_cache_schema() -> pa.Schema:
+    """Arrow schema for cached NAL batches."""
+    fields = []
+    for col in NAL_COLUMNS.values():
+        if col in NAL_NUMERIC_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        elif col in NAL_DATE_COLUMNS:
+            fields.append(pa.field(col, pa.timestamp("ns")))
+        elif col in NAL_CATEGORY_COLUMNS:
+            fields.append(pa.field(col, pa.dictionary(pa.int8(), pa.string())))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def nal_cache_path(filepath: str) -> str:
+    """Cache file for the content of a NAL file (sha256 of its bytes)."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return os.path.join(NAL_CACHE_DIR, f"nal_v{NAL_CACHE_VERSION}_{digest.hexdigest()[:24]}.arrow")
+
+
+def _read_nal_cached(filepath: str, chunk_size: int, cache_path: str = None):
+    """Yield typed NAL chunks from the cache, building it from the CSV on a miss.
+
+    The cache is written to a temp file while streaming and only renamed
+    into place once the whole CSV has been read.
+    """
+    cache_path = cache_path or nal_cache_path(filepath)
+
+    if os.path.exists(cache_path):
+        logger.info(f"Reading NAL cache: {cache_path}")
+        with pa.memory_map(cache_path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(i)])
+                for batch in table.to_batches(max_chunksize=chunk_size):
+                    yield batch.to_pandas()
+        return
+
+    logger.info(f"Building NAL cache: {cache_path}")
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    schema = _nal_cache_schema()
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for df in _read_nal_chunks(filepath, chunk_size):
+                df = _type_nal_chunk(df)
+                writer.write_batch(pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False))
+                yield df
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_nal_cache(filepath: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Build (or rebuild) the columnar cache for a NAL file and time cold vs warm reads.
+
+    Returns:
+        Dict with cache path, size, row count and read timings in seconds
+    """
+    cache_path = nal_cache_path(filepath)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    start = time.perf_counter()
+    rows = sum(len(df) for df in _read_nal_cached(filepath, chunk_size, cache_path))
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sum(len(df) for df in _read_nal_cached(filepath, chunk_size, cache_path))
+    warm = time.perf_counter() - start
+
+    return {
+        "cache_path": cache_path,
+        "rows": rows,
+        "cache_bytes": os.path.getsize(cache_path),
+        "csv_seconds": round(cold, 3),
+        "cache_seconds": round(warm, 3),
+    }
+
+
+def nal_cache_info(filepath: str) -> dict:
+    """Describe the cache entry for a NAL file, if one exists."""
+    cache_path = nal_cache_path(filepath)
+    if not os.path.exists(cache_path):
+        return {"cache_path": cache_path, "cached": False}
+
+    with pa.memory_map(cache_path) as source:
+        reader = pa.ipc.open_file(source)
+        rows = sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+        schema = {f.name: str(f.type) for f in reader.schema}
+    return {
+        "cache_path": cache_path,
+        "cached": True,
+        "rows": rows,
+        "cache_bytes": os.path.getsize(cache_path),
+        "schema": schema,
+    }
+
+
+def _filter_residential(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep residential properties only (DOR use codes 01-08)."""
+    if "property_use_code" not in df.columns:
+        return df
+    codes = df["property_use_code"].str.strip().str.zfill(2)
+    mask = codes.isin(RESIDENTIAL_USE_CODES)
+    df = df[mask].copy()
+    df["property_use_code"] = codes[mask]
+    return df
+
+
+def _fingerprints(df: pd.DataFrame) -> list[tuple[str, int]]:
+    """(parcel_id, 64-bit row hash) pairs over every typed NAL column of each parcel."""
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64)
+    return list(zip(df["parcel_id"], hashes.tolist()))
+
+
+def _qualified_leads(df: pd.DataFrame, min_score: int = 20) -> list[dict]:
+    """Score a cleaned NAL frame and return lead dicts for parcels at or above min_score."""
+    scores = score_dataframe(df)
+    mask = scores["renovation_score"] >= min_score
+
+    leads = []
+    for lead, score, reasons in zip(
+        df[mask].to_dict("records"),
+        scores.loc[mask, "renovation_score"],
+        scores.loc[mask, "score_reasons"],
+    ):
+        # Remove NaN values
+        lead = {k: v for k, v in lead.items() if pd.notna(v)}
+        lead["renovation_score"] = int(score)
+        lead["score_reasons"] = reasons
+        lead["source"] = "scraper_nal"
+        leads.append(lead)
+    return leads
+
+
 def _clean_nal_data(df: pd.DataFrame, county_name: str) -> pd.DataFrame:
     """Clean and transform NAL data for lead insertion."""
     df["county"] = county_name
@@ -238,8 +630,20 @@ if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("Usage: python nal_processor.py <path_to_nal_file.csv> [county_code]")
         print("  county_code: 36 (Lee) or 11 (Collier)")
+        print("       python nal_processor.py cache-build|cache-info <path_to_nal_file.csv>")
         sys.exit(1)
 
+    if sys.argv[1] in ("cache-build", "cache-info"):
+        if len(sys.argv) < 3:
+            print("Usage: python nal_processor.py cache-build|cache-info <path_to_nal_file.csv>")
+            sys.exit(1)
+        if sys.argv[1] == "cache-build":
+            result = build_nal_cache(sys.argv[2])
+        else:
+            result = nal_cache_info(sys.argv[2])
+        print(f"Result: {result}")
+        sys.exit(0)
+
     filepath = sys.argv[1]
     county = sys.argv[2] if len(sys.argv) > 2 else None
     result = process_nal_file(filepath, county)
@@ -0,0 +1,128 @@
+"""In-process opt-out set kept exact by PostgreSQL LISTEN/NOTIFY.
+
+The opt_out_notify trigger publishes every insert, update, delete and
+truncate on opt_outs (from add_opt_out, the sync_dnc_to_optouts trigger or
+manual SQL) on the opt_out_changes channel. The cache LISTENs before it
+loads its snapshot, so nothing committed during the load is missed, and
+drains pending notifications before answering each lookup.
+
+Lookups are a set membership test on the 10-digit phone key. When the
+listening connection is unavailable the cache reports itself unusable and
+callers fall back to querying opt_outs; the check_opt_out trigger remains
+the final guard either way.
+"""
+
+import re
+import json
+import time
+import logging
+import threading
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "opt_out_changes"
+
+# Seconds between liveness checks on an idle listening connection
+HEALTH_CHECK_INTERVAL = 60
+
+
+def phone_key(phone: str | None) -> int | None:
+    """Last 10 digits of a phone number as an int (matches leads.phone_key)."""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", str(phone))[-10:]
+    return int(digits) if digits else None
+
+
+class OptOutCache:
+    """Thread-safe opt-out set fed by a dedicated LISTEN connection."""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._conn = None
+        self._phones: set[int] = set()
+        # Opt-outs made by this process whose notification hasn't been drained yet
+        self._local: set[int] = set()
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def contains(self, phone: str) -> bool | None:
+        """True/False if the cache is live, None if callers must ask the database."""
+        key = phone_key(phone)
+        with self._lock:
+            try:
+                if self._conn is None or self._conn.closed:
+                    self._load()
+                self._drain()
+            except psycopg2.Error as e:
+                logger.warning(f"Opt-out cache unavailable, falling back to database: {e}")
+                self._close()
+                return None
+            return key in self._phones or key in self._local
+
+    def add(self, phone: str):
+        """Record an opt-out committed by this process before its notification is drained."""
+        key = phone_key(phone)
+        if key is not None:
+            with self._lock:
+                self._local.add(key)
+
+    def __len__(self) -> int:
+        return len(self._phones)
+
+    def _load(self):
+        """Open the listening connection, LISTEN, then snapshot opt_outs."""
+        self._close()
+        conn = self._connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+            cur.execute("SELECT phone FROM opt_outs")
+            phones = {phone_key(row["phone"]) for row in cur.fetchall()}
+        phones.discard(None)
+        self._conn = conn
+        self._phones = phones
+        self._local.clear()
+        self._checked_at = time.monotonic()
+        logger.info(f"Opt-out cache loaded: {len(phones)} numbers")
+
+    def _drain(self):
+        """Apply all notifications already received on the socket (no round trip)."""
+        if time.monotonic() - self._checked_at > HEALTH_CHECK_INTERVAL:
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            self._checked_at = time.monotonic()
+
+        self._conn.poll()
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            change = json.loads(notify.payload)
+            if change["op"] == "reload":
+                self._load()
+                return
+            key = phone_key(change.get("phone"))
+            if key is None:
+                continue
+            self._local.discard(key)
+            if change["op"] == "add":
+                self._phones.add(key)
+            elif not self._still_opted_out(key):
+                self._phones.discard(key)
+
+    def _still_opted_out(self, key: int) -> bool:
+        """After a delete: another opt_outs row ("+1239..." vs "239...") may share the key. Rare."""
+        with self._conn.cursor() as cur:
+            cur.execute(
+                """SELECT 1 FROM opt_outs
+                   WHERE NULLIF(RIGHT(regexp_replace(phone, '\\D', '', 'g'), 10), '')::BIGINT = %s
+                   LIMIT 1""",
+                (key,),
+            )
+            return cur.fetchone() is not None
+
+    def _close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
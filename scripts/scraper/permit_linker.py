@@ -0,0 +1,75 @@
+"""Link scraped permits to leads and rescore the leads that gained permits.
+
+Runs after each permit scrape. Permits are matched to leads by parcel ID,
+or by normalized address key within the same county (with a trigram
+fallback), in one set-based UPDATE. Only leads that gained permits are rescored, so an active remodel
+or roofing permit now reaches the lead's renovation_score. Delta NAL imports
+call rescore_leads for the leads they refresh, since the refresh writes a
+score without permits.
+
+leads.homestead defaults to false, so it is only a known value for leads
+imported from the NAL roll; other leads are rescored with it unknown rather
+than picking up the "no homestead" points.
+"""
+
+import logging
+
+from db import (
+    session,
+    backfill_address_keys,
+    link_unlinked_permits,
+    get_leads_with_permits,
+    update_lead_scores,
+)
+from lead_scorer import calculate_score
+
+logger = logging.getLogger(__name__)
+
+
+def rescore_leads(lead_ids: list[int], conn) -> int:
+    """
+    Rescore leads with their linked permits, skipping leads that have none.
+
+    Returns:
+        Number of leads whose score changed
+    """
+    changed = []
+    for lead, permits in get_leads_with_permits(sorted(set(lead_ids)), conn=conn):
+        if not permits:
+            continue
+        if lead["source"] != "scraper_nal":
+            lead["homestead"] = None
+        score, reasons = calculate_score(lead, permits)
+        if score != lead["renovation_score"] or reasons != (lead["score_reasons"] or []):
+            changed.append((lead["id"], score, reasons))
+    update_lead_scores(changed, conn=conn)
+    return len(changed)
+
+
+def link_permits_to_leads() -> dict:
+    """
+    Link unlinked permits to leads and rescore affected leads.
+
+    Returns:
+        Dict with permits linked, leads affected and scores changed
+    """
+    with session() as conn:
+        backfilled = backfill_address_keys(conn=conn)
+        linked_lead_ids = link_unlinked_permits(conn=conn)
+        lead_ids = sorted(set(linked_lead_ids))
+        changed = rescore_leads(lead_ids, conn=conn)
+
+    stats = {
+        "address_keys_backfilled": backfilled,
+        "permits_linked": len(linked_lead_ids),
+        "leads_affected": len(lead_ids),
+        "scores_changed": changed,
+    }
+    logger.info(f"Permit linking complete: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    result = link_permits_to_leads()
+    print(f"Result: {result}")
@@ -0,0 +1,62 @@
+"""Per-host politeness budgets shared by every scraper thread.
+
+Each portal host gets one HostThrottle: a minimum interval between requests
+and a cap on concurrent search sessions. Scrapers of different hosts run in
+parallel without slowing each other down, while any number of threads
+scraping the same host share its budget.
+
+    throttle = host_throttle(url, min_interval=1.0)
+    throttle.wait()          # before every request to the host
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+DEFAULT_MIN_INTERVAL = 2.0
+DEFAULT_MAX_SESSIONS = 1
+
+
+class HostThrottle:
+    """Request spacing and session cap for one host (thread-safe)."""
+
+    def __init__(self, host: str, min_interval: float, max_sessions: int):
+        self.host = host
+        self.min_interval = min_interval
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+        self._sessions = threading.BoundedSemaphore(max_sessions)
+
+    def wait(self):
+        """Block until this host may receive the next request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    @contextmanager
+    def session(self):
+        """Hold one of the host's concurrent search sessions."""
+        with self._sessions:
+            yield self
+
+
+_throttles: dict[str, HostThrottle] = {}
+_throttles_lock = threading.Lock()
+
+
+def host_throttle(
+    url: str,
+    min_interval: float = DEFAULT_MIN_INTERVAL,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+) -> HostThrottle:
+    """The process-wide throttle for the host of `url` (settings apply on first use)."""
+    host = urlsplit(url).hostname or url
+    with _throttles_lock:
+        if host not in _throttles:
+            _throttles[host] = HostThrottle(host, min_interval, max_sessions)
+        return _throttles[host]
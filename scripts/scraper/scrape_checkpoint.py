@@ -0,0 +1,85 @@
+"""Per-page checkpoints for permit scraping runs.
+
+A county search calls the PageCheckpoint after every results page. The
+page's permits are upserted and the run's cursor (last_page,
+last_permit_number) advanced in one transaction, so a crash loses at most
+the page in flight and scraping_runs always says where to pick up.
+
+Resuming (main_scraper.py --resume RUN_ID) repeats the run's date-window
+search: pages up to the cursor are walked but not stored again. If the
+last permit on the cursor page no longer matches, results shifted since
+the checkpoint (new permits came in) and the walked pages are stored again;
+the upsert makes that safe, and records_found is recounted from the walked
+pages instead of adding them to the count they were already part of. The same skipping applies when a search is
+restarted within one run (e.g. Lee's Chrome fallback after an HTTP error).
+"""
+
+import logging
+
+from db import session, insert_permits_batch, checkpoint_scraping_run
+
+logger = logging.getLogger(__name__)
+
+
+class PageCheckpoint:
+    """Callable on_page sink: stores each page and advances the run's cursor."""
+
+    def __init__(self, run_id: int, resume_run: dict = None):
+        resume_run = resume_run or {}
+        self.run_id = run_id
+        self.last_page = resume_run.get("last_page") or 0
+        self.last_permit_number = resume_run.get("last_permit_number")
+        self.found = resume_run.get("records_found") or 0
+        self.new = resume_run.get("records_new") or 0
+        self.updated = resume_run.get("records_updated") or 0
+        # Permits of walked pages, kept until the cursor page confirms them
+        self._walked: list[dict] = []
+        self._walked_through = 0
+
+    def __call__(self, page: int, permits: list[dict]):
+        if page == 1:
+            self._walked, self._walked_through = [], 0
+
+        if page < self.last_page:
+            self._walked.extend(permits)
+            self._walked_through = page
+            return
+        if page == self.last_page:
+            last = permits[-1]["permit_number"] if permits else None
+            if last == self.last_permit_number:
+                logger.info(f"Run {self.run_id}: resumed after page {page}")
+                self._walked, self._walked_through = [], 0
+                return
+            logger.warning(
+                f"Run {self.run_id}: page {page} ends at {last}, checkpoint says {self.last_permit_number}; "
+                f"results shifted, storing pages 1-{page} again"
+            )
+            self._walked.extend(permits)
+            self._store(page, self._walked, recount=True)
+            self._walked, self._walked_through = [], 0
+            return
+        self._store(page, permits)
+
+    def finish(self):
+        """Store walked pages if the search ended before reaching the cursor page."""
+        if self._walked_through:
+            logger.warning(
+                f"Run {self.run_id}: search ended at page {self._walked_through}, before checkpoint "
+                f"page {self.last_page}; storing the walked pages"
+            )
+            self._store(self._walked_through, self._walked, recount=True)
+            self._walked, self._walked_through = [], 0
+
+    def _store(self, page: int, permits: list[dict], recount: bool = False):
+        """Store a page; with recount, permits are every page from 1 and replace records_found."""
+        with session() as conn:
+            new_count, updated_count, _ = insert_permits_batch(permits, conn=conn) if permits else (0, 0, 0)
+            # Everything found so far came from pages up to the cursor, which were just walked again
+            if recount:
+                self.found = 0
+            self.found += len(permits)
+            self.new += new_count
+            self.updated += updated_count
+            last = permits[-1]["permit_number"] if permits else None
+            checkpoint_scraping_run(self.run_id, page, last, self.found, self.new, self.updated, conn=conn)
+        self.last_page, self.last_permit_number = page, last